@@ -63,6 +63,7 @@ __all__ = ['Opcode_set_char',
 
 ####################################################################################################
 
+import copy
 import fractions
 import logging
 
@@ -147,12 +148,11 @@ class Opcode_putset_char(Opcode):
         dvi_font = dvi_machine.current_dvi_font
         if font.is_virtual:
             # Fixme: bounding_box
+            widths = font.metrics.scaled_dimensions(dvi_font.scale_factor)[0]
             for char_code in self.characters:
-                virtual_character = font._characters[char_code]
+                virtual_character = font[char_code]
                 dvi_machine.run_subroutine(virtual_character.subroutine)
-                tfm_char = font.tfm[char_code]
-                char_width = dvi_font.char_scaled_width(tfm_char)
-                registers.h += char_width # Fixme: properly scaled
+                registers.h += widths[char_code] # Fixme: properly scaled
         else:
             self._run(dvi_machine, compute_bounding_box)
 
@@ -164,20 +164,15 @@ class Opcode_putset_char(Opcode):
         font = dvi_machine.current_font
         dvi_font = dvi_machine.current_dvi_font
 
+        # The metrics don't depend on the source, TFM, AFM or outlines, and the glyphs are not
+        # rasterised
+        widths, heights, depths = font.metrics.scaled_dimensions(dvi_font.scale_factor)
+
         bounding_box = None
         for char_code in self.characters:
-            if font.tfm is not None:
-                tfm_char = font.tfm[char_code]
-                char_width = dvi_font.char_scaled_width(tfm_char)
-                char_depth = dvi_font.char_scaled_depth(tfm_char)
-                char_height = dvi_font.char_scaled_height(tfm_char)
-            else: # Fixme:
-                size = dvi_font.magnification * sp2pt(dvi_font.design_size)
-                glyph = font.get_glyph(char_code, size)
-                print glyph.advance, glyph.size, glyph.width_px
-                char_width = glyph.px_to_mm(glyph.width_px)
-                char_depth = glyph.px_to_mm(glyph.height_px - glyph.horizontal_bearing_y_px)
-                char_height = glyph.px_to_mm(glyph.horizontal_bearing_y_px)
+            char_width = widths[char_code]
+            char_height = heights[char_code]
+            char_depth = depths[char_code]
 
             char_bounding_box = Interval2D([registers.h, registers.h + char_width],
                                            [registers.v - char_height, registers.v + char_depth])
@@ -1057,6 +1052,76 @@ class DviMachineRegisters(object):
 
 ####################################################################################################
 
+class DviMachineFonts(dict):
+
+    """ This class implements the font table of a DVI machine, it maps the global font ids to the
+    fonts.  The fonts of the virtual fonts are registered by :meth:`register_virtual_font_font` and
+    are only loaded by the font manager *font_manager* when they are first looked up.  The fonts are
+    acquired from the font manager, cf. :meth:`acquire`, and are released by :meth:`release`.
+    """
+
+    ##############################################
+
+    def __init__(self, font_manager):
+
+        super(DviMachineFonts, self).__init__()
+
+        self._font_manager = font_manager
+        self._virtual_font_fonts = {} # global id -> (virtual font, local id)
+        self._font_names = [] # names of the acquired fonts
+
+    ##############################################
+
+    def __missing__(self, font_id):
+
+        virtual_font, local_font_id = self._virtual_font_fonts[font_id]
+        # the virtual fonts are shared by the font managers, thus the font is looked up by the font
+        # manager of the machine
+        font = self[font_id] = self.acquire(virtual_font.dvi_fonts[local_font_id].name)
+        return font
+
+    ##############################################
+
+    def acquire(self, font_name):
+
+        """ Acquire the font *font_name* from the font manager and return it. """
+
+        font = self._font_manager.acquire(font_name)
+        self._font_names.append(font_name)
+        return font
+
+    ##############################################
+
+    def release(self):
+
+        """ Release the fonts acquired from the font manager. """
+
+        for font_name in self._font_names:
+            self._font_manager.release(font_name)
+        del self._font_names[:]
+
+    ##############################################
+
+    def __contains__(self, font_id):
+
+        return dict.__contains__(self, font_id) or font_id in self._virtual_font_fonts
+
+    ##############################################
+
+    def register_virtual_font_font(self, font_id, virtual_font, local_font_id):
+
+        self._virtual_font_fonts[font_id] = (virtual_font, local_font_id)
+
+    ##############################################
+
+    def font_ids(self):
+
+        """ Return the ids of the loaded and not yet loaded fonts. """
+
+        return set(self.iterkeys()) | set(self._virtual_font_fonts)
+
+####################################################################################################
+
 class DviMachine(object):
 
     """ This class implements a DVI Machine. """
@@ -1068,13 +1133,33 @@ class DviMachine(object):
     def __init__(self, font_manager):
 
         self.font_manager = font_manager
+        #: :class:`PyDvi.Font.RasteriserPool.RasteriserPool` instance used to rasterise the glyphs
+        self.rasteriser_pool = None
 
         self.virtual_fonts = {}
-        self.fonts = {} # indexed by TeX font id which is not an incremental number starting from 0
+        # indexed by TeX font id which is not an incremental number starting from 0
+        self.fonts = DviMachineFonts(font_manager)
+        # DVI fonts of the virtual fonts indexed by global id, cf. :meth:`get_dvi_font`
+        self.virtual_font_dvi_fonts = {}
+        # The fonts are shared by the machines, thus the mapping of the font ids of a virtual font
+        # to the ids of the machine is stored here: virtual font -> {local id: global id}
+        self.font_id_maps = {}
         self._reset()
 
     ##############################################
 
+    def close(self):
+
+        """ Release the fonts used by the DVI program, thus the font manager can unload them. """
+
+        self.fonts.release()
+        self.fonts = DviMachineFonts(self.font_manager)
+        self.virtual_fonts = {}
+        self.font_id_maps = {}
+        self.virtual_font_dvi_fonts = {}
+
+    ##############################################
+
     def _reset(self):
 
         """ Reset the machine. """
@@ -1137,7 +1222,7 @@ class DviMachine(object):
     @current_font_id.setter
     def current_font_id(self, font_id):
         if self._virtual_font is not None:
-            font_id = self._virtual_font.font_id_map[font_id]
+            font_id = self.font_id_maps[self._virtual_font][font_id]
         self._current_font_id = font_id
 
     ##############################################
@@ -1158,7 +1243,20 @@ class DviMachine(object):
     @property
     def current_dvi_font(self):
         """ Return the current dvi font. """
-        return self.dvi_program.get_font(self._current_font_id)
+        return self.get_dvi_font(self._current_font_id)
+
+    ##############################################
+
+    def get_dvi_font(self, font_id):
+
+        """ Return the :class:`DviFont` instance for the font id *font_id*, the DVI fonts of the
+        virtual fonts are held by the machine since the DVI program can be shared.
+        """
+
+        dvi_font = self.virtual_font_dvi_fonts.get(font_id)
+        if dvi_font is None:
+            dvi_font = self.dvi_program.get_font(font_id)
+        return dvi_font
 
     ##############################################
 
@@ -1176,26 +1274,33 @@ class DviMachine(object):
 
         """ Load the fonts used by the DVI program. """
 
+        # release the fonts of the previous program
+        self.close()
+
+        dvi_fonts = list(self.dvi_program.dvi_font_iterator())
+
+        # Resolve the font files in bulk
+        self.font_manager.resolve_fonts([dvi_font.name for dvi_font in dvi_fonts])
+
         # Load the Fonts
-        for dvi_font in self.dvi_program.dvi_font_iterator():
-            font = self.font_manager[dvi_font.name]
-            self.fonts[dvi_font.id] = font
+        for dvi_font in dvi_fonts:
+            font = self.fonts[dvi_font.id] = self.fonts.acquire(dvi_font.name)
             if font.is_virtual:
                 self.virtual_fonts[dvi_font.id] = font
-                font.load_dvi_fonts()
 
-        # Merge the embedded fonts in the virtual fonts
-        last_font_id = max([font_id for font_id in self.fonts])
+        # Merge the embedded fonts in the virtual fonts, they are loaded when a character refers
+        # to them
+        last_font_id = max(self.dvi_program.fonts)
         for virtual_font in self.virtual_fonts.itervalues():
-            for font in virtual_font.fonts.itervalues():
-                last_font_id += 1
-                font.global_id = last_font_id
-                self.fonts[last_font_id] = font
-            virtual_font.update_font_id_map()
+            font_id_map = self.font_id_maps[virtual_font] = {}
             for font_id, dvi_font in virtual_font.dvi_fonts.iteritems():
-                global_font_id = virtual_font.font_id_map[font_id]
-                dvi_font.global_id = global_font_id
-                self.dvi_program.fonts[global_font_id] = dvi_font
+                last_font_id += 1
+                font_id_map[font_id] = last_font_id
+                self.fonts.register_virtual_font_font(last_font_id, virtual_font, font_id)
+                # the DVI fonts of the virtual font are shared too
+                dvi_font = copy.copy(dvi_font)
+                dvi_font.global_id = last_font_id
+                self.virtual_font_dvi_fonts[last_font_id] = dvi_font
                 
         if self.virtual_fonts:
             # Fixme: program_page vs opcode_program
@@ -1248,6 +1353,71 @@ class DviMachine(object):
 
     ##############################################
 
+    def page_char_codes(self, opcode_program):
+
+        """ Return a dictionary mapping the font ids to the set of char codes painted by the
+        opcode program, the characters of the virtual fonts are resolved to the characters of their
+        fonts.
+        """
+
+        char_codes = {}
+
+        def walk(opcodes, current_font_id, virtual_font=None):
+            for opcode in opcodes:
+                if isinstance(opcode, Opcode_font):
+                    current_font_id = opcode.font_id
+                    if virtual_font is not None:
+                        current_font_id = self.font_id_maps[virtual_font][current_font_id]
+                elif isinstance(opcode, Opcode_putset_char):
+                    font = self.fonts[current_font_id]
+                    if font.is_virtual:
+                        first_font_id = self.font_id_maps[font][font.first_font]
+                        for char_code in opcode.characters:
+                            walk(font[char_code].subroutine, first_font_id, font)
+                    else:
+                        char_codes.setdefault(current_font_id, set()).update(opcode.characters)
+
+        walk(opcode_program, None)
+
+        return char_codes
+
+    ##############################################
+
+    def rasterise_page_glyphs(self, opcode_program, resolution=600):
+
+        """ Rasterise up front the glyphs painted by the opcode program at the resolution
+        *resolution* in dpi, cf. :meth:`PyDvi.Font.Font.rasterise`.  The glyphs are rendered by the
+        threads of :attr:`rasteriser_pool` if it is set.
+        """
+
+        self._rasterise_glyphs(self.page_char_codes(opcode_program), resolution)
+
+    ##############################################
+
+    def rasterise_document_glyphs(self, resolution=600):
+
+        """ Rasterise up front the glyphs painted by all the pages of the DVI program. """
+
+        char_codes = {}
+        for opcode_program in self.dvi_program:
+            for font_id, page_char_codes in self.page_char_codes(opcode_program).iteritems():
+                char_codes.setdefault(font_id, set()).update(page_char_codes)
+        self._rasterise_glyphs(char_codes, resolution)
+
+    ##############################################
+
+    def _rasterise_glyphs(self, char_codes, resolution):
+
+        for font_id, font_char_codes in char_codes.iteritems():
+            font = self.fonts[font_id]
+            dvi_font = self.get_dvi_font(font_id)
+            size = dvi_font.magnification * sp2pt(dvi_font.design_size) # pt
+            font.rasterise(sorted(font_char_codes), size, resolution, self.rasteriser_pool)
+        # the fonts of the virtual fonts can have been loaded
+        self.font_manager.shrink()
+
+    ##############################################
+
     def _adjust_opcode_counts_for_virtual_characters(self, opcode_program):
 
         self._reset()
@@ -1273,7 +1443,7 @@ class DviMachine(object):
             for local_font_id, count in subroutine.number_of_chars.iteritems():
                 if local_font_id is None:
                     local_font_id = virtual_font.first_font
-                global_font_id = virtual_font.font_id_map[local_font_id]
+                global_font_id = self.font_id_maps[virtual_font][local_font_id]
                 if global_font_id in opcode_program.number_of_chars:
                     opcode_program.number_of_chars[global_font_id] += count
                 else:
@@ -1294,6 +1464,7 @@ class DviMachine(object):
             #                   'level {}\n'
             #                   '{}'.format(len(self._registers_stack), self.registers))
         self.end_run_page()
+        self.font_manager.shrink()
 
     ##############################################
 
@@ -1310,7 +1481,7 @@ class DviMachine(object):
         self.in_subroutine = True
         self._virtual_font = self.current_font
         current_font_id = self._current_font_id # the virtual font
-        self._current_font_id = self._virtual_font.font_id_map[self._virtual_font.first_font]
+        self._current_font_id = self.font_id_maps[self._virtual_font][self._virtual_font.first_font]
         self.push_registers(reset=True) # colour ?
 
         # Fixme: dimension are 2**-20 * virtual font design size
@@ -0,0 +1,300 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module handles the Adobe Font Metrics.
+
+The class :class:`Afm` stores the metrics of an AFM file in Numpy arrays.  To get an :class:`Afm`
+instance use :meth:`PyDvi.Font.AfmParser.CompactAfmParser.parse`, or
+:meth:`PyDvi.Font.FontCache.FontCache.load_afm` to use the font cache::
+
+  afm = CompactAfmParser.parse('/usr/share/texmf/fonts/afm/adobe/times/ptmr8a.afm')
+
+The glyphs are indexed in the order of the ``CharMetrics`` section, and are looked up by name using
+:meth:`Afm.glyph_index` or by character code using :meth:`Afm.char_glyph_index`::
+
+  >>> afm.advances[afm.glyph_index('A')]
+  array([ 722.,    0.], dtype=float32)
+
+The glyphs which are only referenced by the kern pairs, the ligatures or the composites are appended
+to the glyph names, thus the number of glyph names can be greater than the number of glyph metrics
+given by :func:`len`.
+
+The global font information is stored in the dictionary :attr:`Afm.information` using the AFM keys,
+for example ``afm.information['CapHeight']``.
+
+All the measurements are given in 1/1000 of the font size.
+
+"""
+
+####################################################################################################
+
+__all__ = ['Afm']
+
+####################################################################################################
+
+import sys
+
+import numpy as np
+
+####################################################################################################
+
+from ..Tools.Logging import print_card
+
+####################################################################################################
+
+class Afm(object):
+
+    """ This class stores the Adobe Font Metrics of a font.
+
+    Public attributes:
+
+      :attr:`filename`
+        ".afm" filename
+
+      :attr:`version`
+        version of the AFM format
+
+      :attr:`information`
+        dictionary of the global font information
+
+      :attr:`char_codes`
+        character code of each glyph, -1 if the glyph is not encoded
+
+      :attr:`advances`
+        advance vectors of the glyphs for the writing direction 0
+
+      :attr:`vertical_advances`
+        advance vectors of the glyphs for the writing direction 1
+
+      :attr:`bounding_boxes`
+        bounding boxes of the glyphs as (llx, lly, urx, ury)
+
+      :attr:`ligatures`
+        ligatures as triplets of glyph indexes (first, successor, ligature)
+
+      :attr:`kern_pairs`
+        kern pairs as couples of glyph indexes
+
+      :attr:`kern_vectors`
+        kern vectors of the kern pairs
+
+      :attr:`track_kerns`
+        track kerns as (degree, min point size, min kern, max point size, max kern)
+
+    The composites are stored in a compressed row layout: the parts of the composite
+    ``composite_glyphs[i]`` are ``composite_parts[composite_part_starts[i]:composite_part_starts[i+1]]``
+    and are displaced by the vectors ``composite_part_displacements``.  Use :meth:`composite` to
+    query them.
+    """
+
+    #: Names of the arrays
+    _array_names = ('char_codes', 'advances', 'vertical_advances', 'bounding_boxes',
+                    'ligatures', 'kern_pairs', 'kern_vectors', 'track_kerns',
+                    'composite_glyphs', 'composite_part_starts',
+                    'composite_parts', 'composite_part_displacements')
+
+    ##############################################
+
+    def __init__(self, filename, version, information, glyph_names, **arrays):
+
+        self.filename = filename
+        self.version = version
+        self.information = information
+        self._glyph_names = glyph_names
+        for name in self._array_names:
+            setattr(self, name, arrays[name])
+
+        self._glyph_indexes = None
+        self._char_glyph_indexes = None
+        self._kern_table = None
+
+    ##############################################
+
+    def to_arrays(self):
+
+        """ Return the 2-tuple made of the JSON serialisable metadata and the dictionary of arrays,
+        cf. :func:`PyDvi.Tools.Cache.dump_arrays`.
+        """
+
+        metadata = {'version':self.version,
+                    'information':self.information,
+                    }
+        arrays = {name:getattr(self, name) for name in self._array_names}
+        # The glyph names are stored as a blob
+        arrays['glyph_names'] = np.frombuffer('\n'.join(self._glyph_names), dtype=np.uint8)
+
+        return metadata, arrays
+
+    ##############################################
+
+    @classmethod
+    def from_arrays(cls, filename, metadata, arrays):
+
+        """ Return an :class:`Afm` instance for the metadata and arrays returned by
+        :meth:`to_arrays`.
+        """
+
+        glyph_names = arrays['glyph_names'].tostring()
+        glyph_names = glyph_names.split('\n') if glyph_names else []
+        information = {str(key):(str(value) if isinstance(value, unicode) else value)
+                       for key, value in metadata['information'].iteritems()}
+
+        return cls(filename, str(metadata['version']), information, glyph_names,
+                   **{name:arrays[name] for name in cls._array_names})
+
+    ##############################################
+
+    def __len__(self):
+
+        """ Return the number of glyphs having metrics. """
+
+        return self.advances.shape[0]
+
+    ##############################################
+
+    @property
+    def glyph_names(self):
+        return self._glyph_names
+
+    ##############################################
+
+    def glyph_name(self, glyph_index):
+
+        return self._glyph_names[glyph_index]
+
+    ##############################################
+
+    def glyph_index(self, glyph_name):
+
+        """ Return the index of the glyph *glyph_name*, raise :exc:`KeyError` if it is unknown.  The
+        glyphs without metrics have an index greater or equal to :func:`len`.
+        """
+
+        if self._glyph_indexes is None:
+            self._glyph_indexes = {name:i for i, name in enumerate(self._glyph_names)}
+        return self._glyph_indexes[glyph_name]
+
+    ##############################################
+
+    def char_glyph_index(self, char_code):
+
+        """ Return the index of the glyph for the character code *char_code*, raise :exc:`KeyError`
+        if it is not encoded.
+        """
+
+        if self._char_glyph_indexes is None:
+            self._char_glyph_indexes = {char_code:i
+                                        for i, char_code in enumerate(self.char_codes.tolist())
+                                        if char_code != -1}
+        return self._char_glyph_indexes[char_code]
+
+    ##############################################
+
+    def kern(self, first_glyph, second_glyph):
+
+        """ Return the kern vector for the pair of glyph names, (0, 0) if there is no kern. """
+
+        if self._kern_table is None:
+            self._kern_table = {tuple(pair):i for i, pair in enumerate(self.kern_pairs.tolist())}
+        try:
+            pair = (self.glyph_index(first_glyph), self.glyph_index(second_glyph))
+            return tuple(self.kern_vectors[self._kern_table[pair]].tolist())
+        except KeyError:
+            return (0., 0.)
+
+    ##############################################
+
+    def ligature(self, first_glyph, second_glyph):
+
+        """ Return the name of the ligature for the pair of glyph names or :obj:`None`. """
+
+        try:
+            first_index = self.glyph_index(first_glyph)
+            second_index = self.glyph_index(second_glyph)
+        except KeyError:
+            return None
+        rows = np.flatnonzero((self.ligatures[:,0] == first_index) &
+                              (self.ligatures[:,1] == second_index))
+        if rows.size:
+            return self._glyph_names[self.ligatures[rows[0],2]]
+        else:
+            return None
+
+    ##############################################
+
+    def composite(self, glyph_name):
+
+        """ Return the list of the parts of the composite *glyph_name* as 3-tuples (part name,
+        x displacement, y displacement), raise :exc:`KeyError` if it is not a composite.
+        """
+
+        rows = np.flatnonzero(self.composite_glyphs == self.glyph_index(glyph_name))
+        if not rows.size:
+            raise KeyError(glyph_name)
+        i = rows[0]
+        start, stop = self.composite_part_starts[i:i+2]
+        return [(self._glyph_names[part], dx, dy)
+                for part, (dx, dy) in zip(self.composite_parts[start:stop].tolist(),
+                                          self.composite_part_displacements[start:stop].tolist())]
+
+    ##############################################
+
+    def memory_usage(self):
+
+        usage = sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+        usage += sum(sys.getsizeof(name) for name in self._glyph_names)
+        for name in self._array_names:
+            usage += getattr(self, name).nbytes
+
+        return usage
+
+    ##############################################
+
+    def print_summary(self):
+
+        string_format = '''AFM %s
+
+ - Version:          %s
+ - Font name:        %s
+ - Glyphs:           %u
+ - Ligatures:        %u
+ - Kern pairs:       %u
+ - Track kerns:      %u
+ - Composites:       %u'''
+
+        message = string_format % (self.filename,
+                                   self.version,
+                                   self.information.get('FontName'),
+                                   len(self),
+                                   self.ligatures.shape[0],
+                                   self.kern_pairs.shape[0],
+                                   self.track_kerns.shape[0],
+                                   self.composite_glyphs.size,
+                                   )
+
+        print_card(message)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -25,16 +25,26 @@ All measurements in AFM files are given in terms of units equal to 1/1000 of the
 size) of the font being used. To compute actual sizes in a document (in points; with 72 points = 1
 inch), these amounts should be multiplied by (scale factor of font) / 1000.
 
+The class :class:`AfmParser` checks the structure of an AFM file.  The class
+:class:`CompactAfmParser` tokenises the file in one pass and returns an :class:`PyDvi.Font.Afm.Afm`
+instance which stores the metrics in Numpy arrays.
+
 """
 
 ####################################################################################################
 
-# __all__ = []
+__all__ = ['AfmParser', 'CompactAfmParser', 'BadAfmFile']
 
 ####################################################################################################
 
 import logging
 
+import numpy as np
+
+####################################################################################################
+
+from .Afm import Afm
+
 ####################################################################################################
 
 _module_logger = logging.getLogger(__name__)
@@ -318,6 +328,279 @@ class AfmParser(object):
                     properties[key] = values
         return properties
 
+####################################################################################################
+
+class CompactAfmParser(object):
+
+    """ This class parses an AFM file to a :class:`PyDvi.Font.Afm.Afm` instance.
+
+    The file is tokenised in one pass, the character metrics are accumulated in lists which are
+    converted to Numpy arrays at the end.  The glyph names of the kern pairs, the ligatures and the
+    composites are resolved to glyph indexes once the character metrics are known.  The unknown keys
+    are ignored.
+    """
+
+    _logger = _module_logger.getChild('CompactAfmParser')
+
+    ##############################################
+
+    @classmethod
+    def parse(cls, filename):
+
+        """ Parse the AFM file *filename* and return a :class:`PyDvi.Font.Afm.Afm` instance. """
+
+        return cls(filename).afm
+
+    ##############################################
+
+    def __init__(self, filename):
+
+        self.filename = filename
+
+        self._glyph_names = []
+        self._glyph_indexes = {}
+        self._char_codes = []
+        self._advances = []
+        self._vertical_advances = []
+        self._bounding_boxes = []
+        self._ligatures = [] # names
+        self._kern_pairs = [] # names or codes
+        self._track_kerns = []
+        self._composites = [] # (name, [(part name, dx, dy), ...])
+        self._information = {}
+        self._direction = 0
+        self._char_widths = {}
+        self._version = None
+        self._char_code_indexes = None
+
+        with open(filename, 'rb') as f:
+            lines = f.read().splitlines()
+        self._parse(lines)
+        self.afm = self._make_afm()
+
+    ##############################################
+
+    def _parse(self, lines):
+
+        section_stack = []
+        section = None
+        parse_char_metrics = self._parse_char_metrics
+        for line in lines:
+            # most of the lines are character metrics
+            if section == 'CharMetrics' and (line[:2] == 'C ' or line[:3] == 'CH '):
+                parse_char_metrics(line)
+                continue
+            tokens = line.split()
+            if not tokens:
+                continue
+            key = tokens[0]
+            if key == 'Comment':
+                continue
+            elif key.startswith('Start'):
+                new_section = key[5:]
+                if section is None and new_section != 'FontMetrics':
+                    raise BadAfmFile("This file doesn't look like an AFM file")
+                section_stack.append(new_section)
+                section = new_section
+                if section == 'FontMetrics':
+                    self._version = tokens[1] if len(tokens) > 1 else None
+                elif section == 'Direction':
+                    self._direction = int(tokens[1])
+            elif key.startswith('End'):
+                if key[3:] != section:
+                    raise BadAfmFile("Misplaced end of section {}".format(key[3:]))
+                del section_stack[-1]
+                section = section_stack[-1] if section_stack else None
+            elif section is None:
+                raise BadAfmFile("This file doesn't look like an AFM file")
+            elif section == 'CharMetrics':
+                if key in character_metric_keys:
+                    parse_char_metrics(line)
+            elif section in ('KernPairs', 'KernPairs0', 'KernPairs1'):
+                self._parse_kern_pair(tokens)
+            elif section == 'TrackKern':
+                if key == 'TrackKern':
+                    self._track_kerns.append([float(x) for x in tokens[1:6]])
+            elif section == 'Composites':
+                self._parse_composite(line)
+            else:
+                self._parse_information(key, line[len(key):].strip())
+
+        if section_stack:
+            raise BadAfmFile("Section {} is not closed".format(section))
+
+    ##############################################
+
+    def _parse_information(self, key, value):
+
+        if key == 'CharWidth':
+            self._char_widths[self._direction] = [float(x) for x in value.split()]
+            return
+        value_type = global_font_information_keys.get(key)
+        if value_type is None:
+            return
+        elif isinstance(value_type, tuple):
+            self._information[key] = [data_type(x) for data_type, x in zip(value_type, value.split())]
+        elif value_type is str:
+            self._information[key] = value
+        else:
+            self._information[key] = value_type(value)
+
+    ##############################################
+
+    def _parse_char_metrics(self, line):
+
+        # The line is split once in tokens and the fields are walked, each field ends by a ';'
+        char_code = -1
+        advance = None
+        vertical_advance = None
+        bounding_box = (0., 0., 0., 0.)
+        glyph_name = None
+        ligatures = None
+        tokens = line.split()
+        number_of_tokens = len(tokens)
+        i = 0
+        while i < number_of_tokens:
+            key = tokens[i]
+            if key == 'C':
+                char_code = int(tokens[i+1])
+            elif key == 'N':
+                glyph_name = tokens[i+1]
+            elif key == 'B':
+                bounding_box = (float(tokens[i+1]), float(tokens[i+2]),
+                                float(tokens[i+3]), float(tokens[i+4]))
+            elif key == 'WX' or key == 'W0X':
+                advance = (float(tokens[i+1]), advance[1] if advance else 0.)
+            elif key == 'CH':
+                char_code = hex(tokens[i+1])
+            elif key == 'WY' or key == 'W0Y':
+                advance = (advance[0] if advance else 0., float(tokens[i+1]))
+            elif key == 'W' or key == 'W0':
+                advance = (float(tokens[i+1]), float(tokens[i+2]))
+            elif key == 'W1X':
+                vertical_advance = (float(tokens[i+1]), vertical_advance[1] if vertical_advance else 0.)
+            elif key == 'W1Y':
+                vertical_advance = (vertical_advance[0] if vertical_advance else 0., float(tokens[i+1]))
+            elif key == 'W1':
+                vertical_advance = (float(tokens[i+1]), float(tokens[i+2]))
+            elif key == 'L':
+                if ligatures is None:
+                    ligatures = []
+                ligatures.append((tokens[i+1], tokens[i+2]))
+            # skip to the next field
+            i += 1
+            while i < number_of_tokens and tokens[i] != ';':
+                i += 1
+            i += 1
+
+        if glyph_name is None:
+            # CID fonts identify the glyphs by their code
+            glyph_name = str(char_code)
+        self._glyph_indexes[glyph_name] = len(self._glyph_names)
+        self._glyph_names.append(glyph_name)
+        self._char_codes.append(char_code)
+        self._advances.append(advance)
+        self._vertical_advances.append(vertical_advance)
+        self._bounding_boxes.append(bounding_box)
+        if ligatures is not None:
+            for successor, ligature in ligatures:
+                self._ligatures.append((glyph_name, successor, ligature))
+
+    ##############################################
+
+    def _parse_kern_pair(self, tokens):
+
+        key = tokens[0]
+        if key == 'KPX':
+            self._kern_pairs.append((tokens[1], tokens[2], float(tokens[3]), 0.))
+        elif key == 'KPY':
+            self._kern_pairs.append((tokens[1], tokens[2], 0., float(tokens[3])))
+        elif key == 'KP':
+            self._kern_pairs.append((tokens[1], tokens[2], float(tokens[3]), float(tokens[4])))
+        elif key == 'KPH':
+            self._kern_pairs.append((hex(tokens[1]), hex(tokens[2]),
+                                     float(tokens[3]), float(tokens[4])))
+
+    ##############################################
+
+    def _parse_composite(self, line):
+
+        glyph_name = None
+        parts = []
+        for field in line.split(';'):
+            tokens = field.split()
+            if not tokens:
+                continue
+            key = tokens[0]
+            if key == 'CC':
+                glyph_name = tokens[1]
+            elif key == 'PCC':
+                parts.append((tokens[1], float(tokens[2]), float(tokens[3])))
+        if glyph_name is not None:
+            self._composites.append((glyph_name, parts))
+
+    ##############################################
+
+    def _glyph_index(self, glyph):
+
+        """ Return the index of the glyph *glyph* given by name or by code, the unknown glyph names
+        are appended to the glyph names.
+        """
+
+        if isinstance(glyph, int):
+            # KPH kern pairs
+            if self._char_code_indexes is None:
+                self._char_code_indexes = {char_code:i for i, char_code in enumerate(self._char_codes)}
+            index = self._char_code_indexes.get(glyph)
+            if index is not None:
+                return index
+            glyph = str(glyph)
+        index = self._glyph_indexes.get(glyph)
+        if index is None:
+            index = self._glyph_indexes[glyph] = len(self._glyph_names)
+            self._glyph_names.append(glyph)
+        return index
+
+    ##############################################
+
+    def _make_afm(self):
+
+        glyph_index = self._glyph_index
+
+        def default_advance(advances, direction):
+            # the glyphs without width use the CharWidth of the direction
+            default = self._char_widths.get(direction, (0., 0.))
+            return [advance if advance is not None else default for advance in advances]
+
+        arrays = {
+            'char_codes':np.array(self._char_codes, dtype=np.int32),
+            'advances':np.array(default_advance(self._advances, 0), dtype=np.float32).reshape(-1, 2),
+            'vertical_advances':np.array(default_advance(self._vertical_advances, 1),
+                                         dtype=np.float32).reshape(-1, 2),
+            'bounding_boxes':np.array(self._bounding_boxes, dtype=np.float32).reshape(-1, 4),
+            'ligatures':np.array([[glyph_index(name) for name in ligature]
+                                  for ligature in self._ligatures], dtype=np.int32).reshape(-1, 3),
+            'kern_pairs':np.array([(glyph_index(first), glyph_index(second))
+                                   for first, second, dx, dy in self._kern_pairs],
+                                  dtype=np.int32).reshape(-1, 2),
+            'kern_vectors':np.array([(dx, dy) for first, second, dx, dy in self._kern_pairs],
+                                    dtype=np.float32).reshape(-1, 2),
+            'track_kerns':np.array(self._track_kerns, dtype=np.float32).reshape(-1, 5),
+            'composite_glyphs':np.array([glyph_index(name) for name, parts in self._composites],
+                                        dtype=np.int32),
+            'composite_part_starts':np.cumsum([0] + [len(parts) for name, parts in self._composites],
+                                              dtype=np.int32),
+            'composite_parts':np.array([glyph_index(part)
+                                        for name, parts in self._composites
+                                        for part, dx, dy in parts], dtype=np.int32),
+            'composite_part_displacements':np.array([(dx, dy)
+                                                     for name, parts in self._composites
+                                                     for part, dx, dy in parts],
+                                                    dtype=np.float32).reshape(-1, 2),
+            }
+
+        return Afm(self.filename, self._version, self._information, self._glyph_names, **arrays)
+
 ####################################################################################################
 #
 # End
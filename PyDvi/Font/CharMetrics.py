@@ -0,0 +1,172 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module provides the character metrics used to lay out the characters.
+
+A :class:`CharMetrics` instance stores the width, the height and the depth of the characters of a
+font in arrays indexed by the character code.  The dimensions are given in units of the design
+size, as in a TFM file, thus the dimensions in scaled points of a character are obtained by
+multiplying them by the scale factor of the DVI font.
+
+The metrics of a font are given by :attr:`PyDvi.Font.Font.metrics`.  They are filled from the TFM
+file when it is available, otherwise from the AFM file or from the outlines of the glyphs for a
+Type 1 font, cf. :meth:`CharMetrics.from_afm` and :meth:`CharMetrics.from_face`, and from the
+character packets for a packed font.  Thus the DVI machine lays out the characters without
+rasterising the glyphs.
+
+"""
+
+####################################################################################################
+
+__all__ = ['CharMetrics']
+
+####################################################################################################
+
+import numpy as np
+
+import freetype
+
+####################################################################################################
+
+class CharMetrics(object):
+
+    """ This class stores the metrics of the characters of a font.
+
+    Public attributes:
+
+      :attr:`source`
+        origin of the metrics: "tfm", "afm", "freetype" or "pk"
+
+      :attr:`widths`
+
+      :attr:`heights`
+
+      :attr:`depths`
+
+    The missing characters have null dimensions.
+    """
+
+    ##############################################
+
+    def __init__(self, source, widths, heights, depths):
+
+        self.source = source
+        self.widths = np.asarray(widths, dtype=np.float64)
+        self.heights = np.asarray(heights, dtype=np.float64)
+        self.depths = np.asarray(depths, dtype=np.float64)
+
+        self._scaled_dimensions = {}
+
+    ##############################################
+
+    def __len__(self):
+
+        return self.widths.size
+
+    ##############################################
+
+    @classmethod
+    def from_tfm(cls, tfm):
+
+        """ Return the metrics of the :class:`PyDvi.Font.Tfm.Tfm` instance *tfm*. """
+
+        size = tfm.largest_character_code +1
+        widths, heights, depths = np.zeros((3, size))
+        for char_code in xrange(tfm.smallest_character_code, size):
+            tfm_char = tfm[char_code]
+            widths[char_code] = tfm_char.width
+            heights[char_code] = tfm_char.height
+            depths[char_code] = tfm_char.depth
+
+        return cls('tfm', widths, heights, depths)
+
+    ##############################################
+
+    @classmethod
+    def from_afm(cls, afm, afm_glyph_indexes):
+
+        """ Return the metrics from the :class:`PyDvi.Font.Afm.Afm` instance *afm*.  The array
+        *afm_glyph_indexes* gives the AFM glyph index of each character code, -1 for a missing
+        character.  The glyphs which are only named by the kern pairs, the ligatures or the composites
+        don't have metrics and are missing too.
+        """
+
+        afm_glyph_indexes = np.asarray(afm_glyph_indexes)
+        exists = (afm_glyph_indexes >= 0) & (afm_glyph_indexes < len(afm))
+        glyph_indexes = afm_glyph_indexes[exists]
+        # AFM dimensions are given in 1/1000 of the font size
+        widths, heights, depths = np.zeros((3, afm_glyph_indexes.size))
+        widths[exists] = afm.advances[glyph_indexes,0] / 1000.
+        heights[exists] = np.maximum(afm.bounding_boxes[glyph_indexes,3], 0) / 1000.
+        depths[exists] = np.maximum(-afm.bounding_boxes[glyph_indexes,1], 0) / 1000.
+
+        return cls('afm', widths, heights, depths)
+
+    ##############################################
+
+    @classmethod
+    def from_face(cls, face, glyph_indexes):
+
+        """ Return the metrics from the outlines of the FreeType face *face*.  The array
+        *glyph_indexes* gives the glyph index of each character code, 0 for a missing character.
+        The glyphs are loaded unscaled and are not rendered.
+        """
+
+        units_per_em = float(face.units_per_EM)
+        widths, heights, depths = np.zeros((3, len(glyph_indexes)))
+        for char_code, glyph_index in enumerate(glyph_indexes):
+            if glyph_index:
+                face.load_glyph(int(glyph_index), freetype.FT_LOAD_NO_SCALE)
+                metrics = face.glyph.metrics
+                widths[char_code] = metrics.horiAdvance
+                heights[char_code] = max(metrics.horiBearingY, 0)
+                depths[char_code] = max(metrics.height - metrics.horiBearingY, 0)
+
+        return cls('freetype', widths / units_per_em, heights / units_per_em, depths / units_per_em)
+
+    ##############################################
+
+    def scaled_dimensions(self, scale_factor):
+
+        """ Return the 3-tuple made of the lists of the scaled widths, heights and depths by
+        *scale_factor*, truncated to integers as :meth:`PyDvi.Font.Tfm.TfmChar.scaled_width`.  The
+        lists are cached for each scale factor.
+        """
+
+        dimensions = self._scaled_dimensions.get(scale_factor)
+        if dimensions is None:
+            dimensions = tuple((array * scale_factor).astype(np.int64).tolist()
+                               for array in (self.widths, self.heights, self.depths))
+            self._scaled_dimensions[scale_factor] = dimensions
+        return dimensions
+
+    ##############################################
+
+    def memory_usage(self):
+
+        return self.widths.nbytes + self.heights.nbytes + self.depths.nbytes
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
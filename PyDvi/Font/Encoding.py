@@ -71,14 +71,24 @@ and reciprocally::
   'eth'
 
 The methods :meth:`to_index` and :meth:`to_name` are used internally for this purpose.
+
+The same encoding files are used by many font map entries, thus the function :func:`load_encoding`
+locates an encoding file using Kpathsea and parses it once per process::
+
+  encoding = load_encoding('8r.enc')
 """
 
 ####################################################################################################
 
-__all__ = ['Encoding']
+__all__ = ['Encoding', 'load_encoding']
+
+####################################################################################################
+
+import threading
 
 ####################################################################################################
 
+from ..Kpathsea import kpsewhich
 from ..Tools.Logging import print_card
 from ..Tools.TexCommentedFile import TexCommentedFile
 
@@ -185,6 +195,26 @@ class Encoding(object):
 
         print_card(message)
 
+####################################################################################################
+
+_encodings = {} # encoding filename -> Encoding instance
+_encodings_lock = threading.Lock()
+
+def load_encoding(encoding_filename):
+
+    """ Return the :class:`Encoding` instance for the encoding file *encoding_filename*, e.g.
+    "8r.enc".  The file is located using Kpathsea and the instances are cached process-wide.
+    """
+
+    with _encodings_lock:
+        encoding = _encodings.get(encoding_filename)
+        if encoding is None:
+            filename = kpsewhich(encoding_filename)
+            if filename is None:
+                raise NameError("Encoding file %s not found" % (encoding_filename))
+            encoding = _encodings[encoding_filename] = Encoding(filename)
+        return encoding
+
 ####################################################################################################
 #
 # End
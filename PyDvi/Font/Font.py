@@ -37,13 +37,15 @@ __all__ = ['Font', 'font_types', 'sort_font_class']
 ####################################################################################################
 
 import os
+import threading
 
 ####################################################################################################
 
 from ..Kpathsea import kpsewhich
 from ..Tools.EnumFactory import EnumFactory
 from ..Tools.Logging import print_card
-from .TfmParser import TfmParser
+from .CharMetrics import CharMetrics
+from .FontCache import font_cache
 
 ####################################################################################################
 
@@ -100,6 +102,10 @@ class Font(object):
 
         self.font_manager = font_manager
         self.id = font_id # Fixme: ask the font_manager
+        self._metrics = None
+        # The fonts are shared by the threads, cf. PyDvi.Font.FontRegistry, this lock serialises the
+        # accesses to the font file and to the FreeType face
+        self._lock = threading.RLock()
         self.name, extension = os.path.splitext(name)
         # Fixme: extension = '' for pk
         # if extension != '.' + self.extension:
@@ -136,7 +142,58 @@ class Font(object):
             # raise FontMetricNotFound("TFM file was not found for font {}".format(self.name))
             self.tfm = None
         else:
-            self.tfm = TfmParser.parse(self.name, tfm_file)
+            self.tfm = font_cache.load_tfm(self.name, tfm_file)
+
+    ##############################################
+
+    @property
+    def metrics(self):
+
+        """ The :class:`PyDvi.Font.CharMetrics.CharMetrics` instance of the font, it is built on the
+        first access.
+        """
+
+        if self._metrics is None:
+            with self._lock:
+                if self._metrics is None:
+                    self._metrics = self._make_metrics()
+        return self._metrics
+
+    ##############################################
+
+    def _make_metrics(self):
+
+        """ Return the character metrics of the font, the subclasses can provide other sources than
+        the TFM.
+        """
+
+        if self.tfm is not None:
+            return CharMetrics.from_tfm(self.tfm)
+        else:
+            raise FontMetricNotFound("No metrics found for font {}".format(self.name))
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return an estimate of the memory held by the font in bytes. """
+
+        memory_usage = 0
+        if self.tfm is not None:
+            memory_usage += self.tfm.memory_usage()
+        if self._metrics is not None:
+            memory_usage += self._metrics.memory_usage()
+        return memory_usage
+
+    ##############################################
+
+    def close(self):
+
+        """ Release the resources held by the font, for example the glyphs and the open files.  The
+        font remains usable: they are reloaded transparently on the next access.
+        """
+
+        pass
 
     ##############################################
 
@@ -154,6 +211,19 @@ class Font(object):
 
     ##############################################
 
+    def rasterise(self, char_codes, size, resolution=600, pool=None):
+
+        """ Prepare in a batch the glyphs for the char codes *char_codes* at the size *size* in pt
+        and the resolution *resolution* in dpi, using the
+        :class:`PyDvi.Font.RasteriserPool.RasteriserPool` instance *pool* if it is given.  Backends
+        call this method with the characters of a page before to paint them, the default
+        implementation does nothing.
+        """
+
+        pass
+
+    ##############################################
+
     def print_header(self):
 
         string_format = """%s %s
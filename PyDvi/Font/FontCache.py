@@ -0,0 +1,245 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module implements a disk cache of the compiled font data.
+
+Parsing the TFM and virtual font files is done by each process, although the same fonts are used
+again and again.  The :class:`FontCache` stores the parsed data in the cache directory, cf.
+:mod:`PyDvi.Tools.Cache`, using the memory mappable format of :func:`PyDvi.Tools.Cache.dump_arrays`.
+Thus loading a font which is in the cache only requires to map a file.
+
+A cache entry is identified by the kind of data and the absolute path of the source file, and it is
+valid as long as the modification time and the size of the source file are unchanged.  A checksum
+of the content is not used, since it would require to read the source file at each load, e.g. a
+font map of several megabytes.  Entries are written atomically so as many processes can share the
+cache, and the least recently used entries are removed when the cache exceeds
+:attr:`FontCache.max_size`.
+
+The packed fonts are not cached, their lazy parser only reads the packet headers and maps the file,
+cf. :class:`PyDvi.Font.PkFont.PkFont`.
+
+The module instance :data:`font_cache` is used by :class:`PyDvi.Font.Font` to load the TFM files,
+by :class:`PyDvi.Font.VirtualFont` to load the virtual font files, by
+:class:`PyDvi.Font.FontMap` to load the line index of the font maps and by
+:class:`PyDvi.Font.Type1Font` to load the AFM files.
+"""
+
+####################################################################################################
+
+__all__ = ['FontCache', 'font_cache']
+
+####################################################################################################
+
+import hashlib
+import logging
+import os
+
+####################################################################################################
+
+from ..Tools.Cache import cache_directory, file_stamp, dump_arrays, load_arrays, evict_files
+from .Afm import Afm
+from .AfmParser import CompactAfmParser
+from .Tfm import CompactTfm
+from .TfmParser import CompactTfmParser
+from .VirtualFontParser import VirtualFontParser
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class FontCache(object):
+
+    """ This class implements a disk cache of compiled font data.
+
+    Public attributes:
+
+      :attr:`max_size`
+        maximum size of the cache in bytes
+
+      :attr:`number_of_hits`
+
+      :attr:`number_of_misses`
+    """
+
+    _logger = _module_logger.getChild('FontCache')
+
+    #: Version of the cache entries, it must be incremented when their content changes
+    version = 2
+
+    ##############################################
+
+    def __init__(self, max_size=256*1024**2):
+
+        self.max_size = max_size
+        self._directory = None
+        self._directory_resolved = False
+
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+    ##############################################
+
+    @property
+    def directory(self):
+
+        """ Cache directory or :obj:`None` if the disk caches are disabled. """
+
+        if not self._directory_resolved:
+            self._directory = cache_directory('fonts')
+            self._directory_resolved = True
+        return self._directory
+
+    ##############################################
+
+    def _cache_filename(self, kind, filename):
+
+        stem = os.path.splitext(os.path.basename(filename))[0]
+        digest = hashlib.sha1(filename).hexdigest()[:16]
+        return os.path.join(self.directory, '{}-{}.{}'.format(stem, digest, kind))
+
+    ##############################################
+
+    def load(self, kind, filename):
+
+        """ Return the 2-tuple made of the metadata and the arrays cached for the *kind* data of the
+        file *filename*, or :obj:`None` if the entry is missing or stale.
+        """
+
+        if self.directory is None:
+            return None
+
+        filename = os.path.abspath(filename)
+        stamp = file_stamp(filename)
+        if stamp is None:
+            # the source file was removed
+            self.number_of_misses += 1
+            return None
+        cache_filename = self._cache_filename(kind, filename)
+        data = load_arrays(cache_filename)
+        if data is not None:
+            header, arrays = data
+            if (header.get('version') == self.version and
+                header.get('source') == filename and
+                header.get('stamp') == list(stamp)):
+                try:
+                    # The modification time of the entry records its last use for the eviction
+                    os.utime(cache_filename, None)
+                except OSError:
+                    pass
+                self.number_of_hits += 1
+                return header['metadata'], arrays
+
+        self.number_of_misses += 1
+        return None
+
+    ##############################################
+
+    def save(self, kind, filename, metadata, arrays):
+
+        """ Store the *kind* data of the file *filename*, the JSON serialisable *metadata* and the
+        dictionary of arrays *arrays*, then evict the least recently used entries if the cache is
+        too large.
+        """
+
+        if self.directory is None:
+            return
+
+        filename = os.path.abspath(filename)
+        header = {'version':self.version,
+                  'source':filename,
+                  'stamp':file_stamp(filename),
+                  'metadata':metadata,
+                  }
+        try:
+            dump_arrays(self._cache_filename(kind, filename), header, arrays)
+            evict_files(self.directory, self.max_size)
+        except (IOError, OSError) as exception:
+            self._logger.warning("Cannot write the font cache: {}".format(exception))
+
+    ##############################################
+
+    def load_tfm(self, font_name, filename):
+
+        """ Return the :class:`PyDvi.Tfm.CompactTfm` instance for the TFM file *filename* of the font
+        *font_name*.
+        """
+
+        data = self.load('tfm', filename)
+        if data is not None:
+            metadata, arrays = data
+            return CompactTfm.from_arrays(font_name, filename, metadata, arrays)
+        else:
+            tfm = CompactTfmParser.parse(font_name, filename)
+            self.save('tfm', filename, *tfm.to_arrays())
+            return tfm
+
+    ##############################################
+
+    def load_afm(self, filename):
+
+        """ Return the :class:`PyDvi.Font.Afm.Afm` instance for the AFM file *filename*. """
+
+        data = self.load('afm', filename)
+        if data is not None:
+            return Afm.from_arrays(filename, *data)
+        else:
+            afm = CompactAfmParser.parse(filename)
+            self.save('afm', filename, *afm.to_arrays())
+            return afm
+
+    ##############################################
+
+    def load_virtual_font(self, virtual_font):
+
+        """ Load the data of the :class:`PyDvi.Font.VirtualFont` instance *virtual_font*. """
+
+        data = self.load('vf', virtual_font.filename)
+        if data is not None:
+            virtual_font.from_arrays(*data)
+        else:
+            VirtualFontParser.parse(virtual_font)
+            self.save('vf', virtual_font.filename, *virtual_font.to_arrays())
+
+    ##############################################
+
+    def load_font_map_index(self, font_map):
+
+        """ Load the line index of the :class:`PyDvi.Font.FontMap` instance *font_map*. """
+
+        data = self.load('map', font_map.filename)
+        if data is not None:
+            font_map.from_arrays(*data)
+        else:
+            font_map.index()
+            self.save('map', font_map.filename, *font_map.to_arrays())
+
+####################################################################################################
+
+font_cache = FontCache()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -49,10 +49,40 @@ Then to load for example the "cmr10" font and get the font class instance do::
 
 Latter the same piece of codes could be use to retrieve the font class instance.
 
+When the list of the fonts is known in advance, for example from the postamble of a DVI file, the
+font files can be resolved in one :command:`kpsewhich` round trip per file format using::
+
+  font_manager.resolve_fonts(('cmr10', 'cmmi10', 'cmsy10'))
+
 To get the number of fonts in the font manager use the :func:`len` function::
 
   len(font_manager)
 
+The font manager memoises the outcome of each font resolution: the loader which succeeded, so as a
+font is never resolved twice, or the failure, which is cached during *failure_ttl* seconds.  The
+attributes :attr:`number_of_hits`, :attr:`number_of_misses` and :attr:`number_of_failures` count the
+lookups.
+
+The fonts and the font maps are shared by all the font managers of the process, cf.
+:mod:`PyDvi.Font.FontRegistry`, thus a font is loaded once even if many documents are processed by
+different font managers and DVI machines.  A font manager holds a reference on the fonts it has
+looked up until it is closed::
+
+  with FontManager('pdftex') as font_manager:
+      ...
+
+A long running process which sees many documents can bound the fonts held by a font manager using
+the parameters *max_fonts* and *max_bytes*.  The least recently used fonts are then released and
+closed, a font which is looked up again is reloaded transparently.  The memory held by the fonts
+is given by :meth:`FontManager.memory_usage`, and by :meth:`PyDvi.Font.Font.memory_usage` for each
+font.
+
+When the packed fonts are used, the missing packed font files are generated by Metafont, which can
+block for seconds per font.  If a :class:`PyDvi.Font.PkGenerator.PkGenerator` instance is given by
+the parameter *pk_generator*, the files are generated in the background and the fonts are
+placeholders until they are ready, cf. :attr:`PyDvi.Font.PkFont.PkFont.is_ready`.  In this case the
+virtual fonts are tried first, since they cannot be generated.
+
 """
 
 ####################################################################################################
@@ -61,14 +91,18 @@ __all__ = ['FontManager']
 
 ####################################################################################################
 
+import collections
 import logging
+import os
+import time
 
 ####################################################################################################
 
-from ..Kpathsea import kpsewhich
+from ..Kpathsea import kpsewhich, kpsewhich_many
 from ..Tools.FuncTools import get_filename_extension
+from .Encoding import load_encoding
 from .Font import font_types, sort_font_class, FontNotFound
-from .FontMap import FontMap
+from .FontRegistry import font_registry
 from .PkFont import PkFont
 from .Type1Font import Type1Font
 from .VirtualFont import VirtualFont
@@ -93,16 +127,42 @@ class FontManager(object):
 
     ##############################################
 
-    def __init__(self, font_map, use_pk=False):
+    def __init__(self, font_map, use_pk=False, failure_ttl=60, registry=None,
+                 max_fonts=None, max_bytes=None, pk_generator=None):
 
-        """The parameter *font_map* specifies the name of a font map.
+        """The parameter *font_map* specifies the name of a font map.  A font which cannot be loaded is
+        not looked up again during *failure_ttl* seconds.  The fonts are shared through the
+        :class:`PyDvi.Font.FontRegistry.FontRegistry` instance *registry*, by default the process
+        wide :data:`PyDvi.Font.FontRegistry.font_registry`.  If *max_fonts* or *max_bytes* are set,
+        the least recently used fonts are unloaded when the font manager holds more fonts or more
+        memory.  The missing packed fonts are generated by the
+        :class:`PyDvi.Font.PkGenerator.PkGenerator` instance *pk_generator* if it is given.
 
         """
 
         self._use_pk = use_pk
-
-        self._fonts = {}
-        self._last_font_id = 0
+        self._pk_generator = pk_generator
+        self._failure_ttl = failure_ttl
+        self._registry = registry if registry is not None else font_registry
+        self.max_fonts = max_fonts
+        self.max_bytes = max_bytes
+
+        self._fonts = collections.OrderedDict() # in least recently used order
+        self._references = {} # font name -> number of references held by the DVI machines
+        self._loaders = {} # font name -> loader which succeeded
+        self._failures = {} # font name -> (time, exception)
+
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+        self.number_of_failures = 0
+        self.number_of_evictions = 0
+
+        if self._use_pk and self._pk_generator is not None:
+            self._font_loaders = (self._load_virtual_font, self._load_pk_font)
+        elif self._use_pk:
+            self._font_loaders = (self._load_pk_font, self._load_virtual_font)
+        else:
+            self._font_loaders = (self._load_mapped_font, self._load_virtual_font)
 
         self._load_font_map(font_map)
 
@@ -114,12 +174,43 @@ class FontManager(object):
 
         font_map_file = kpsewhich(font_map, file_format='map')
         if font_map_file is not None:
-            self._font_map = FontMap(font_map_file)
+            self._font_map = self._registry.load_font_map(font_map_file)
         else:
             raise NameError("Font map %s not found" % (font_map)) 
 
     ##############################################
 
+    def __enter__(self):
+
+        return self
+
+    ##############################################
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    ##############################################
+
+    def close(self):
+
+        """ Release the fonts held by the font manager. """
+
+        for font_name in self._fonts:
+            self._registry.release(self._registry_key(font_name))
+        self._fonts.clear()
+        self._references.clear()
+
+    ##############################################
+
+    def _registry_key(self, font_name):
+
+        """ Return the key of the font *font_name* in the font registry. """
+
+        return (self._font_map.filename, self._use_pk, font_name)
+
+    ##############################################
+
     def __contains__(self, font_name):
 
         """ Return :obj:`True` if the font manager holds the font *font_name*. """
@@ -128,46 +219,214 @@ class FontManager(object):
 
     ##############################################
 
+    def __len__(self):
+
+        """ Return the number of fonts. """
+
+        return len(self._fonts)
+
+    ##############################################
+
     def __getitem__(self, font_name):
 
         """Return the font *font_name* instance.  If the font is not in the font manager then the font is
-        loaded.
+        loaded, else raise :exc:`FontNotFound`.
 
         """
 
-        if font_name in self:
-            font = self._fonts[font_name]
+        font = self._fonts.pop(font_name, None)
+        if font is not None:
+            # move the font at the most recently used end
+            self._fonts[font_name] = font
+            self.number_of_hits += 1
+            return font
+
+        failure = self._failures.get(font_name)
+        if failure is not None:
+            failure_time, exception = failure
+            if time.time() - failure_time < self._failure_ttl:
+                self.number_of_failures += 1
+                raise exception
+            else:
+                del self._failures[font_name]
+
+        self.number_of_misses += 1
+        try:
+            font = self._registry.acquire(self._registry_key(font_name),
+                                          lambda: self._load(font_name))
+            self._fonts[font_name] = font
+        except FontNotFound as exception:
+            self.number_of_failures += 1
+            self._failures[font_name] = (time.time(), exception)
+            raise
+
+        self.shrink()
+
+        return font
+
+    ##############################################
+
+    def acquire(self, font_name):
+
+        """ Return the font *font_name* like :meth:`__getitem__` and hold a reference on it, thus the
+        font is not unloaded by :meth:`shrink` until it is released by :meth:`release`.
+        """
+
+        font = self[font_name]
+        self._references[font_name] = self._references.get(font_name, 0) + 1
+        return font
+
+    ##############################################
+
+    def release(self, font_name):
+
+        """ Release a reference on the font *font_name* acquired by :meth:`acquire`. """
+
+        reference_count = self._references.get(font_name, 0) - 1
+        if reference_count > 0:
+            self._references[font_name] = reference_count
         else:
-            # Fixme: why code differs?
+            self._references.pop(font_name, None)
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory held by the fonts in bytes, cf. :meth:`PyDvi.Font.Font.memory_usage`. """
+
+        return sum(font.memory_usage() for font in self._fonts.itervalues())
+
+    ##############################################
+
+    def shrink(self):
+
+        """ Unload the least recently used fonts until the limits *max_fonts* and *max_bytes* are
+        respected.  The most recently used font and the fonts acquired by the DVI machines are
+        always kept.  A font is closed unless it is used by another font manager.
+        """
+
+        if self.max_fonts is not None:
+            while len(self._fonts) > max(self.max_fonts, 1):
+                if self._unload_least_recently_used_font() is None:
+                    break
+
+        if self.max_bytes is not None:
+            memory_usage = self.memory_usage()
+            while memory_usage > self.max_bytes and len(self._fonts) > 1:
+                font_memory_usage = self._unload_least_recently_used_font()
+                if font_memory_usage is None:
+                    break
+                memory_usage -= font_memory_usage
+
+    ##############################################
+
+    def _unload_least_recently_used_font(self):
+
+        """ Unload the least recently used font which is not referenced and return the memory it was
+        holding, else return :obj:`None`.
+        """
+
+        # the most recently used font is kept
+        for font_name in list(self._fonts)[:-1]:
+            if font_name not in self._references:
+                break
+        else:
+            return None
+
+        font = self._fonts.pop(font_name)
+        memory_usage = font.memory_usage()
+        key = self._registry_key(font_name)
+        self._registry.release(key)
+        self._registry.evict(key)
+        self.number_of_evictions += 1
+        self._logger.debug("Unload font {}".format(font_name))
+
+        return memory_usage
+
+    ##############################################
+
+    def _load(self, font_name):
+
+        """ Load the font *font_name* using the loader which succeeded the last time, else try the
+        loaders in turn.  We try to load a virtual font as a last resort.
+        """
+
+        loader = self._loaders.get(font_name)
+        if loader is not None:
+            return loader(font_name)
+
+        for loader in self._font_loaders:
             try:
-                if self._use_pk:
-                    font = self._load_font(font_types.Pk, font_name)
-                else:
-                    font = self._fonts[font_name] = self._load_mapped_font(font_name)
-            except FontNotFound:
-                # We try to load a virtual font as a last resort
-                font = self._fonts[font_name] = self._load_virtual_font(font_name)
+                font = loader(font_name)
+            except FontNotFound as exception:
+                self._logger.debug(str(exception))
+                continue
+            self._loaders[font_name] = loader
+            return font
+        raise exception
 
-        return font
+    ##############################################
+
+    def resolve_fonts(self, font_names):
+
+        """Resolve the files of the fonts *font_names* using one :command:`kpsewhich` process per file
+        format.  The results are stored in the Kpathsea cache, thus the fonts can be loaded latter
+        without running a process for each lookup.
+
+        """
+
+        font_names = [font_name for font_name in font_names
+                      if font_name not in self and self._registry_key(font_name) not in self._registry]
+        if not font_names:
+            return
+
+        metric_names = list(font_names)
+        if self._use_pk and self._pk_generator is not None:
+            # the missing files are generated in the background
+            kpsewhich_many([font_name + '.' + extension
+                            for font_name in font_names
+                            for extension in (VirtualFont.extension, PkFont.extension)])
+        elif self._use_pk:
+            kpsewhich_many([font_name + '.' + PkFont.extension for font_name in font_names],
+                           options='-mktex=pk')
+        else:
+            # Mapped Type 1 fonts and virtual fonts as last resort
+            filenames = []
+            for font_name in font_names:
+                try:
+                    filename = self._font_map[font_name].pfb_filename
+                except KeyError:
+                    filename = None
+                if filename is not None:
+                    filenames.append(filename)
+                    metric_names.append(os.path.splitext(filename)[0])
+                else:
+                    filenames.append(font_name + '.' + VirtualFont.extension)
+            kpsewhich_many(filenames)
+        kpsewhich_many(metric_names, file_format='tfm')
 
     ##############################################
 
     def _get_new_font_id(self):
 
-        """ Return a new font id. """
-
-        self._last_font_id += 1
+        """ Return a new font id, unique in the process. """
 
-        return self._last_font_id
+        return self._registry.new_font_id()
 
     ##############################################
 
-    def _load_font(self, font_type, font_name):
+    def _load_font(self, font_type, font_name, **kwargs):
 
         """ Load the font *font_name* using the *font_type* plugin. """
 
         font_class = self._font_classes[font_type]
-        return font_class(self, self._get_new_font_id(), font_name)
+        return font_class(self, self._get_new_font_id(), font_name, **kwargs)
+
+    ##############################################
+
+    def _load_pk_font(self, tex_font_name):
+
+        return self._load_font(font_types.Pk, tex_font_name, pk_generator=self._pk_generator)
 
     ##############################################
   
@@ -184,11 +443,22 @@ class FontManager(object):
             # font_map_entry.print_summary()
             filename = font_map_entry.pfb_filename
             font_class = self._get_font_class_by_filename(filename)
-            self._logger.debug("Font %s is mapped to %s" % (tex_font_name, filename))
-            return font_class(self, self._get_new_font_id(), filename)
         except KeyError:
             raise FontNotFound("Could not found a mapped font for %s" % (tex_font_name))
 
+        self._logger.debug("Font %s is mapped to %s" % (tex_font_name, filename))
+        if font_map_entry.encoding is not None:
+            # the encodings are shared by many entries and are parsed once
+            try:
+                encoding = load_encoding(font_map_entry.encoding)
+            except NameError as exception:
+                # fall back to the built-in encoding of the font
+                self._logger.warning("{}, font {} uses its built-in encoding".format(exception,
+                                                                                   tex_font_name))
+            else:
+                return font_class(self, self._get_new_font_id(), filename, encoding=encoding)
+        return font_class(self, self._get_new_font_id(), filename)
+
     ##############################################
   
     def _load_virtual_font(self, tex_font_name):
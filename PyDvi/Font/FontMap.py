@@ -75,6 +75,12 @@ The ``.pfb`` file name and the other parameters are stored as attributes::
   >>> font_map_entry.pfb_filename
   'putb8a.pfb'
 
+A font map like :file:`pdftex.map` has thousands of entries, but a document only uses a few fonts.
+Thus by default the font map is only indexed: a regular expression is run over the mapped file to
+record the TeX name and the offset of each line, and an entry is parsed the first time it is looked
+up.  The index is stored in the font cache, cf. :mod:`PyDvi.Font.FontCache`.  The parameter *lazy*
+set to :obj:`False` parses all the entries at once.
+
 """
 
 ####################################################################################################
@@ -83,12 +89,22 @@ __all__ = ['FontMap', 'FontMapEntry']
 
 ####################################################################################################
 
+import logging
+import mmap
 import os
+import re
+
+import numpy as np
 
 ####################################################################################################
 
 from ..Tools.Logging import print_card
 from ..Tools.TexCommentedFile import TexCommentedFile
+from .FontCache import font_cache
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
@@ -149,31 +165,164 @@ class FontMapEntry(object):
 
 class FontMap(object):
 
-    """ This class parses a font map file. """
+    """ This class parses a font map file.
+
+    If *lazy* is set then the file is only indexed and the entries are parsed on lookup.
+    """
+
+    _logger = _module_logger.getChild('FontMap')
+
+    # Match the first word of the lines which are not a comment
+    _line_pattern = re.compile(r'^[ \t]*([^\s%"<]+)', re.MULTILINE)
 
     ##############################################
 
-    def __init__(self, filename):
+    def __init__(self, filename, lazy=True):
 
+        self.filename = filename
         self.name = os.path.basename(filename).replace('.map', '')
         self._map = {}
+        self._line_offsets = {}
+        self._buffer = None
 
-        # try:
-        with TexCommentedFile(filename) as font_map_file:
-            for line in font_map_file:
-                try:
-                    self._parse_line(line)
-                except:
-                    pass
-        # except:
-        #     raise NameError('Bad fontmap file')
+        if lazy:
+            font_cache.load_font_map_index(self)
+        else:
+            # try:
+            with TexCommentedFile(filename) as font_map_file:
+                for line in font_map_file:
+                    try:
+                        self._parse_line(line)
+                    except:
+                        pass
+            # except:
+            #     raise NameError('Bad fontmap file')
+
+    ##############################################
+
+    def __del__(self):
+
+        if self._buffer is not None:
+            self._buffer.close()
+
+    ##############################################
+
+    def _map_file(self):
+
+        """ Map the font map file in memory. """
+
+        if self._buffer is None:
+            with open(self.filename, 'rb') as f:
+                self._buffer = mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ)
+
+        return self._buffer
+
+    ##############################################
+
+    def index(self):
+
+        """ Index the lines of the font map file by their TeX name. """
+
+        self._line_offsets = {}
+        if not os.path.getsize(self.filename):
+            # an empty file cannot be mapped
+            return
+        # The last line wins as when the entries are all parsed
+        for match in self._line_pattern.finditer(self._map_file()):
+            self._line_offsets[match.group(1)] = match.start()
+
+    ##############################################
+
+    def to_arrays(self):
+
+        """ Return the 2-tuple made of the metadata and the arrays of the index for
+        :class:`PyDvi.Font.FontCache`.
+        """
+
+        tex_names = sorted(self._line_offsets)
+        arrays = {'tex_names':np.frombuffer('\n'.join(tex_names), dtype=np.uint8),
+                  'offsets':np.array([self._line_offsets[tex_name] for tex_name in tex_names],
+                                     dtype=np.uint64),
+                  }
+        return {}, arrays
+
+    ##############################################
+
+    def from_arrays(self, metadata, arrays):
+
+        """ Load the index from the data cached by :class:`PyDvi.Font.FontCache`. """
+
+        offsets = arrays['offsets']
+        if offsets.size:
+            tex_names = arrays['tex_names'].tostring().split('\n')
+            self._line_offsets = dict(zip(tex_names, offsets.tolist()))
+        else:
+            self._line_offsets = {}
+
+    ##############################################
+
+    def __contains__(self, tex_name):
+
+        return tex_name in self._map or tex_name in self._line_offsets
+
+    ##############################################
+
+    def __len__(self):
+
+        return len(set(self._map) | set(self._line_offsets))
 
     ##############################################
  
     def __getitem__(self, tex_name):
- 
-        return self._map[tex_name]
- 
+
+        try:
+            return self._map[tex_name]
+        except KeyError:
+            offset = self._line_offsets[tex_name]
+            self._parse_line_at(offset)
+            return self._map[tex_name]
+
+    ##############################################
+
+    def _parse_line_at(self, offset):
+
+        """ Parse the line at *offset* in the font map file. """
+
+        buffer_ = self._map_file()
+        end = buffer_.find('\n', offset)
+        if end == -1:
+            end = len(buffer_)
+        line = buffer_[offset:end]
+        # Remove the comment as TexCommentedFile
+        comment_index = line.find('%')
+        if comment_index != -1:
+            line = line[:comment_index]
+        line = line.strip()
+        try:
+            self._parse_line(line)
+        except Exception as exception:
+            self._logger.warning("Bad font map entry in {}: {} ({})".format(self.filename,
+                                                                             line, exception))
+            # don't parse it again
+            tex_name = self._line_pattern.match(line).group(1)
+            del self._line_offsets[tex_name]
+            raise KeyError(tex_name)
+
+    ##############################################
+
+    def entries(self):
+
+        """ Return the list of the entries, the lazy entries are parsed. """
+
+        for tex_name in list(self._line_offsets):
+            if tex_name not in self._map:
+                try:
+                    self[tex_name]
+                except KeyError:
+                    pass
+
+        return self._map.values()
+
     ##############################################
  
     def _register_entry(self, font_map_entry):
@@ -257,7 +406,7 @@ class FontMap(object):
  
         print_card('Font Map %s' % (self.name))
  
-        for font_map_entry in self._map.values():
+        for font_map_entry in self.entries():
             font_map_entry.print_summary()
 
 ####################################################################################################
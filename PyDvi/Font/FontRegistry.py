@@ -0,0 +1,315 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module implements a process wide registry of the loaded fonts.
+
+Each :class:`PyDvi.Font.FontManager` instance used to load its own copy of the font map and of the
+fonts.  The font managers now get their fonts from a :class:`FontRegistry` which keeps one instance
+of each font, thus a process which renders many documents loads a font only once.
+
+A font is identified by a key given by the font manager, the font map file, the font flavour and
+the font name.  The registry counts the references to each font: the font managers acquire a font
+the first time they need it and release it when they are closed.  A font which is no longer
+referenced is kept during :attr:`FontRegistry.idle_ttl` seconds, so as it can be reused by the next
+document, then it is evicted and closed, cf. :meth:`PyDvi.Font.Font.close`.
+
+The registry also attributes the font ids, which are unique in the process, and shares the font
+maps.
+
+The methods are thread-safe.  The fonts are loaded outside the lock of the registry, thus a slow
+load, e.g. when Metafont generates a packed font, doesn't block the other threads, and the
+concurrent loads of the same font are merged.  The fonts serialise the accesses to their files.
+
+The module instance :data:`font_registry` is used by default by the font managers.
+"""
+
+####################################################################################################
+
+__all__ = ['FontRegistry', 'font_registry']
+
+####################################################################################################
+
+import logging
+import threading
+import time
+
+####################################################################################################
+
+from ..Tools.Logging import print_card
+from .FontMap import FontMap
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class FontRegistryEntry(object):
+
+    """ This class stores a font and its reference count. """
+
+    __slots__ = ('font', 'reference_count', 'release_time')
+
+    ##############################################
+
+    def __init__(self, font):
+
+        self.font = font
+        self.reference_count = 0
+        self.release_time = None
+
+####################################################################################################
+
+class FontRegistryLoad(object):
+
+    """ This class tracks a font which is loaded by a thread. """
+
+    __slots__ = ('event', 'exception')
+
+    ##############################################
+
+    def __init__(self):
+
+        self.event = threading.Event()
+        self.exception = None
+
+####################################################################################################
+
+class FontRegistry(object):
+
+    """ This class implements a thread-safe registry of reference counted fonts.
+
+    Public attributes:
+
+      :attr:`idle_ttl`
+        time in seconds an unreferenced font is kept
+
+      :attr:`number_of_hits`
+
+      :attr:`number_of_loads`
+
+      :attr:`number_of_evictions`
+    """
+
+    _logger = _module_logger.getChild('FontRegistry')
+
+    ##############################################
+
+    def __init__(self, idle_ttl=300):
+
+        self.idle_ttl = idle_ttl
+
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._loads = {} # key -> FontRegistryLoad
+        self._font_maps = {}
+        self._last_font_id = 0
+
+        self.number_of_hits = 0
+        self.number_of_loads = 0
+        self.number_of_evictions = 0
+
+    ##############################################
+
+    def __len__(self):
+
+        """ Return the number of fonts. """
+
+        return len(self._entries)
+
+    ##############################################
+
+    def __contains__(self, key):
+
+        return key in self._entries
+
+    ##############################################
+
+    def new_font_id(self):
+
+        """ Return a new font id. """
+
+        with self._lock:
+            self._last_font_id += 1
+            return self._last_font_id
+
+    ##############################################
+
+    def load_font_map(self, filename):
+
+        """ Return the :class:`PyDvi.Font.FontMap` instance for the font map file *filename*. """
+
+        with self._lock:
+            font_map = self._font_maps.get(filename)
+            if font_map is None:
+                font_map = self._font_maps[filename] = FontMap(filename)
+            return font_map
+
+    ##############################################
+
+    def acquire(self, key, loader):
+
+        """ Return the font for the key *key* and increment its reference count.  If the font is not
+        registered then it is loaded by calling *loader* without argument.  If another thread is
+        loading the font, wait for it.
+        """
+
+        while True:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self.number_of_hits += 1
+                    entry.reference_count += 1
+                    entry.release_time = None
+                    return entry.font
+                load = self._loads.get(key)
+                if load is None:
+                    load = self._loads[key] = FontRegistryLoad()
+                    self.collect()
+                    break
+            load.event.wait()
+            if load.exception is not None:
+                raise load.exception
+
+        try:
+            font = loader()
+        except Exception as exception:
+            # an exception is propagated to the callers
+            with self._lock:
+                del self._loads[key]
+            load.exception = exception
+            load.event.set()
+            raise
+
+        with self._lock:
+            del self._loads[key]
+            entry = self._entries[key] = FontRegistryEntry(font)
+            self.number_of_loads += 1
+            entry.reference_count = 1
+        load.event.set()
+        return font
+
+    ##############################################
+
+    def release(self, key):
+
+        """ Decrement the reference count of the font for the key *key*. """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return
+            entry.reference_count -= 1
+            if entry.reference_count <= 0:
+                entry.reference_count = 0
+                entry.release_time = time.time()
+
+    ##############################################
+
+    def evict(self, key):
+
+        """ Evict and close the font for the key *key* if it is not referenced.  Return :obj:`True`
+        if the font was evicted.
+        """
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.reference_count:
+                return False
+            self._evict(key)
+            return True
+
+    ##############################################
+
+    def _evict(self, key):
+
+        entry = self._entries.pop(key)
+        self._logger.debug("Evict font {}".format(entry.font.name))
+        entry.font.close()
+        self.number_of_evictions += 1
+
+    ##############################################
+
+    def collect(self, idle_ttl=None):
+
+        """ Evict the fonts which are not referenced since *idle_ttl* seconds, by default
+        :attr:`idle_ttl`.  Return the number of evicted fonts.
+        """
+
+        if idle_ttl is None:
+            idle_ttl = self.idle_ttl
+        with self._lock:
+            now = time.time()
+            keys = [key for key, entry in self._entries.iteritems()
+                    if entry.release_time is not None and now - entry.release_time >= idle_ttl]
+            for key in keys:
+                self._evict(key)
+            return len(keys)
+
+    ##############################################
+
+    def clear(self):
+
+        """ Remove all the fonts and the font maps, and reset the statistics. """
+
+        with self._lock:
+            self._entries.clear()
+            self._font_maps.clear()
+            self.number_of_hits = 0
+            self.number_of_loads = 0
+            self.number_of_evictions = 0
+
+    ##############################################
+
+    def print_summary(self):
+
+        with self._lock:
+            number_of_idle_fonts = sum(1 for entry in self._entries.itervalues()
+                                       if entry.reference_count == 0)
+
+        string_format = '''Font Registry
+
+ - fonts:     %u
+ - idle:      %u
+ - font maps: %u
+ - hits:      %u
+ - loads:     %u
+ - evictions: %u
+'''
+
+        print_card(string_format % (len(self),
+                                    number_of_idle_fonts,
+                                    len(self._font_maps),
+                                    self.number_of_hits,
+                                    self.number_of_loads,
+                                    self.number_of_evictions,
+                                    ))
+
+####################################################################################################
+
+font_registry = FontRegistry()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
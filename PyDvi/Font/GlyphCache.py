@@ -0,0 +1,219 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module implements a memory cache of the rasterised glyphs.
+
+The glyphs rasterised by FreeType are stored in a process wide cache shared by all the fonts, so as
+a long running renderer uses a predictable amount of memory.  The cache is bounded by a memory
+budget, cf. :attr:`GlyphCache.max_size`, and the least recently used glyphs are evicted first.
+
+The entries are identified by a key made of the font name, the quantised font size, the resolution
+and the glyph index, cf. :meth:`GlyphCache.make_key`.
+
+The module instance :data:`glyph_cache` is used by :class:`PyDvi.Font.Type1Font` and by
+:class:`PyDvi.Font.PkFont` for the resampled glyphs.
+"""
+
+####################################################################################################
+
+__all__ = ['GlyphCache', 'glyph_cache']
+
+####################################################################################################
+
+import collections
+import logging
+import threading
+
+####################################################################################################
+
+from ..Tools.Logging import print_card
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class GlyphCache(object):
+
+    """ This class implements a thread-safe LRU cache of glyphs bounded by a memory budget.
+
+    The cached objects must implement a :meth:`memory_usage` method which returns their size in
+    bytes, it is evaluated when the object is added, unless the size is given, e.g. for an array.
+
+    Public attributes:
+
+      :attr:`max_size`
+        memory budget in bytes
+
+      :attr:`size`
+        memory used by the cached glyphs in bytes
+
+      :attr:`number_of_hits`
+
+      :attr:`number_of_misses`
+
+      :attr:`number_of_evictions`
+    """
+
+    _logger = _module_logger.getChild('GlyphCache')
+
+    #: Font sizes are quantised to this step in pt
+    size_quantum = 1/64.
+
+    ##############################################
+
+    def __init__(self, max_size=64*1024**2):
+
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._glyphs = collections.OrderedDict()
+        self.size = 0
+
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+        self.number_of_evictions = 0
+
+    ##############################################
+
+    def __len__(self):
+
+        return len(self._glyphs)
+
+    ##############################################
+
+    def __contains__(self, key):
+
+        return key in self._glyphs
+
+    ##############################################
+
+    @classmethod
+    def quantise_size(cls, size):
+
+        """ Return the font size *size* quantised to :attr:`size_quantum`. """
+
+        return int(round(size / cls.size_quantum))
+
+    ##############################################
+
+    @classmethod
+    def make_key(cls, font_name, size, resolution, glyph_index):
+
+        """ Return the cache key of a glyph. """
+
+        return (font_name, cls.quantise_size(size), int(resolution), glyph_index)
+
+    ##############################################
+
+    @property
+    def hit_rate(self):
+
+        """ Ratio of the lookups which were found in the cache. """
+
+        number_of_lookups = self.number_of_hits + self.number_of_misses
+        if number_of_lookups:
+            return self.number_of_hits / float(number_of_lookups)
+        else:
+            return 0.
+
+    ##############################################
+
+    def get(self, key):
+
+        """ Return the glyph for the key *key* or :obj:`None` if it is not cached. """
+
+        with self._lock:
+            entry = self._glyphs.pop(key, None)
+            if entry is None:
+                self.number_of_misses += 1
+                return None
+            else:
+                # move the entry at the most recently used end
+                self._glyphs[key] = entry
+                self.number_of_hits += 1
+                return entry[0]
+
+    ##############################################
+
+    def add(self, key, glyph, size=None):
+
+        """ Store the glyph *glyph* for the key *key* and evict the least recently used glyphs if
+        the memory budget is exceeded.  The memory used by the glyph is *size* in bytes if it is
+        given, else it is evaluated by :meth:`memory_usage`.
+        """
+
+        glyph_size = size if size is not None else glyph.memory_usage()
+        with self._lock:
+            old_entry = self._glyphs.pop(key, None)
+            if old_entry is not None:
+                self.size -= old_entry[1]
+            self._glyphs[key] = (glyph, glyph_size)
+            self.size += glyph_size
+            # the glyph just added is kept even if it exceeds the budget on its own
+            while self.size > self.max_size and len(self._glyphs) > 1:
+                key, old_entry = self._glyphs.popitem(last=False)
+                self.size -= old_entry[1]
+                self.number_of_evictions += 1
+
+    ##############################################
+
+    def clear(self):
+
+        """ Remove all the glyphs and reset the statistics. """
+
+        with self._lock:
+            self._glyphs.clear()
+            self.size = 0
+            self.number_of_hits = 0
+            self.number_of_misses = 0
+            self.number_of_evictions = 0
+
+    ##############################################
+
+    def print_summary(self):
+
+        string_format = '''Glyph Cache
+
+ - glyphs:    %u
+ - memory:    %.1f / %.1f MB
+ - hit rate:  %.1f %%
+ - evictions: %u
+'''
+
+        print_card(string_format % (len(self),
+                                    self.size / 1024.**2,
+                                    self.max_size / 1024.**2,
+                                    self.hit_rate * 100,
+                                    self.number_of_evictions,
+                                    ))
+
+####################################################################################################
+
+glyph_cache = GlyphCache()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,205 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module provides a tool to measure strings using the TeX Font Metrics, without running TeX.
+
+For example to get the dimensions of some strings typeset with the font "cmr10"::
+
+  widths, heights, depths = measure(['Hello world!', 'Office'], 'cmr10')
+
+The strings are measured as TeX would do for a sequence of words in horizontal mode: the ligatures
+and the kerns of the TFM are applied to each word, including the implicit boundary characters, and
+the words are separated by the normal interword space of the font.  The stretch and the shrink of
+the spaces are not taken into account.  Each character of a string is mapped to the character code
+given by :func:`ord`, which is right for the ASCII characters of the TeX text fonts.
+
+The dimensions are cached per font and per string.
+"""
+
+####################################################################################################
+
+__all__ = ['TextMeasurer', 'measure']
+
+####################################################################################################
+
+import logging
+
+import numpy as np
+
+####################################################################################################
+
+from ..Kpathsea import kpsewhich
+from .Font import FontMetricNotFound
+from .FontCache import font_cache
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class TextMeasurer(object):
+
+    """ This class measures strings using the metrics of a :class:`PyDvi.Tfm.Tfm` instance.
+
+    The dimensions are in design size unit.  At most *cache_size* results are cached, the cache is
+    cleared when it is full.
+
+    Public attributes:
+
+      :attr:`tfm`
+
+      :attr:`number_of_hits`
+
+      :attr:`number_of_misses`
+    """
+
+    ##############################################
+
+    def __init__(self, tfm, cache_size=100000):
+
+        self.tfm = tfm
+        self.cache_size = cache_size
+
+        # Character dimensions indexed by char code, they are zero for missing characters
+        self._dimensions = {}
+        for char_code in xrange(tfm.smallest_character_code, tfm.largest_character_code +1):
+            tfm_char = tfm[char_code]
+            self._dimensions[char_code] = (tfm_char.width, tfm_char.height, tfm_char.depth)
+        # The fonts without text parameters, e.g. TeX math italic, don't define the interword space
+        self._spacing = getattr(tfm, 'spacing', 0.)
+
+        self._string_cache = {}
+        self._word_cache = {}
+
+        self.number_of_hits = 0
+        self.number_of_misses = 0
+
+    ##############################################
+
+    def _measure_word(self, word):
+
+        """ Return the width, height and depth of the word *word*. """
+
+        try:
+            return self._word_cache[word]
+        except KeyError:
+            pass
+
+        # TeX drops the missing characters
+        char_dimensions = self._dimensions
+        char_codes = [ord(char) for char in word]
+        char_codes, kerns = self.tfm.apply_lig_kern([char_code for char_code in char_codes
+                                                     if char_code in char_dimensions])
+        width = sum(kerns)
+        height = depth = 0.
+        for char_code in char_codes:
+            char_width, char_height, char_depth = char_dimensions.get(char_code, (0., 0., 0.))
+            width += char_width
+            if char_height > height:
+                height = char_height
+            if char_depth > depth:
+                depth = char_depth
+        dimensions = (width, height, depth)
+
+        if len(self._word_cache) >= self.cache_size:
+            self._word_cache.clear()
+        self._word_cache[word] = dimensions
+
+        return dimensions
+
+    ##############################################
+
+    def measure_string(self, string):
+
+        """ Return the width, height and depth of the string *string*. """
+
+        try:
+            dimensions = self._string_cache[string]
+            self.number_of_hits += 1
+            return dimensions
+        except KeyError:
+            self.number_of_misses += 1
+
+        width = height = depth = 0.
+        words = string.split()
+        for word in words:
+            word_width, word_height, word_depth = self._measure_word(word)
+            width += word_width
+            height = max(height, word_height)
+            depth = max(depth, word_depth)
+        if words:
+            width += (len(words) - 1) * self._spacing
+        dimensions = (width, height, depth)
+
+        if len(self._string_cache) >= self.cache_size:
+            self._string_cache.clear()
+        self._string_cache[string] = dimensions
+
+        return dimensions
+
+    ##############################################
+
+    def measure(self, strings, scale=1.):
+
+        """ Return the width, height and depth arrays for the sequence of strings *strings*, the
+        dimensions are multiplied by *scale*.
+        """
+
+        dimensions = np.array([self.measure_string(string) for string in strings], dtype=np.float64)
+        dimensions = dimensions.reshape(-1, 3) * scale
+
+        return dimensions[:,0], dimensions[:,1], dimensions[:,2]
+
+####################################################################################################
+
+_text_measurers = {}
+
+def measure(strings, font_name, scale=None):
+
+    """ Measure the sequence of strings *strings* using the TFM of the font *font_name*.
+
+    Return the width, height and depth arrays.  The dimensions are multiplied by *scale*, it defaults
+    to the design size of the font, thus the dimensions are in TeX points for the font at its design
+    size.
+
+    Raise :exc:`PyDvi.Font.Font.FontMetricNotFound` if the TFM file is not found.
+    """
+
+    text_measurer = _text_measurers.get(font_name)
+    if text_measurer is None:
+        tfm_file = kpsewhich(font_name, file_format='tfm')
+        if tfm_file is None:
+            raise FontMetricNotFound("TFM file was not found for font {}".format(font_name))
+        text_measurer = TextMeasurer(font_cache.load_tfm(font_name, tfm_file))
+        _text_measurers[font_name] = text_measurer
+
+    if scale is None:
+        scale = text_measurer.tfm.design_font_size
+
+    return text_measurer.measure(strings, scale)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -24,9 +24,19 @@ __all__ = ['PkFont']
 
 ####################################################################################################
 
+import math
+
+import numpy as np
+
+####################################################################################################
+
+from ..Kpathsea import kpsewhich
 from ..Tools.Logging import print_card
-from .Font import Font, font_types
+from .CharMetrics import CharMetrics
+from .Font import Font, FontNotFound, font_types
+from .GlyphCache import glyph_cache
 from .PkFontParser import PkFontParser
+from .PkGlyph import ResampledPkGlyph, decode_packed_glyphs
 
 ####################################################################################################
 
@@ -36,11 +46,19 @@ class PkFont(Font):
 
     To create a packed font instance use::
 
-      font = PkFont(font_manager, font_id, name)
+      font = PkFont(font_manager, font_id, name, lazy=True, bit_packed=False)
 
     where *font_manager* is a :class:`PyDvi.FontManager.FontManager` instance, *font_id* is the font
     id provided by the font manager and *name* is the font name, "cmr10" for example.  The packed
-    font file is parsed using a :class:`PyDvi.PkFontParser.PkFontParser` instance.
+    font file is parsed using a :class:`PyDvi.PkFontParser.PkFontParser` instance.  If *lazy* is
+    set, the character packets are only indexed and the glyphs are built on first access.  If
+    *bit_packed* is set, the decoded glyph bitmaps are stored with one bit per pixel instead of one
+    byte and are unpacked on demand, cf. :meth:`PyDvi.PkGlyph.PkGlyph.get_glyph_bitmap`.
+
+    If a :class:`PyDvi.Font.PkGenerator.PkGenerator` instance *pk_generator* is given, a missing
+    packed font file is generated in the background.  Meanwhile the font is a placeholder, cf.
+    :attr:`is_ready`: the resampled glyphs are the TFM boxes of the characters and the other
+    accesses to the glyphs wait for the file.
 
     """
 
@@ -48,14 +66,50 @@ class PkFont(Font):
     font_type_string = 'TeX Packed Font'
     extension = 'pk'
 
+    bit_packed = False
+
     ##############################################
 
-    def __init__(self, font_manager, font_id, name):
+    def __init__(self, font_manager, font_id, name, lazy=True, bit_packed=False,
+                 pk_generator=None):
+
+        self._pk_generator = pk_generator
+        #: :class:`PyDvi.Font.PkGenerator.PkGeneratorJob` instance if the file is generated
+        self.generation_job = None
 
         super(PkFont, self).__init__(font_manager, font_id, name)
         
+        self.bit_packed = bit_packed
         self._glyphs = {}
-        PkFontParser.parse(self)
+        if self.filename is not None:
+            self._pk_parser = PkFontParser.parse(self, lazy)
+        else:
+            self._pk_parser = None
+            self.design_font_size = self.tfm.design_font_size if self.tfm is not None else None
+
+    ##############################################
+
+    @property
+    def _parser(self):
+
+        # the file is indexed again if the font was closed
+        with self._lock:
+            if self._pk_parser is None:
+                if self.filename is None:
+                    self.generation_job.wait()
+                    if self.filename is None:
+                        raise FontNotFound("Font file %s was not generated" % (self.basename()))
+                self._pk_parser = PkFontParser.parse(self, lazy=True)
+            return self._pk_parser
+
+    ##############################################
+
+    @property
+    def is_ready(self):
+
+        """ :obj:`False` while the packed font file is generated. """
+
+        return self.filename is not None
 
     ##############################################
  
@@ -63,7 +117,15 @@ class PkFont(Font):
  
         """ Return the :class:`PyDvi.PkGlyph.PkGlyph` instance for the char code *char_code*. """
 
-        return self._glyphs[char_code]
+        try:
+            return self._glyphs[char_code]
+        except KeyError:
+            # the parser seeks in the shared stream
+            with self._lock:
+                glyph = self._glyphs.get(char_code)
+                if glyph is None:
+                    glyph = self._parser.read_glyph(char_code)
+                return glyph
 
     ##############################################
 
@@ -71,7 +133,15 @@ class PkFont(Font):
 
         """ Return the number of glyphs in the font. """
 
-        return len(self._glyphs)
+        return len(self._parser.glyph_offsets)
+
+    ##############################################
+
+    def char_codes(self):
+
+        """ Return the sorted list of the char codes. """
+
+        return sorted(self._parser.glyph_offsets)
 
     ##############################################
 
@@ -81,7 +151,25 @@ class PkFont(Font):
         already done.
         """
 
-        super(PkFont, self)._find_font(kpsewhich_options='-mktex=pk')
+        if self._pk_generator is None:
+            super(PkFont, self)._find_font(kpsewhich_options='-mktex=pk')
+        else:
+            basename = self.basename()
+            self.filename = kpsewhich(basename)
+            if self.filename is None:
+                self.generation_job = self._pk_generator.generate(basename)
+                self.generation_job.add_callback(self._set_generated_file)
+
+    ##############################################
+
+    def _set_generated_file(self, job):
+
+        """ Called by the generator when the packed font file is generated, the file is parsed on
+        the next access to the glyphs.
+        """
+
+        if job.path is not None:
+            self.filename = job.path
 
     ##############################################
 
@@ -112,7 +200,141 @@ class PkFont(Font):
 
     def get_glyph(self, glyph_index, size=None, resolution=None):
 
-        return self._glyphs[glyph_index]
+        """ Return the :class:`PyDvi.PkGlyph.PkGlyph` instance for the char code *glyph_index*, or if
+        a resolution in dpi is given the glyph resampled for the size *size* in pt, the design size
+        by default, cf. :meth:`resample_glyph`.
+        """
+
+        if resolution is None:
+            return self[glyph_index]
+        else:
+            return self.resample_glyph(glyph_index, size, resolution)
+
+    ##############################################
+
+    def resample_glyph(self, char_code, size=None, resolution=600):
+
+        """ Return the :class:`PyDvi.PkGlyph.ResampledPkGlyph` instance for the char code
+        *char_code* at the size *size* in pt and the resolution *resolution* in dpi.
+
+        The glyph bitmap is resampled from the resolution of the packed font file, thus the font is
+        not generated again for each resolution.  The resampled glyphs are stored in
+        :data:`PyDvi.Font.GlyphCache.glyph_cache`.
+        """
+
+        if size is None:
+            size = self.design_font_size
+        if not self.is_ready:
+            return self._placeholder_glyph(char_code, size, resolution)
+        key = glyph_cache.make_key(self.filename, size, resolution, char_code)
+        glyph = glyph_cache.get(key)
+        if glyph is None:
+            pk_glyph = self[char_code]
+            scale = float(resolution) * size / self.design_font_size
+            glyph = pk_glyph.resample(scale / self.horizontal_dpi, scale / self.vertical_dpi)
+            glyph_cache.add(key, glyph)
+        return glyph
+
+    ##############################################
+
+    def _placeholder_glyph(self, char_code, size, resolution):
+
+        """ Return a placeholder glyph drawing the frame of the TFM box of the character, it is not
+        cached.
+        """
+
+        # pixels per design size
+        scale = resolution * size / 72.27
+        widths, heights, depths = self.metrics.widths, self.metrics.heights, self.metrics.depths
+        if char_code < len(widths):
+            width = int(math.ceil(widths[char_code] * scale))
+            height = int(math.ceil(heights[char_code] * scale))
+            depth = int(math.ceil(depths[char_code] * scale))
+        else:
+            width = height = depth = 0
+        glyph_bitmap = np.zeros((height + depth, width), dtype=np.uint8)
+        if glyph_bitmap.size:
+            glyph_bitmap[[0, -1],:] = 255
+            glyph_bitmap[:,[0, -1]] = 255
+
+        glyph = ResampledPkGlyph(char_code, glyph_bitmap, 0, height)
+        glyph.is_placeholder = True
+        return glyph
+
+    ##############################################
+
+    def rasterise(self, char_codes, size, resolution=600, pool=None):
+
+        """ Resample in a batch the glyphs for the char codes *char_codes* at the size *size* in pt
+        and the resolution *resolution* in dpi, and return the list of glyphs.  The resampling is
+        done by Numpy, thus the pool is not used.
+        """
+
+        if self.is_ready:
+            self.decode_glyphs([char_code for char_code in char_codes
+                                if glyph_cache.make_key(self.filename, size, resolution, char_code)
+                                not in glyph_cache])
+        return [self.resample_glyph(char_code, size, resolution) for char_code in char_codes]
+
+    ##############################################
+
+    def decode_glyphs(self, char_codes):
+
+        """ Decode in a batch the glyph bitmaps for the char codes *char_codes*, cf.
+        :func:`PyDvi.Font.PkGlyph.decode_packed_glyphs`.  The glyphs already decoded and the glyphs
+        using the bitmap format are skipped.
+        """
+
+        glyphs = [self[char_code] for char_code in sorted(set(char_codes))]
+        with self._lock:
+            glyphs = [glyph for glyph in glyphs if not (glyph.is_decoded() or glyph.is_bitmap())]
+            for glyph, glyph_bitmap in zip(glyphs, decode_packed_glyphs(glyphs)):
+                glyph.set_glyph_bitmap(glyph_bitmap)
+
+    ##############################################
+
+    def _make_metrics(self):
+
+        """ Return the character metrics from the TFM, else from the character packets: the width is
+        the TFM width stored in the packet and the height and the depth are given by the bitmap.
+        """
+
+        if self.tfm is not None:
+            return super(PkFont, self)._make_metrics()
+
+        char_codes = self.char_codes()
+        size = char_codes[-1] +1 if char_codes else 0
+        widths, heights, depths = np.zeros((3, size))
+        # pixels per design size
+        design_size_px = self.design_font_size * self.vertical_dpi / 72.27
+        for char_code in char_codes:
+            glyph = self[char_code]
+            widths[char_code] = glyph.tfm
+            heights[char_code] = max(glyph.vertical_offset, 0) / design_size_px
+            depths[char_code] = max(glyph.height - glyph.vertical_offset, 0) / design_size_px
+
+        return CharMetrics('pk', widths, heights, depths)
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory used by the TFM and the glyphs which were built, in bytes. """
+
+        return (super(PkFont, self).memory_usage() +
+                sum(glyph.memory_usage() for glyph in self._glyphs.itervalues()))
+
+    ##############################################
+
+    def close(self):
+
+        """ Release the glyphs and close the packed font file. """
+
+        with self._lock:
+            self._glyphs = {}
+            if self._pk_parser is not None:
+                self._pk_parser.stream.close()
+                self._pk_parser = None
 
     ##############################################
 
@@ -126,7 +348,11 @@ Preambule
   - Checksum     %u
   - Resolution
    - Horizontal  %.1f dpi
-   - Vertical    %.1f dpi """
+   - Vertical    %.1f dpi
+Glyphs
+  - Number       %u
+  - Loaded       %u
+  - Memory       %.1f kB """
 
         message = self.print_header() + string_format % (
             self.pk_id,
@@ -135,6 +361,9 @@ Preambule
             self.checksum,
             self.horizontal_dpi,
             self.vertical_dpi,
+            len(self),
+            len(self._glyphs),
+            self.memory_usage() / 1024.,
             )
 
         print_card(message)
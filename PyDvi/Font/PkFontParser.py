@@ -37,6 +37,10 @@ __all__ = ['PkFontParser', 'OpcodeParser_xxx']
 
 ####################################################################################################
 
+import os
+
+####################################################################################################
+
 from ..OpcodeParser import OpcodeParserSet, OpcodeParser
 from ..TeXUnit import *
 from ..Tools.EnumFactory import ExplicitEnumFactory
@@ -99,23 +103,36 @@ opcode_definitions = (
 
 class PkFontParser(object):
 
+    """ This class parses a Packed Font file.
+
+    In lazy mode, the character packets are only indexed by a pass over their headers and the
+    :class:`PyDvi.PkGlyph.PkGlyph` instances are built on demand by :meth:`read_glyph`.  The file is
+    memory mapped and kept open to this purpose.
+
+    The nybble stream of a glyph is a view on the mapped file, thus the packets are not copied.
+    """
+
     opcode_parser_set = OpcodeParserSet(opcode_definitions)
 
     ##############################################
 
     @staticmethod
-    def parse(pk_font):
+    def parse(pk_font, lazy=False):
 
-        PkFontParser(pk_font)
+        return PkFontParser(pk_font, lazy)
 
     ##############################################
 
-    def __init__(self, pk_font):
+    def __init__(self, pk_font, lazy=False):
 
         self.pk_font = pk_font
+        self.lazy = lazy
 
         self.stream = FileStream(pk_font.filename)
 
+        # char code -> offset of the character packet
+        self.glyph_offsets = {}
+
         self._process_preambule()
         self._process_file()
 
@@ -175,6 +192,7 @@ class PkFontParser(object):
         # Fixme: to incorporate pre, check here pre is the first code
 
         while True:
+            offset = stream.tell()
             byte = stream.read_unsigned_byte1()
             if byte == pk_opcodes.POST:
                 break
@@ -182,18 +200,31 @@ class PkFontParser(object):
                 # Fixme: self.opcode_parsers[byte]()
                 opcode_parser = self.opcode_parser_set[byte]
                 opcode_parser.read_parameters(self) # Fixme: return where
+            elif self.lazy:
+                self._index_char_definition(byte, offset)
             else:
-                self._read_char_definition(byte)
+                glyph = self._read_char_definition(byte)
+                self.glyph_offsets[glyph.char_code] = offset
 
     ##############################################
 
-    def _read_char_definition(self, flag):
+    def read_glyph(self, char_code):
+
+        """ Build the glyph for the char code *char_code* from its character packet. """
 
         stream = self.stream
+        stream.seek(self.glyph_offsets[char_code])
+        return self._read_char_definition(stream.read_unsigned_byte1())
 
-        dyn_f = flag >> 4
-        first_pixel_is_black = (flag & 8) != 0
-        two_bytes = (flag & 4) != 0
+    ##############################################
+
+    def _read_packet_length(self, flag):
+
+        """ Read the packet length of a character packet and return the 3-tuple made of the format,
+        the packet length and the length of the preambule.
+        """
+
+        stream = self.stream
 
         three_least_significant = flag & 7
         two_least_significant = flag & 3
@@ -218,6 +249,38 @@ class PkFontParser(object):
             packet_length = stream.read_unsigned_byte4()
             preambule_length = 28 # 4*7
 
+        return format, packet_length, preambule_length
+
+    ##############################################
+
+    def _index_char_definition(self, flag, offset):
+
+        """ Register the character packet starting at *offset* and skip it. """
+
+        stream = self.stream
+
+        format, packet_length, preambule_length = self._read_packet_length(flag)
+        if format == 3:
+            char_code = stream.read_unsigned_byte4()
+        else:
+            char_code = stream.read_unsigned_byte1()
+        # the packet length counts the bytes following the char code
+        stream.seek(packet_length, os.SEEK_CUR)
+
+        self.glyph_offsets[char_code] = offset
+
+    ##############################################
+
+    def _read_char_definition(self, flag):
+
+        stream = self.stream
+
+        dyn_f = flag >> 4
+        first_pixel_is_black = (flag & 8) != 0
+        two_bytes = (flag & 4) != 0
+
+        format, packet_length, preambule_length = self._read_packet_length(flag)
+
         if format == 3:
             (char_code, tfm,
              dx, dy,
@@ -242,14 +305,16 @@ class PkFontParser(object):
 
         tfm = to_fix_word(tfm)
 
-        nybbles = stream.read(packet_length - preambule_length)
+        number_of_bytes = packet_length - preambule_length
+        nybbles = stream.view(stream.tell(), number_of_bytes)
+        stream.seek(number_of_bytes, os.SEEK_CUR)
 
-        PkGlyph(self.pk_font,
-                char_code,
-                tfm, dm, dx, dy,
-                height, width,
-                horizontal_offset, vertical_offset,
-                nybbles, dyn_f, first_pixel_is_black)
+        glyph = PkGlyph(self.pk_font,
+                        char_code,
+                        tfm, dm, dx, dy,
+                        height, width,
+                        horizontal_offset, vertical_offset,
+                        nybbles, dyn_f, first_pixel_is_black)
 
         if False:
             string_template = '''Char %u
@@ -277,6 +342,8 @@ class PkFontParser(object):
                     horizontal_offset, vertical_offset,
                     ))
 
+        return glyph
+
 ####################################################################################################
 #
 # End
@@ -0,0 +1,241 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module implements the generation of the packed fonts in the background.
+
+When a packed font file is missing, :command:`kpsewhich -mktex=pk` runs Metafont which can take
+several seconds per font.  A :class:`PkGenerator` runs these commands in worker threads, thus a
+document can be rendered at once using placeholder glyphs, cf. :class:`PyDvi.Font.PkFont.PkFont`,
+and rendered again when the fonts are generated.
+
+The requests for the same file are merged in one :class:`PkGeneratorJob`.  For example::
+
+  pk_generator = PkGenerator()
+  font_manager = FontManager('pdftex', use_pk=True, pk_generator=pk_generator)
+  ...
+  pk_generator.wait()
+  pk_generator.close()
+"""
+
+####################################################################################################
+
+__all__ = ['PkGenerator', 'PkGeneratorJob']
+
+####################################################################################################
+
+import Queue
+import logging
+import threading
+
+####################################################################################################
+
+from ..Kpathsea import kpsewhich
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class PkGeneratorJob(object):
+
+    """ This class tracks the generation of a packed font file. """
+
+    ##############################################
+
+    def __init__(self, filename):
+
+        self.filename = filename
+        #: path of the generated file, :obj:`None` if the generation failed
+        self.path = None
+
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._finished = False
+        self._callbacks = []
+
+    ##############################################
+
+    def add_callback(self, callback):
+
+        """ Call *callback* with the job when it is done, at once if it is already done.  The
+        callbacks are called by a thread of the generator.
+        """
+
+        with self._lock:
+            if not self._finished:
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    ##############################################
+
+    def _finish(self, path):
+
+        with self._lock:
+            self.path = path
+            self._finished = True
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception as exception:
+                _module_logger.error("Packed font callback failed: {}".format(exception))
+        self._event.set()
+
+    ##############################################
+
+    def done(self):
+
+        return self._event.is_set()
+
+    ##############################################
+
+    def wait(self, timeout=None):
+
+        """ Wait for the completion of the job and return the path of the file. """
+
+        self._event.wait(timeout)
+        return self.path
+
+####################################################################################################
+
+class PkGenerator(object):
+
+    """ This class implements a pool of threads generating the packed font files.
+
+    The jobs are memoised by file name, thus a file is generated once even if many fonts, font
+    managers or documents request it.  A failed job is forgotten, thus a later request retries.
+
+    Public attributes:
+
+      :attr:`number_of_requests`
+
+      :attr:`number_of_jobs`
+        number of generated files
+    """
+
+    _logger = _module_logger.getChild('PkGenerator')
+
+    ##############################################
+
+    def __init__(self, number_of_threads=2):
+
+        self.number_of_threads = number_of_threads
+
+        self._lock = threading.Lock()
+        self._jobs = {} # file name -> job
+        self.number_of_requests = 0
+        self.number_of_jobs = 0
+
+        self._queue = Queue.Queue()
+        self._threads = []
+        for i in xrange(number_of_threads):
+            thread = threading.Thread(target=self._run, name='PkGenerator-{}'.format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    ##############################################
+
+    def __enter__(self):
+
+        return self
+
+    ##############################################
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    ##############################################
+
+    def close(self):
+
+        """ Stop the threads once the queued jobs are done. """
+
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    ##############################################
+
+    def _run(self):
+
+        while True:
+            job = self._queue.get()
+            if job is None:
+                break
+            path = None
+            try:
+                self._logger.info("Generate {}".format(job.filename))
+                # the failures are not cached, thus a later request runs mktex again
+                path = kpsewhich(job.filename, options='-mktex=pk', use_cache=False)
+                if path is None:
+                    self._logger.warning("Cannot generate {}".format(job.filename))
+            except Exception as exception:
+                self._logger.error("Cannot generate {}: {}".format(job.filename, exception))
+            if path is None:
+                with self._lock:
+                    if self._jobs.get(job.filename) is job:
+                        del self._jobs[job.filename]
+            job._finish(path)
+
+    ##############################################
+
+    def generate(self, filename):
+
+        """ Queue the generation of the packed font file *filename*, e.g. "cmr10.pk", and return the
+        :class:`PkGeneratorJob` instance.  A pending or done job for the same file is returned if
+        there is one.
+        """
+
+        with self._lock:
+            self.number_of_requests += 1
+            job = self._jobs.get(filename)
+            if job is None:
+                if not self._threads:
+                    raise NameError("Packed font generator is closed")
+                job = self._jobs[filename] = PkGeneratorJob(filename)
+                self.number_of_jobs += 1
+                self._queue.put(job)
+
+        return job
+
+    ##############################################
+
+    def wait(self, timeout=None):
+
+        """ Wait for the completion of the queued jobs. """
+
+        with self._lock:
+            jobs = self._jobs.values()
+        for job in jobs:
+            job.wait(timeout)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
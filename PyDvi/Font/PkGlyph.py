@@ -32,7 +32,7 @@
 
 ####################################################################################################
 
-__all__ = ['PkGlyph']
+__all__ = ['PkGlyph', 'ResampledPkGlyph', 'decode_packed_glyphs']
 
 ####################################################################################################
 
@@ -47,6 +47,215 @@ from ..Tools.Logging import print_card
 
 ####################################################################################################
 
+def area_weights(number_of_pixels, origin, scale):
+
+    """ Return the index of the first target pixel and the matrix of the area-averaging weights to
+    resample a row of *number_of_pixels* source pixels by the factor *scale*.  The source pixel
+    *origin* is located at the origin of the target grid.
+
+    The weight of a source pixel for a target pixel is the length of their overlap in target pixel
+    units.
+    """
+
+    edges = (np.arange(number_of_pixels +1) - origin) * scale
+    first_pixel = int(math.floor(edges[0]))
+    last_pixel = int(math.ceil(edges[-1]))
+    target_edges = np.arange(first_pixel, max(last_pixel, first_pixel +1) +1, dtype=np.float)
+    weights = (np.minimum(edges[np.newaxis,1:], target_edges[1:,np.newaxis]) -
+               np.maximum(edges[np.newaxis,:-1], target_edges[:-1,np.newaxis]))
+    np.clip(weights, 0, None, out=weights)
+
+    return first_pixel, weights
+
+####################################################################################################
+
+def _exclusive_cumsum(array):
+
+    """ Return the cumulative sum of *array* starting at 0 and without the total. """
+
+    cumsum = np.zeros(array.size, dtype=np.int64)
+    np.cumsum(array[:-1], out=cumsum[1:])
+    return cumsum
+
+####################################################################################################
+
+def decode_packed_glyphs(glyphs):
+
+    """ Decode the run-length encoded :class:`PkGlyph` instances *glyphs* at once and return the
+    list of their bitmaps.
+
+    A glyph is too small to amortise the overhead of the Numpy calls, thus the glyphs should be
+    decoded in batches, e.g. the glyphs of a page, cf.
+    :meth:`PyDvi.Font.PkFont.PkFont.decode_glyphs`.  The nybble streams are concatenated, then:
+
+    * The packed numbers have a variable length which only depends on their first nybble: 1 for the
+      one-nybble numbers and the repeat row commands, 2 for the two-nybble numbers and 2k+1 for a
+      large number starting by k zeros.  The length is computed for each nybble as if a number
+      started there, then the starts of the packed numbers are found by following the chain of the
+      lengths from the first nybble of each glyph using pointer doubling, i.e. in a logarithmic
+      number of vectorised steps.
+    * The packed numbers are decoded and split in run counts and repeat row counts.
+    * The runs are expanded to the pixels of the stored rows by a xor scan of the colour changes,
+      then the repeated rows of a glyph are gathered.
+    """
+
+    number_of_glyphs = len(glyphs)
+    if not number_of_glyphs:
+        return []
+
+    glyph_indexes = np.arange(number_of_glyphs)
+    widths = np.array([glyph.width for glyph in glyphs], dtype=np.int64)
+    heights = np.array([glyph.height for glyph in glyphs], dtype=np.int64)
+    dyn_fs = np.array([glyph.dyn_f for glyph in glyphs], dtype=np.int64)
+    first_pixel_is_black = np.array([bool(glyph.first_pixel_is_black) for glyph in glyphs])
+
+    # Unpack the nybble streams at once
+    bytes_ = np.concatenate([np.frombuffer(glyph.nybbles, dtype=np.uint8) for glyph in glyphs])
+    nybbles = np.empty(2*bytes_.size, dtype=np.int64)
+    nybbles[0::2] = bytes_ >> 4
+    nybbles[1::2] = bytes_ & 0xF
+    number_of_nybbles = nybbles.size
+    glyph_numbers_of_nybbles = 2*np.array([len(glyph.nybbles) for glyph in glyphs], dtype=np.int64)
+    glyph_starts = _exclusive_cumsum(glyph_numbers_of_nybbles)
+    nybble_glyphs = np.repeat(glyph_indexes, glyph_numbers_of_nybbles)
+    glyph_ends = (glyph_starts + glyph_numbers_of_nybbles)[nybble_glyphs]
+    dyn_f = dyn_fs[nybble_glyphs]
+
+    # Length of a packed number starting at each nybble, cf. PkGlyph._next_packed_number
+    positions = np.arange(number_of_nybbles)
+    is_zero = nybbles == 0
+    next_non_zero = np.where(is_zero, number_of_nybbles, positions)
+    next_non_zero = np.minimum.accumulate(next_non_zero[::-1])[::-1]
+    lengths = np.where(nybbles > dyn_f, 2, 1)
+    lengths[nybbles >= 14] = 1
+    lengths[is_zero] = 2*(next_non_zero[is_zero] - positions[is_zero]) + 1
+
+    # Follow the chains from the first nybble of the glyphs, jumps is the 2**k-th successor of each
+    # nybble, the last number of a glyph jumps to the sentinel, and is_start marks the numbers
+    # reached in less than 2**k steps
+    successors = positions + lengths
+    successors[successors >= glyph_ends] = number_of_nybbles
+    jumps = np.append(successors, number_of_nybbles).astype(np.int32)
+    origins = glyph_starts[glyph_numbers_of_nybbles > 0]
+    is_start = np.zeros(number_of_nybbles + 1, dtype=np.bool)
+    is_start[origins] = True
+    starts = origins
+    while (jumps[origins] < number_of_nybbles).any():
+        is_start[jumps[starts]] = True
+        starts = np.flatnonzero(is_start[:-1])
+        jumps = jumps[jumps]
+    # drop the padding nybble
+    starts = starts[starts + lengths[starts] <= glyph_ends[starts]]
+
+    # Decode the packed numbers
+    token_glyphs = nybble_glyphs[starts]
+    token_dyn_f = dyn_f[starts]
+    first_nybbles = nybbles[starts]
+    values = first_nybbles.copy()
+    is_two_nybble = (first_nybbles > token_dyn_f) & (first_nybbles < 14)
+    values[is_two_nybble] = ((first_nybbles[is_two_nybble] - token_dyn_f[is_two_nybble] - 1)*16 +
+                             nybbles[starts[is_two_nybble] + 1] + token_dyn_f[is_two_nybble] + 1)
+    large_numbers = np.flatnonzero(first_nybbles == 0)
+    numbers_of_zeros = (lengths[starts[large_numbers]] - 1) // 2
+    # a count is clamped to the largest glyph size, which also prevents the overflows
+    sizes = heights * widths
+    max_count = max(sizes.max(), heights.max()) + 1
+    for number_of_zeros in np.unique(numbers_of_zeros).tolist():
+        indexes = large_numbers[numbers_of_zeros == number_of_zeros]
+        if number_of_zeros >= 15:
+            values[indexes] = max_count
+            continue
+        digits = nybbles[starts[indexes,np.newaxis] + number_of_zeros +
+                         np.arange(number_of_zeros + 1)]
+        j = np.dot(digits, 16**np.arange(number_of_zeros, -1, -1))
+        values[indexes] = j - 15 + (13 - token_dyn_f[indexes])*16 + token_dyn_f[indexes]
+    values = np.minimum(values, max_count)
+
+    # Split the run counts and the repeat row counts, a 14 command is followed by the count and a
+    # 15 command means one repetition
+    is_repeat_count = np.zeros(starts.size, dtype=np.bool)
+    is_repeat_count[1:] = (first_nybbles[:-1] == 14) & (token_glyphs[1:] == token_glyphs[:-1])
+    is_run_count = ~(is_repeat_count | (first_nybbles >= 14))
+    is_repeat = is_repeat_count | (first_nybbles == 15)
+    run_counts = values[is_run_count]
+    run_glyphs = token_glyphs[is_run_count]
+    glyph_first_runs = _exclusive_cumsum(np.bincount(run_glyphs, minlength=number_of_glyphs))
+
+    # Offset of the runs in the stored rows of their glyph, the extra runs are dropped
+    run_offsets = _exclusive_cumsum(np.append(run_counts, 0))
+    glyph_offsets = run_offsets[glyph_first_runs]
+    run_offsets_in_glyph = run_offsets[:-1] - glyph_offsets[run_glyphs]
+    run_counts = np.minimum(run_counts, sizes[run_glyphs] - run_offsets_in_glyph)
+    run_counts[run_counts < 0] = 0
+
+    # The repeat row count applies to the row where the next run starts
+    widths_or_one = np.maximum(widths, 1)
+    repeat_glyphs = token_glyphs[is_repeat]
+    next_runs = np.cumsum(is_run_count)[is_repeat]
+    repeated_rows = ((run_offsets[next_runs] - glyph_offsets[repeat_glyphs]) //
+                     widths_or_one[repeat_glyphs])
+    repeat_row_counts = np.where(first_nybbles == 15, 1, values)[is_repeat]
+
+    # Expand the runs to the stored rows, the last row of a glyph is completed by a white run.  The
+    # pixels are computed by a xor scan of the colour changes.
+    run_colours = ((np.arange(run_counts.size) - glyph_first_runs[run_glyphs]) % 2 == 0)
+    run_colours = run_colours == first_pixel_is_black[run_glyphs]
+    stored_sizes = np.bincount(run_glyphs, run_counts, minlength=number_of_glyphs).astype(np.int64)
+    numbers_of_stored_rows = -(-stored_sizes // widths_or_one)
+    glyph_last_runs = glyph_first_runs + np.bincount(run_glyphs, minlength=number_of_glyphs)
+    run_colours = np.insert(run_colours, glyph_last_runs, False)
+    padding_sizes = numbers_of_stored_rows * widths - stored_sizes
+    run_counts = np.insert(run_counts, glyph_last_runs, padding_sizes)
+    is_not_empty = run_counts > 0
+    run_colours = run_colours[is_not_empty]
+    run_counts = run_counts[is_not_empty]
+    colour_changes = np.empty(run_colours.size, dtype=np.bool)
+    colour_changes[:1] = run_colours[:1]
+    colour_changes[1:] = run_colours[1:] != run_colours[:-1]
+    pixels = np.zeros(run_counts.sum(), dtype=np.bool)
+    pixels[_exclusive_cumsum(run_counts)[colour_changes]] = True
+    pixels = np.logical_xor.accumulate(pixels)
+
+    # Repeat the rows, the last repeat row count of a row wins as for the reference decoder
+    glyph_first_stored_rows = _exclusive_cumsum(numbers_of_stored_rows)
+    row_repetitions = np.ones(numbers_of_stored_rows.sum(), dtype=np.int64)
+    is_valid = repeated_rows < numbers_of_stored_rows[repeat_glyphs]
+    repeat_glyphs = repeat_glyphs[is_valid]
+    repeated_rows = glyph_first_stored_rows[repeat_glyphs] + repeated_rows[is_valid]
+    is_last = np.ones(repeated_rows.size, dtype=np.bool)
+    is_last[:-1] = repeated_rows[1:] != repeated_rows[:-1]
+    row_repetitions[repeated_rows[is_last]] += repeat_row_counts[is_valid][is_last]
+    has_repetitions = np.bincount(repeat_glyphs, minlength=number_of_glyphs) > 0
+
+    # Split the bitmaps
+    glyph_bitmaps = []
+    offset = 0
+    for glyph, first_row, number_of_stored_rows, has_repetition in zip(
+            glyphs,
+            glyph_first_stored_rows.tolist(),
+            numbers_of_stored_rows.tolist(),
+            has_repetitions.tolist()):
+        size = number_of_stored_rows * glyph.width
+        glyph_bitmap = pixels[offset:offset+size].reshape(number_of_stored_rows, glyph.width)
+        offset += size
+        if has_repetition:
+            rows = np.repeat(np.arange(number_of_stored_rows),
+                             row_repetitions[first_row:first_row+number_of_stored_rows])
+            glyph_bitmap = glyph_bitmap[rows[:glyph.height]]
+        else:
+            glyph_bitmap = glyph_bitmap[:glyph.height].copy()
+        number_of_missing_rows = glyph.height - glyph_bitmap.shape[0]
+        if number_of_missing_rows:
+            # truncated glyph
+            glyph_bitmap = np.concatenate((glyph_bitmap,
+                                           np.zeros((number_of_missing_rows, glyph.width),
+                                                    dtype=np.bool)))
+        glyph_bitmaps.append(glyph_bitmap)
+
+    return glyph_bitmaps
+
+####################################################################################################
+
 class PkGlyph(object):
 
     """ This class contains the information stored in the Packed Font file for each glyph.  For
@@ -152,6 +361,7 @@ class PkGlyph(object):
         self.nybbles, self.dyn_f, self.first_pixel_is_black = nybbles, dyn_f, first_pixel_is_black
 
         self.glyph_bitmap = None
+        self.packed_glyph_bitmap = None
 
         self.pk_font.register_glyph(self)
 
@@ -161,6 +371,8 @@ class PkGlyph(object):
 
         """ Init the packed number decoder. """
 
+        # the nybble stream is a view on the mapped file, indexing a byte array is faster
+        self._bytes = bytearray(self.nybbles)
         self._nybble_index = 0
         self._upper_nybble = True
         self._repeat_row_count = 0
@@ -172,7 +384,7 @@ class PkGlyph(object):
         """ Return the next nybble from the byte array.
         """
 
-        byte = self.nybbles[self._nybble_index]
+        byte = self._bytes[self._nybble_index]
 
         if self._upper_nybble:
             nybble = byte >> 4
@@ -229,27 +441,55 @@ class PkGlyph(object):
 
     def _decode_bitmap_glyph(self):
 
-        """ Decode a bitmap glyph. """
+        """ Decode a bitmap glyph.
+
+        The raster is stored row by row, from the top-left corner, one bit per pixel and without
+        padding between the rows.
+        """
+
+        size = self.height * self.width
+        bits = np.unpackbits(np.frombuffer(self.nybbles, dtype=np.uint8))
+        self.glyph_bitmap = bits[:size].astype(np.bool).reshape(self.height, self.width)
+
+    ##############################################
+
+    def _decode_packed_glyph(self):
+
+        """ Decode a packed glyph, cf. :func:`decode_packed_glyphs`. """
+
+        self.glyph_bitmap = decode_packed_glyphs([self])[0]
+
+    ##############################################
+
+    def _decode_bitmap_glyph_iteratively(self):
+
+        """ Decode a bitmap glyph one pixel at a time, this is the reference implementation of
+        :meth:`_decode_bitmap_glyph`.
+        """
 
         size = self.height * self.width
         glyph_bitmap = self.glyph_bitmap = np.zeros(size, dtype=np.bool)
 
         i = 0
-        for byte in self.nybbles:
+        for byte in bytearray(self.nybbles):
             mask = 128
             for j in xrange(8):
                 glyph_bitmap[i] = bool(byte & mask)
                 mask >>= 1
                 i += 1
+                if i == size:
+                    break
             if i == size:
                 break
         glyph_bitmap.shape = self.height, self.width
 
     ##############################################
 
-    def _decode_packed_glyph(self):
+    def _decode_packed_glyph_iteratively(self):
 
-        """ Decode a packed glyph. """
+        """ Decode a packed glyph one packed number at a time, this is the reference implementation
+        of :meth:`_decode_packed_glyph`.
+        """
 
         # Fixme: try linear approach
         #  current i and row = int(i / width)
@@ -303,6 +543,17 @@ class PkGlyph(object):
 
     ##############################################
 
+    def _decode_glyph_iteratively(self):
+
+        """ Decode the glyph using the reference implementation. """
+
+        if self.is_bitmap():
+            self._decode_bitmap_glyph_iteratively()
+        else:
+            self._decode_packed_glyph_iteratively()
+
+    ##############################################
+
     def count_list(self):
 
         """ Return the count list as :command:`pktype`. """
@@ -355,12 +606,81 @@ class PkGlyph(object):
 
     def get_glyph_bitmap(self):
 
-        """ Return the glyph bitmap as a Numpy array. """
+        """ Return the glyph bitmap as a Numpy array.
 
-        if self.glyph_bitmap is None:
-            self._decode_glyph()
+        If the font keeps the bitmaps bit-packed, cf. :attr:`PyDvi.PkFont.PkFont.bit_packed`, the
+        decoded bitmap is stored using :func:`numpy.packbits` and an unpacked copy is returned.
+        """
 
-        return self.glyph_bitmap
+        if self.glyph_bitmap is not None:
+            return self.glyph_bitmap
+
+        if self.packed_glyph_bitmap is None:
+            # the glyph is shared by the threads
+            with self.pk_font._lock:
+                if self.glyph_bitmap is not None:
+                    return self.glyph_bitmap
+                if self.packed_glyph_bitmap is None:
+                    self._decode_glyph()
+                    glyph_bitmap, self.glyph_bitmap = self.glyph_bitmap, None
+                    self.set_glyph_bitmap(glyph_bitmap)
+                    return glyph_bitmap
+
+        glyph_bitmap = np.unpackbits(self.packed_glyph_bitmap, axis=1)[:,:self.width]
+        return glyph_bitmap.view(np.bool)
+
+    ##############################################
+
+    def is_decoded(self):
+
+        """ Return :obj:`True` if the glyph bitmap is decoded. """
+
+        return self.glyph_bitmap is not None or self.packed_glyph_bitmap is not None
+
+    ##############################################
+
+    def set_glyph_bitmap(self, glyph_bitmap):
+
+        """ Store the decoded glyph bitmap *glyph_bitmap*, bit-packed if the font requires it.  The
+        caller must hold the lock of the font.
+        """
+
+        if self.pk_font.bit_packed:
+            self.packed_glyph_bitmap = np.packbits(glyph_bitmap, axis=1)
+        else:
+            self.glyph_bitmap = glyph_bitmap
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory used by the packet and the decoded bitmap, in bytes. """
+
+        usage = len(self.nybbles)
+        for glyph_bitmap in self.glyph_bitmap, self.packed_glyph_bitmap:
+            if glyph_bitmap is not None:
+                usage += glyph_bitmap.nbytes
+
+        return usage
+
+    ##############################################
+
+    def resample(self, horizontal_scale, vertical_scale):
+
+        """ Return the :class:`ResampledPkGlyph` instance for the glyph scaled by the given factors.
+
+        The bitmap is resampled by area averaging: the coverage of a target pixel is the area of the
+        black source pixels which overlap it.  The origin of the glyph stays on a pixel corner.
+        """
+
+        glyph_bitmap = self.get_glyph_bitmap()
+        left, horizontal_weights = area_weights(self.width, self.horizontal_offset,
+                                                horizontal_scale)
+        top, vertical_weights = area_weights(self.height, self.vertical_offset, vertical_scale)
+        coverage = np.dot(np.dot(vertical_weights, glyph_bitmap), horizontal_weights.T)
+        coverage = np.rint(np.clip(coverage, 0, 1) * 255).astype(np.uint8)
+
+        return ResampledPkGlyph(self.char_code, coverage, left, -top)
 
     ##############################################
 
@@ -420,6 +740,40 @@ class PkGlyph(object):
                 self.height, self.width,
                 self.horizontal_offset, self.vertical_offset))
         
+####################################################################################################
+
+class ResampledPkGlyph(object):
+
+    """ This class implements a packed font glyph resampled to a resolution.
+
+    The attributes follow the glyphs rendered by FreeType, cf. :class:`PyDvi.Font.Type1Font.Glyph`:
+    :attr:`glyph_bitmap` is a single-channel 8-bit coverage array, :attr:`size` is the 2-tuple
+    (width, height) in pixels and :attr:`offset` is the 2-tuple (left, top) of the distances from the
+    origin to the left and top borders of the bitmap, the top distance is positive upwards.
+
+    The attribute :attr:`is_placeholder` is set for the glyphs drawn while the packed font file is
+    generated, cf. :class:`PyDvi.Font.PkFont.PkFont`.
+    """
+
+    is_placeholder = False
+
+    ##############################################
+
+    def __init__(self, char_code, glyph_bitmap, left, top):
+
+        self.char_code = char_code
+        self.glyph_bitmap = glyph_bitmap
+        self.size = glyph_bitmap.shape[1], glyph_bitmap.shape[0]
+        self.offset = left, top
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory used by the bitmap, in bytes. """
+
+        return self.glyph_bitmap.nbytes
+
 ####################################################################################################
 #
 # End
@@ -0,0 +1,292 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+""" This module implements a pool of threads to rasterise glyphs concurrently.
+
+FreeType renders the glyphs in native code and the ctypes calls release the GIL, but a face is not
+thread-safe.  Thus each worker thread of a :class:`RasteriserPool` opens its own face for each font,
+cf. :meth:`PyDvi.Font.Type1Font.Type1Font.open_face`.  The faces share the FreeType library, thus
+they are created and destroyed under :data:`PyDvi.Font.Type1Font.freetype_lock`.  The rasterised
+glyphs are stored in the shared glyph cache, cf. :mod:`PyDvi.Font.GlyphCache`.
+
+For example::
+
+  pool = RasteriserPool(number_of_threads=4)
+  glyphs = type1_font.rasterise(char_codes, size, resolution, pool=pool)
+  pool.close()
+"""
+
+####################################################################################################
+
+__all__ = ['RasteriserPool', 'RasteriserJob']
+
+####################################################################################################
+
+import Queue
+import collections
+import logging
+import multiprocessing
+import threading
+import weakref
+
+import freetype
+
+####################################################################################################
+
+from .GlyphCache import glyph_cache
+from .Type1Font import freetype_lock
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+class RasteriserJob(object):
+
+    """ This class tracks the tasks rasterising a set of glyphs for a font size. """
+
+    ##############################################
+
+    def __init__(self, font_size, glyph_indices, number_of_tasks):
+
+        self.font_size = font_size
+        self.glyph_indices = glyph_indices
+        self.glyphs = {}
+
+        self._lock = threading.Lock()
+        self._event = threading.Event()
+        self._number_of_pending_tasks = number_of_tasks
+        self._exception = None
+        if not number_of_tasks:
+            self._event.set()
+
+    ##############################################
+
+    def _task_done(self, glyphs, exception=None):
+
+        with self._lock:
+            self.glyphs.update(glyphs)
+            if exception is not None and self._exception is None:
+                self._exception = exception
+            self._number_of_pending_tasks -= 1
+            if not self._number_of_pending_tasks:
+                self._event.set()
+
+    ##############################################
+
+    def done(self):
+
+        return self._event.is_set()
+
+    ##############################################
+
+    def wait(self):
+
+        """ Wait for the completion of the job and return the list of glyphs. """
+
+        self._event.wait()
+        if self._exception is not None:
+            raise self._exception
+        return [self.glyphs[glyph_index] for glyph_index in self.glyph_indices]
+
+####################################################################################################
+
+class RasteriserPool(object):
+
+    """ This class implements a pool of threads rasterising the glyphs of Type1 fonts.
+
+    Each thread owns a FreeType face per font, and the glyphs of a job are split in chunks rendered
+    by different threads.  A thread keeps at most :attr:`max_faces` faces open, the least recently
+    used are released first, and the faces of the closed fonts are released.
+    """
+
+    _logger = _module_logger.getChild('RasteriserPool')
+
+    #: Minimal number of glyphs rendered by a task
+    min_chunk_size = 8
+
+    #: Maximal number of faces opened by a thread
+    max_faces = 8
+
+    ##############################################
+
+    def __init__(self, number_of_threads=None):
+
+        if number_of_threads is None:
+            number_of_threads = multiprocessing.cpu_count()
+        self.number_of_threads = number_of_threads
+
+        with freetype_lock:
+            freetype.set_lcd_filter(freetype.FT_LCD_FILTER_LIGHT)
+
+        self._local = threading.local()
+        self._queue = Queue.Queue()
+        self._threads = []
+        for i in xrange(number_of_threads):
+            thread = threading.Thread(target=self._run, name='Rasteriser-{}'.format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    ##############################################
+
+    def __enter__(self):
+
+        return self
+
+    ##############################################
+
+    def __exit__(self, exc_type, exc_value, traceback):
+
+        self.close()
+
+    ##############################################
+
+    def close(self):
+
+        """ Stop the threads once the queued tasks are done. """
+
+        for thread in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    ##############################################
+
+    def _face(self, font):
+
+        """ Return the face of the font *font* owned by the current thread. """
+
+        try:
+            faces = self._local.faces
+        except AttributeError:
+            # font filename -> (font weak reference, number of closes of the font, face)
+            faces = self._local.faces = collections.OrderedDict()
+
+        # FreeType destroys a face when it is released, thus the faces are released under the lock,
+        # the references held by the locals of _update_faces are dropped before the lock
+        with freetype_lock:
+            return self._update_faces(faces, font)
+
+    ##############################################
+
+    def _update_faces(self, faces, font):
+
+        """ Release the stale and the least recently used faces of *faces* and return the face of
+        the font *font*.
+        """
+
+        for filename in list(faces):
+            cached_font = faces[filename][0]()
+            if cached_font is None or cached_font.number_of_closes != faces[filename][1]:
+                del faces[filename]
+
+        entry = faces.pop(font.filename, None)
+        if entry is not None and entry[0]() is font:
+            face = entry[2]
+        else:
+            face = font.open_face()
+        # move the face at the most recently used end
+        faces[font.filename] = (weakref.ref(font), font.number_of_closes, face)
+        while len(faces) > self.max_faces:
+            faces.popitem(last=False)
+
+        return face
+
+    ##############################################
+
+    def _run(self):
+
+        while True:
+            task = self._queue.get()
+            if task is None:
+                # release the faces of the thread
+                with freetype_lock:
+                    self._local.__dict__.clear()
+                break
+            job, glyph_indices, lcd = task
+            glyphs = {}
+            try:
+                font_size = job.font_size
+                face = self._face(font_size.font)
+                font_size._set_face_transfrom(face, lcd_filter=False)
+                for glyph_index in glyph_indices:
+                    glyph = font_size._render_glyph(glyph_index, lcd, face)
+                    glyph_cache.add(font_size._cache_key(glyph_index), glyph)
+                    glyphs[glyph_index] = glyph
+            except Exception as exception:
+                self._logger.error("Cannot rasterise glyphs: {}".format(exception))
+                job._task_done(glyphs, exception)
+            else:
+                job._task_done(glyphs)
+            # the face is held by the faces of the thread, it must only be released by _face
+            face = None
+
+    ##############################################
+
+    def submit(self, font_size, glyph_indices, lcd=False):
+
+        """ Queue the rasterisation of the glyphs *glyph_indices* of the
+        :class:`PyDvi.Font.Type1Font.FontSize` instance *font_size* and return a
+        :class:`RasteriserJob` instance.  The glyphs which are in the glyph cache are not rendered
+        again.
+        """
+
+        if not self._threads:
+            raise NameError("Rasteriser pool is closed")
+
+        glyphs = {}
+        missing_glyph_indices = []
+        for glyph_index in glyph_indices:
+            if glyph_index not in glyphs:
+                glyph = glyph_cache.get(font_size._cache_key(glyph_index))
+                if glyph is None:
+                    missing_glyph_indices.append(glyph_index)
+                glyphs[glyph_index] = glyph
+
+        number_of_glyphs = len(missing_glyph_indices)
+        chunk_size = max(self.min_chunk_size, -(-number_of_glyphs // self.number_of_threads))
+        chunks = [missing_glyph_indices[i:i+chunk_size]
+                  for i in xrange(0, number_of_glyphs, chunk_size)]
+
+        job = RasteriserJob(font_size, list(glyph_indices), len(chunks))
+        job.glyphs.update(glyphs)
+        for chunk in chunks:
+            self._queue.put((job, chunk, lcd))
+
+        return job
+
+    ##############################################
+
+    def rasterise(self, font_size, glyph_indices, lcd=False):
+
+        """ Rasterise the glyphs and return the list of glyphs, cf. :meth:`submit`. """
+
+        return self.submit(font_size, glyph_indices, lcd).wait()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
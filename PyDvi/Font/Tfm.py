@@ -51,20 +51,47 @@ code as index on the :class:`Tfm` class instance.  For example to get the metric
 
    tfm[ord('A')]
 
+The class :class:`CompactTfm` stores the same metrics in Numpy arrays, the :class:`TfmChar`,
+:class:`TfmKern` and :class:`TfmLigature` instances are then lightweight views built on demand.
+To get a :class:`CompactTfm` instance use :meth:`PyDvi.TfmParser.CompactTfmParser.parse`.
+
+The ligature/kern programs are compiled on demand to a table indexed by pairs of character codes,
+use :meth:`Tfm.kern` and :meth:`Tfm.lig_kern_action` to query it and :meth:`Tfm.apply_lig_kern` to
+apply the ligatures and kerns to a sequence of characters::
+
+  >>> tfm.apply_lig_kern([ord(x) for x in 'ffi'])
+  ([14], [0.0, 0.0])
+
 """
 
 ####################################################################################################
 
-__all__ = ['Tfm', 'TfmChar', 'TfmExtensibleChar', 'TfmKern', 'TfmLigature']
+__all__ = ['LEFT_BOUNDARY_CHAR', 'Tfm', 'CompactTfm', 'TfmChar', 'TfmExtensibleChar', 'TfmKern', 'TfmLigature']
 
 ####################################################################################################
 
 import string
+import sys
 
 ####################################################################################################
 
 from ..Tools.Logging import print_card
 
+#: Code used for the left boundary character in the pair table, it is outside the 8-bit range.
+LEFT_BOUNDARY_CHAR = 256
+
+#: Kern steps have an op byte greater or equal to this value.
+KERN_OPCODE = 128
+
+####################################################################################################
+
+def _to_unicode(string):
+    # TFM strings are bytes, which are not JSON serialisable
+    return string.decode('latin-1') if string is not None else None
+
+def _from_unicode(string):
+    return string.encode('latin-1') if string is not None else None
+
 ####################################################################################################
 
 class TfmChar(object):
@@ -87,6 +114,10 @@ class TfmChar(object):
     #: List of the printable characters.
     printable = string.digits + string.letters + string.punctuation
 
+    __slots__ = ('tfm', 'char_code',
+                 'width', 'height', 'depth', 'italic_correction',
+                 'lig_kern_program_index', 'next_larger_char')
+
     ##############################################
 
     def __init__(self,
@@ -100,7 +131,6 @@ class TfmChar(object):
                  next_larger_char=None):
 
         self.tfm = tfm
-        tfm[char_code] = self
 
         self.char_code = char_code
         self.width = width
@@ -162,7 +192,7 @@ class TfmChar(object):
         """ Get the ligature/kern program of the character. """
 
         if self.lig_kern_program_index is not None:
-            return self.tfm.get_lig_kern_program(self.lig_kern_program_index)
+            return self.tfm.get_lig_kern_steps(self.lig_kern_program_index)
         else:
             return None
 
@@ -223,6 +253,8 @@ class TfmExtensibleChar(TfmChar):
       :attr:`rep`
      """
 
+    __slots__ = ('top', 'mid', 'bot', 'rep')
+
     ##############################################
 
     def __init__(self,
@@ -254,6 +286,8 @@ class TfmLigKern(object):
     """ This classe serves of base class for ligature and kern program instruction.
     """
 
+    __slots__ = ('tfm', 'stop', 'index', 'next_char')
+
     ##############################################
 
     def __init__(self, tfm, index, stop, next_char):
@@ -263,22 +297,13 @@ class TfmLigKern(object):
         self.index = index
         self.next_char = next_char
 
-        self.tfm.add_lig_kern(self)
-
     ##############################################
 
     def __iter__(self):
 
         """ Iterate of the ligature/kern program. """
 
-        i = self.index
-        while True:
-            lig_kern = self.tfm.get_lig_kern_program(i)
-            yield lig_kern
-            if lig_kern.stop:
-                break
-            else:
-                i += 1
+        return iter(self.tfm.get_lig_kern_steps(self.index))
 
 ####################################################################################################
 
@@ -295,6 +320,8 @@ class TfmKern(TfmLigKern):
         kerning value
     """
 
+    __slots__ = ('kern',)
+
     ##############################################
 
     def __init__(self, tfm, index, stop, next_char, kern):
@@ -338,6 +365,11 @@ class TfmLigature(TfmLigKern):
 
     """
 
+    __slots__ = ('ligature_char_code',
+                 'number_of_chars_to_pass_over',
+                 'current_char_is_deleted',
+                 'next_char_is_deleted')
+
     ##############################################
 
     def __init__(self,
@@ -399,6 +431,12 @@ class Tfm(object):
       :attr:`family`
         font's family
 
+      :attr:`right_boundary_char`
+        right boundary character code or :obj:`None`
+
+      :attr:`left_boundary_program_index`
+        index of the left boundary ligature/kern program or :obj:`None`
+
       :attr:`slant`
 
       :attr:`spacing`
@@ -474,9 +512,16 @@ class Tfm(object):
         self.character_coding_scheme = character_coding_scheme
         self.family = family
 
+        self.right_boundary_char = None
+        self.left_boundary_program_index = None
+
         self._lig_kerns = []
         self._chars = {}
 
+        self._lig_kern_program = None
+        self._kerns = None
+        self._pairs = None
+
     ##############################################
 
     def __setitem__(self, char_code, value):
@@ -566,6 +611,228 @@ class Tfm(object):
 
     ##############################################
 
+    def set_lig_kern_program(self, program, kerns):
+
+        """ Set the raw ligature/kern program, an array of four bytes per step, and the kern table.
+
+        They are used to build the pair table and to apply the ligature/kern programs, cf.
+        :meth:`apply_lig_kern`.
+        """
+
+        self._lig_kern_program = program
+        self._kerns = kerns
+        self._pairs = None
+
+    ##############################################
+
+    def _iter_lig_kern_step_indexes(self, i):
+
+        """ Iterate over the step indexes of the ligature/kern program starting at index *i*.
+
+        If the first instruction has ``skip_byte > 128``, the program actually begins at location
+        ``256 * op_byte + remainder``.  Then the next step is obtained by skipping ``skip_byte``
+        intervening steps, the program stops after a step having ``skip_byte >= 128`` and a step
+        having ``skip_byte > 128`` denotes an unconditional halt.
+        """
+
+        program = self._lig_kern_program
+        skip_byte, next_char, op_byte, remainder = program[i]
+        if skip_byte > 128:
+            i = 256*int(op_byte) + remainder
+        while True:
+            skip_byte = program[i, 0]
+            if skip_byte > 128:
+                break
+            yield i
+            if skip_byte == 128:
+                break
+            i += skip_byte + 1
+
+    ##############################################
+
+    def get_lig_kern_steps(self, i):
+
+        """ Return the list of the :class:`TfmKern` and :class:`TfmLigature` instances of the
+        ligature/kern program starting at index *i*.
+        """
+
+        return [self.get_lig_kern_program(j) for j in self._iter_lig_kern_step_indexes(i)]
+
+    ##############################################
+
+    def _build_pair_table(self):
+
+        """ Build the table which maps a pair of character codes to a kern or a ligature action.
+
+        A kern is a float and a ligature is the 4-tuple made of the ligature character code, a flag
+        to keep the current character, a flag to keep the next character and the number of
+        characters to pass over.  The pair ``(LEFT_BOUNDARY_CHAR, next_char)`` is used for the left
+        boundary program.  When several steps match the same pair, the first one wins.
+        """
+
+        self._pairs = pairs = {}
+        if self._lig_kern_program is None or not len(self._lig_kern_program):
+            return
+
+        program = self._lig_kern_program.tolist()
+        kerns = self._kerns
+
+        program_starts = []
+        for char_code in xrange(self.smallest_character_code, self.largest_character_code +1):
+            try:
+                lig_kern_program_index = self[char_code].lig_kern_program_index
+            except KeyError:
+                continue
+            if lig_kern_program_index is not None:
+                program_starts.append((char_code, lig_kern_program_index))
+        if self.left_boundary_program_index is not None:
+            program_starts.append((LEFT_BOUNDARY_CHAR, self.left_boundary_program_index))
+
+        for char_code, i in program_starts:
+            for j in self._iter_lig_kern_step_indexes(i):
+                skip_byte, next_char, op_byte, remainder = program[j]
+                pair = (char_code, next_char)
+                if pair in pairs:
+                    continue
+                if op_byte >= KERN_OPCODE:
+                    pairs[pair] = float(kerns[256*(op_byte - KERN_OPCODE) + remainder])
+                else:
+                    pairs[pair] = (remainder,
+                                   bool(op_byte & 0x02),
+                                   bool(op_byte & 0x01),
+                                   op_byte >> 2)
+
+    ##############################################
+
+    def lig_kern_action(self, char_code, next_char):
+
+        """ Return the action of the pair *char_code*, *next_char*: a kern as a float, a ligature as
+        a 4-tuple, cf. :meth:`_build_pair_table`, or :obj:`None`.  The pair table is built at the
+        first call.
+        """
+
+        if self._pairs is None:
+            self._build_pair_table()
+        return self._pairs.get((char_code, next_char))
+
+    ##############################################
+
+    def kern(self, char_code, next_char):
+
+        """ Return the kern between *char_code* and *next_char* in design size unit. """
+
+        action = self.lig_kern_action(char_code, next_char)
+        if action.__class__ is float:
+            return action
+        else:
+            return 0.
+
+    ##############################################
+
+    def apply_lig_kern(self, char_codes, boundary_chars=True):
+
+        """ Apply the ligature/kern programs to the sequence of character codes *char_codes* as TeX
+        does for a word.
+
+        Return the 2-tuple made of the list of the resulting character codes and the list of the
+        kerns, in design size unit, where the kern at index *i* is inserted before the character at
+        index *i* and the last kern is appended after the last character.
+
+        If *boundary_chars* is set, the implicit left and right boundary characters of the font are
+        put before and after the sequence.  They can be involved in ligatures and kerns, but they
+        never appear in the output.
+        """
+
+        if self._pairs is None:
+            self._build_pair_table()
+        pairs = self._pairs
+
+        # The right boundary character is matched using its code in the font, but it is identified by
+        # its position in the sequence since its code can be a regular character.
+        sequence = list(char_codes)
+        left_boundary = boundary_chars and self.left_boundary_program_index is not None
+        if left_boundary:
+            sequence.insert(0, LEFT_BOUNDARY_CHAR)
+        right_boundary = boundary_chars and self.right_boundary_char is not None
+        if right_boundary:
+            sequence.append(self.right_boundary_char)
+        # index of the first implicit character at the end of the sequence
+        end = len(sequence) - right_boundary
+
+        output = []
+        kerns = [0.]
+        position = 0
+        # guard against a cyclic ligature program
+        number_of_iterations = 0
+        maximum_number_of_iterations = 4*len(sequence) + 16
+        while position < end:
+            number_of_iterations += 1
+            if number_of_iterations > maximum_number_of_iterations:
+                raise ValueError('Infinite ligature loop in font {}'.format(self.font_name))
+            char_code = sequence[position]
+            if position + 1 < len(sequence):
+                action = pairs.get((char_code, sequence[position + 1]))
+            else:
+                action = None
+            if action is None or action.__class__ is float:
+                if char_code != LEFT_BOUNDARY_CHAR:
+                    output.append(char_code)
+                    kerns.append(0.)
+                if action is not None:
+                    kerns[-1] += action
+                position += 1
+            else:
+                ligature_char_code, keep_current, keep_next, number_of_chars_to_pass_over = action
+                replacement = [ligature_char_code]
+                if keep_current:
+                    replacement.insert(0, char_code)
+                if keep_next:
+                    replacement.append(sequence[position + 1])
+                elif position + 1 == end:
+                    # the right boundary character was consumed
+                    end += 1
+                sequence[position:position +2] = replacement
+                end += len(replacement) - 2
+                for i in xrange(number_of_chars_to_pass_over):
+                    if position < end and sequence[position] != LEFT_BOUNDARY_CHAR:
+                        output.append(sequence[position])
+                        kerns.append(0.)
+                    position += 1
+
+        return output, kerns
+
+    ##############################################
+
+    def _iter_chars(self):
+
+        """ Iterate over the :class:`TfmChar` instances. """
+
+        for char_code in sorted(self._chars):
+            yield self._chars[char_code]
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return an estimation of the memory used by the characters and the lig/kern program, in
+        bytes.
+        """
+
+        usage = sys.getsizeof(self._chars) + sys.getsizeof(self._lig_kerns)
+        for obj in self._chars.values() + self._lig_kerns:
+            usage += sys.getsizeof(obj)
+            for attribute in ('width', 'height', 'depth', 'italic_correction', 'kern'):
+                value = getattr(obj, attribute, None)
+                if isinstance(value, float):
+                    usage += sys.getsizeof(value)
+        for array in self._lig_kern_program, self._kerns:
+            if array is not None:
+                usage += array.nbytes
+
+        return usage
+
+    ##############################################
+
     def print_summary(self):
 
         string_format = '''TFM %s
@@ -604,9 +871,200 @@ Font Parameters:
                                    )
 
         print_card(message)
-        for char in self._chars.values():
+        for char in self._iter_chars():
             char.print_summary()
 
+####################################################################################################
+
+class CompactTfm(Tfm):
+
+    """ This class stores the TeX Font Metric of a font in Numpy arrays.
+
+    The characters are stored in columns indexed by ``char_code - smallest_character_code`` and the
+    ligature/kern program is stored as its raw four bytes per step.  The :class:`TfmChar`,
+    :class:`TfmKern` and :class:`TfmLigature` instances returned by :meth:`__getitem__` and
+    :meth:`get_lig_kern_program` are views created on demand, they are not stored.
+    """
+
+    #: Names of the font parameter attributes
+    _parameter_names = ('slant', 'spacing', 'space_stretch', 'space_shrink', 'x_height', 'quad',
+                        'extra_space',
+                        'num1', 'num2', 'num3', 'denom1', 'denom2', 'sup1', 'sup2', 'sup3',
+                        'sub1', 'sub2', 'supdrop', 'subdrop', 'delim1', 'delim2', 'axis_height',
+                        'default_rule_thickness', 'big_op_spacing')
+
+    #: Names of the arrays
+    _array_names = ('widths', 'heights', 'depths', 'italic_corrections',
+                    'tags', 'remainders', 'extensible_recipes',
+                    'lig_kern_program', 'kerns')
+
+    ##############################################
+
+    def __init__(self, *args, **kwargs):
+
+        super(CompactTfm, self).__init__(*args, **kwargs)
+
+        self._widths = None
+        self._heights = None
+        self._depths = None
+        self._italic_corrections = None
+        self._tags = None
+        self._remainders = None
+        self._extensible_recipes = None
+
+    ##############################################
+
+    def set_characters(self,
+                       widths, heights, depths, italic_corrections,
+                       tags, remainders,
+                       extensible_recipes):
+
+        """ Set the character columns and the extensible recipe table. """
+
+        self._widths = widths
+        self._heights = heights
+        self._depths = depths
+        self._italic_corrections = italic_corrections
+        self._tags = tags
+        self._remainders = remainders
+        self._extensible_recipes = extensible_recipes
+
+
+    ##############################################
+
+    def to_arrays(self):
+
+        """ Return the 2-tuple made of the JSON serialisable metadata and the dictionary of arrays,
+        cf. :func:`PyDvi.Tools.Cache.dump_arrays`.
+        """
+
+        metadata = {
+            'smallest_character_code':self.smallest_character_code,
+            'largest_character_code':self.largest_character_code,
+            'checksum':self.checksum,
+            'design_font_size':self.design_font_size,
+            'character_coding_scheme':_to_unicode(self.character_coding_scheme),
+            'family':_to_unicode(self.family),
+            'right_boundary_char':self.right_boundary_char,
+            'left_boundary_program_index':self.left_boundary_program_index,
+            'parameters':{name:getattr(self, name)
+                          for name in self._parameter_names if hasattr(self, name)},
+            }
+        arrays = {name:getattr(self, '_' + name) for name in self._array_names}
+
+        return metadata, arrays
+
+    ##############################################
+
+    @classmethod
+    def from_arrays(cls, font_name, filename, metadata, arrays):
+
+        """ Return a :class:`CompactTfm` instance for the metadata and arrays returned by
+        :meth:`to_arrays`.
+        """
+
+        tfm = cls(font_name,
+                  filename,
+                  metadata['smallest_character_code'],
+                  metadata['largest_character_code'],
+                  metadata['checksum'],
+                  metadata['design_font_size'],
+                  _from_unicode(metadata['character_coding_scheme']),
+                  _from_unicode(metadata['family']))
+        tfm.right_boundary_char = metadata['right_boundary_char']
+        tfm.left_boundary_program_index = metadata['left_boundary_program_index']
+        for name, value in metadata['parameters'].iteritems():
+            setattr(tfm, str(name), value)
+        for name in cls._array_names:
+            setattr(tfm, '_' + name, arrays[name])
+
+        return tfm
+
+    ##############################################
+
+    def __setitem__(self, char_code, value):
+
+        raise NotImplementedError('A CompactTfm instance is read only')
+
+    ##############################################
+
+    def __getitem__(self, char_code):
+
+        """ Return a :class:`TfmChar` view for the character code *char_code*. """
+
+        i = char_code - self.smallest_character_code
+        if not 0 <= i < len(self):
+            raise KeyError(char_code)
+
+        args = (self, char_code,
+                float(self._widths[i]),
+                float(self._heights[i]),
+                float(self._depths[i]),
+                float(self._italic_corrections[i]))
+        tag = self._tags[i]
+        remainder = int(self._remainders[i])
+        if tag == 1:
+            return TfmChar(*args, lig_kern_program_index=remainder)
+        elif tag == 2:
+            return TfmChar(*args, next_larger_char=remainder)
+        elif tag == 3:
+            return TfmExtensibleChar(*args, extensible_recipe=self._extensible_recipes[remainder].tolist())
+        else:
+            return TfmChar(*args)
+
+    ##############################################
+
+    def __len__(self):
+
+        return self._widths.size
+
+    ##############################################
+
+    def add_lig_kern(self, obj):
+
+        raise NotImplementedError('A CompactTfm instance is read only')
+
+    ##############################################
+
+    def get_lig_kern_program(self, i):
+
+        """ Return a :class:`TfmKern` or :class:`TfmLigature` view for the step at index *i*. """
+
+        skip_byte, next_char, op_byte, remainder = self._lig_kern_program[i].tolist()
+        stop = skip_byte >= 128
+        if op_byte >= KERN_OPCODE:
+            kern_index = 256*(op_byte - KERN_OPCODE) + remainder
+            # the special instructions of the boundary characters and of the large programs are not
+            # real steps
+            kern = float(self._kerns[kern_index]) if kern_index < self._kerns.size else 0.
+            return TfmKern(self, i, stop, next_char, kern)
+        else:
+            return TfmLigature(self, i, stop, next_char,
+                               remainder,
+                               op_byte >> 2,
+                               (op_byte & 0x02) == 0,
+                               (op_byte & 0x01) == 0)
+
+    ##############################################
+
+    def _iter_chars(self):
+
+        for char_code in xrange(self.smallest_character_code, self.largest_character_code +1):
+            yield self[char_code]
+
+    ##############################################
+
+    def memory_usage(self):
+
+        usage = sys.getsizeof(self) + sys.getsizeof(self.__dict__)
+        for array in (self._widths, self._heights, self._depths, self._italic_corrections,
+                      self._tags, self._remainders, self._extensible_recipes,
+                      self._lig_kern_program, self._kerns):
+            if array is not None:
+                usage += array.nbytes
+
+        return usage
+
 ####################################################################################################
 #
 # End
@@ -23,7 +23,6 @@
 # Audit
 #
 # - 11/12/2011 Fabrice
-#  - check self registration
 #  - read kern table fix word before kern/lig table ?
 #
 ####################################################################################################
@@ -37,6 +36,15 @@ To parse a TFM file and get a :class:`PyDvi.Tfm` instance, use the static method
 
   tfm = TfmParser.parse('cmr10', '/usr/share/texmf/fonts/tfm/public/cm/cmr10.tfm')
 
+The class :class:`NumpyTfmParser` is a faster variant which loads the whole file as an array of
+big-endian 32-bit words and decodes the dimension tables, the char info bitfields and the lig/kern
+steps with array operations.  It builds the same :class:`PyDvi.Tfm` instance::
+
+  tfm = NumpyTfmParser.parse('cmr10', '/usr/share/texmf/fonts/tfm/public/cm/cmr10.tfm')
+
+The class :class:`CompactTfmParser` keeps these arrays and returns a :class:`PyDvi.Tfm.CompactTfm`
+instance, which uses much less memory when a lot of fonts are loaded.
+
 The TFM file format in descriped in the :file:`tftopl.web` file from Web2C.  Part of this
 documentation comes from this file.
 
@@ -48,14 +56,18 @@ bytes are considered to be unsigned numbers.
 
 ####################################################################################################
 
-__all__ = ['TfmParser']
+__all__ = ['TfmParser', 'NumpyTfmParser', 'CompactTfmParser']
+
+####################################################################################################
+
+import numpy as np
 
 ####################################################################################################
 
 from ..Tools.EnumFactory import EnumFactory
 from ..Tools.FuncTools import repeat_call
-from ..Tools.Stream import FileStream
-from .Tfm import Tfm, TfmChar, TfmKern, TfmLigature, TfmExtensibleChar
+from ..Tools.Stream import FileStream, FIX_WORD_SCALE
+from .Tfm import Tfm, CompactTfm, TfmChar, TfmKern, TfmLigature, TfmExtensibleChar
 
 ####################################################################################################
 
@@ -87,16 +99,19 @@ class TfmParser(object):
     This class parse a TFM file.
     """
 
+    #: Class of the returned metrics
+    tfm_class = Tfm
+
     ##############################################
 
-    @staticmethod
-    def parse(font_name, filename):
+    @classmethod
+    def parse(cls, font_name, filename):
 
         """ Parse the TFM :file:`filename` for the font *font_name* and return a :class:`PyDvi.Tfm`
         instance.
         """
 
-        tfm_parser = TfmParser(font_name, filename)
+        tfm_parser = cls(font_name, filename)
         return tfm_parser()
 
     ##############################################
@@ -107,6 +122,12 @@ class TfmParser(object):
         self.filename = filename
         self.stream = FileStream(filename)
 
+        self._parse()
+
+    ##############################################
+
+    def _parse(self):
+
         self.tfm = None
         self._read_lengths()
         self._read_header()
@@ -357,14 +378,14 @@ class TfmParser(object):
 
         # don't read header [18 ... whatever]
 
-        self.tfm = Tfm(self.font_name,
-                       self.filename,
-                       self.smallest_character_code,
-                       self.largest_character_code,
-                       checksum,
-                       design_font_size,
-                       character_coding_scheme,
-                       family)
+        self.tfm = self.tfm_class(self.font_name,
+                                  self.filename,
+                                  self.smallest_character_code,
+                                  self.largest_character_code,
+                                  checksum,
+                                  design_font_size,
+                                  character_coding_scheme,
+                                  family)
 
     ##############################################
 
@@ -463,7 +484,10 @@ class TfmParser(object):
 
         # print 'Lig/Kern Table'
 
-        # Fixme: complete special cases
+        number_of_instructions = self.table_lengths[tables.lig_kern]
+        if not number_of_instructions:
+            self.tfm.set_lig_kern_program(np.zeros((0, 4), dtype=np.uint8), np.zeros(0))
+            return
 
         # Read very first instruction of the table
         (first_skip_byte,
@@ -471,35 +495,27 @@ class TfmParser(object):
          op_byte,
          remainder) = self._read_four_byte_numbers_in_table(tables.lig_kern, 0)
         if first_skip_byte == 255:
-            right_boundary_char = next_char
-            raise NotImplementedError('Font has right boundary char')
+            self.tfm.right_boundary_char = next_char
 
         # Read very last instruction of the table
         (last_skip_byte,
          next_char,
          op_byte,
-         remainder) = self._read_four_byte_numbers_in_table(tables.lig_kern,
-                                                            self.table_lengths[tables.lig_kern] -1)
+         remainder) = self._read_four_byte_numbers_in_table(tables.lig_kern, number_of_instructions -1)
         if last_skip_byte == 255:
-            left_boundary_char_program_index = 256*op_byte + remainder
-            raise NotImplementedError('Font has left boundary char program')
+            self.tfm.left_boundary_program_index = 256*op_byte + remainder
 
         # Read the instructions
-        first_instruction = True
-        for i in xrange(self.table_lengths[tables.lig_kern]):
+        #   The large lig/kern programs and the skip bytes are handled when a program is walked, cf.
+        #   Tfm.get_lig_kern_steps
+        program = []
+        for i in xrange(number_of_instructions):
         
             (skip_byte,
              next_char,
              op_byte,
-             remainder) = self._read_four_byte_numbers_in_table(tables.lig_kern, i)
-
-            # Large lig/kern table ?
-            if first_instruction and skip_byte > 128:
-                large_index = 256*op_byte + remainder
-                (skip_byte,
-                 next_char,
-                 op_byte,
-                 remainder) = self._read_four_byte_numbers_in_table(tables.lig_kern, large_index)
+             remainder) = instruction = self._read_four_byte_numbers_in_table(tables.lig_kern, i)
+            program.append(instruction)
 
             # Last step ?
             stop = skip_byte >= 128
@@ -508,8 +524,7 @@ class TfmParser(object):
                 # Kern step
                 kern_index = 256*(op_byte - KERN_OPCODE) + remainder
                 kern = self._read_fix_word_in_table(tables.kern, kern_index)
-                # Fixme: self registration ?
-                TfmKern(self.tfm, i, stop, next_char, kern)
+                self.tfm.add_lig_kern(TfmKern(self.tfm, i, stop, next_char, kern))
                 # print "[%u] Kern O %s R %0.6f" % (i, oct(next_char), kern)
 
             else:
@@ -518,15 +533,14 @@ class TfmParser(object):
                 current_char_is_deleted = (op_byte & 0x02) == 0
                 next_char_is_deleted    = (op_byte & 0x01) == 0
                 ligature_char_code = remainder
-                # Fixme: self registration ?
-                TfmLigature(self.tfm,
-                            i,
-                            stop,
-                            next_char,
-                            ligature_char_code,
-                            number_of_chars_to_pass_over,
-                            current_char_is_deleted,
-                            next_char_is_deleted)
+                self.tfm.add_lig_kern(TfmLigature(self.tfm,
+                                                  i,
+                                                  stop,
+                                                  next_char,
+                                                  ligature_char_code,
+                                                  number_of_chars_to_pass_over,
+                                                  current_char_is_deleted,
+                                                  next_char_is_deleted))
                 # print "[%u] Lig C %s O %s N %u %s %s" % (i,
                 #                                          oct(next_char),
                 #                                          oct(ligature_char_code),
@@ -534,12 +548,9 @@ class TfmParser(object):
                 #                                          current_char_is_deleted,
                 #                                          next_char_is_deleted)
 
-            first_instruction = stop == True
-
-            # if stop:
-            #     print 'Stop'
-
-            # print 'Lig/Kern Table End'
+        kerns = [self._read_fix_word_in_table(tables.kern, i)
+                 for i in xrange(self.table_lengths[tables.kern])]
+        self.tfm.set_lig_kern_program(np.array(program, dtype=np.uint8), np.array(kerns))
 
     ##############################################
 
@@ -629,27 +640,25 @@ class TfmParser(object):
             extensible_recipe = self._read_extensible_recipe(remainder)
 
         if extensible_recipe is not None:
-            # Fixme: self registration ?
-            TfmExtensibleChar(self.tfm,
-                              c,
-                              width,
-                              height,
-                              depth,
-                              italic_correction,
-                              extensible_recipe,
-                              lig_kern_program_index,
-                              next_larger_char)
+            self.tfm[c] = TfmExtensibleChar(self.tfm,
+                                            c,
+                                            width,
+                                            height,
+                                            depth,
+                                            italic_correction,
+                                            extensible_recipe,
+                                            lig_kern_program_index,
+                                            next_larger_char)
 
         else:
-            # Fixme: self registration ?
-            TfmChar(self.tfm,
-                    c,
-                    width,
-                    height,
-                    depth,
-                    italic_correction,
-                    lig_kern_program_index,
-                    next_larger_char)
+            self.tfm[c] = TfmChar(self.tfm,
+                                  c,
+                                  width,
+                                  height,
+                                  depth,
+                                  italic_correction,
+                                  lig_kern_program_index,
+                                  next_larger_char)
 
     ##############################################
 
@@ -664,7 +673,7 @@ class TfmParser(object):
         width_index  = bytes[0]
         height_index = bytes[1] >> 4
         depth_index  = bytes[1] & 0xF
-        italic_index = bytes[2] >> 6
+        italic_index = bytes[2] >> 2
         tag          = bytes[2] & 0x3
         remainder    = bytes[3]
 
@@ -706,6 +715,222 @@ TFM %s
                                 self.table_lengths[tables.font_parameter],
                                 )
 
+####################################################################################################
+
+class NumpyTfmParser(TfmParser):
+
+    """
+    This class parse a TFM file using Numpy.
+
+    The file is loaded at once as an array of big-endian 32-bit words.  The dimension tables are
+    converted to fix words, the char info words are split in their bitfields and the lig/kern steps
+    are decoded with array operations, so that the only Python loops left are the ones which
+    instantiate the :class:`PyDvi.Tfm` objects.
+    """
+
+    ##############################################
+
+    def _parse(self):
+
+        # Copy the file content so as the array doesn't hold a reference on the mmap
+        self.words = np.frombuffer(self.stream.stream[:], dtype='>u4')
+
+        super(NumpyTfmParser, self)._parse()
+
+    ##############################################
+
+    def _table(self, table):
+
+        """ Return the words of the table *table* as an unsigned 32-bit array. """
+
+        start = self.table_pointers[table] // 4
+        return self.words[start:start + self.table_lengths[table]]
+
+    ##############################################
+
+    def _table_bytes(self, table):
+
+        """ Return the table *table* as an array of four 8-bit unsigned integers per row. """
+
+        return self._table(table).view(np.uint8).reshape(-1, 4)
+
+    ##############################################
+
+    def _fix_word_table(self, table):
+
+        """ Return the table *table* converted to fix words. """
+
+        return self._table(table).view('>i4') * FIX_WORD_SCALE
+
+    ##############################################
+
+    def _dimension_table(self, table):
+
+        """ Return the dimension table *table* converted to fix words.
+
+        The first entry is forced to zero, so as an index of zero always gives a value of zero even
+        if the table is empty.
+        """
+
+        fix_words = self._fix_word_table(table)
+        dimensions = np.zeros(max(fix_words.size, 1), dtype=np.float64)
+        dimensions[1:] = fix_words[1:]
+
+        return dimensions
+
+    ##############################################
+
+    def _decode_lig_kern_programs(self):
+
+        """ Return the lig/kern array as an array of four 8-bit unsigned integers per step and the
+        kern table, and set the boundary characters, cf. :meth:`TfmParser._read_lig_kern_programs`.
+        """
+
+        program = self._table_bytes(tables.lig_kern)
+        kerns = self._fix_word_table(tables.kern)
+
+        if program.shape[0]:
+            if program[0, 0] == 255:
+                self.tfm.right_boundary_char = int(program[0, 1])
+            if program[-1, 0] == 255:
+                self.tfm.left_boundary_program_index = 256*int(program[-1, 2]) + int(program[-1, 3])
+
+        return program, kerns
+
+    ##############################################
+
+    def _read_lig_kern_programs(self):
+
+        """ Decode the lig/kern array, cf. :meth:`TfmParser._read_lig_kern_programs`. """
+
+        program, kern_table = self._decode_lig_kern_programs()
+        self.tfm.set_lig_kern_program(program.copy(), kern_table)
+        number_of_instructions = program.shape[0]
+
+        stops = program[:,0] >= 128
+        op_bytes = program[:,2].astype(np.int32)
+        remainders = program[:,3].astype(np.int32)
+
+        is_kern = op_bytes >= KERN_OPCODE
+        if kern_table.size:
+            kern_indexes = np.where(is_kern, 256*(op_bytes - KERN_OPCODE) + remainders, 0)
+            # the special instructions of the boundary characters and of the large programs are
+            # not real steps
+            kerns = kern_table[np.minimum(kern_indexes, kern_table.size -1)]
+        else:
+            kerns = np.zeros(number_of_instructions)
+
+        tfm = self.tfm
+        for i, (stop, next_char, op_byte, remainder,
+                kern_step, kern) in enumerate(zip(stops.tolist(),
+                                                  program[:,1].tolist(),
+                                                  op_bytes.tolist(),
+                                                  remainders.tolist(),
+                                                  is_kern.tolist(),
+                                                  kerns.tolist())):
+            if kern_step:
+                lig_kern = TfmKern(tfm, i, stop, next_char, kern)
+            else:
+                lig_kern = TfmLigature(tfm,
+                                       i,
+                                       stop,
+                                       next_char,
+                                       remainder,
+                                       op_byte >> 2,
+                                       (op_byte & 0x02) == 0,
+                                       (op_byte & 0x01) == 0)
+            tfm.add_lig_kern(lig_kern)
+
+    ##############################################
+
+    def _decode_characters(self):
+
+        """ Return the width, height, depth and italic correction arrays, the tag and remainder
+        arrays of the char info array and the extensible recipes array, cf.
+        :meth:`TfmParser._read_characters`.
+        """
+
+        char_info = self._table(tables.character_info)
+
+        width_indexes = char_info >> 24
+        height_indexes = (char_info >> 20) & 0xF
+        depth_indexes = (char_info >> 16) & 0xF
+        italic_indexes = (char_info >> 10) & 0x3F
+        tags = ((char_info >> 8) & 0x3).astype(np.uint8)
+        remainders = (char_info & 0xFF).astype(np.uint8)
+
+        widths = self._dimension_table(tables.width)[width_indexes]
+        heights = self._dimension_table(tables.height)[height_indexes]
+        depths = self._dimension_table(tables.depth)[depth_indexes]
+        italic_corrections = self._dimension_table(tables.italic_correction)[italic_indexes]
+
+        extensible_recipes = self._table_bytes(tables.extensible_character)
+
+        return widths, heights, depths, italic_corrections, tags, remainders, extensible_recipes
+
+    ##############################################
+
+    def _read_characters(self):
+
+        """ Decode the char info array, cf. :meth:`TfmParser._read_characters`. """
+
+        (widths, heights, depths, italic_corrections,
+         tags, remainders, extensible_recipes) = self._decode_characters()
+        extensible_recipes = extensible_recipes.tolist()
+
+        tfm = self.tfm
+        for (c,
+             width, height, depth, italic_correction,
+             tag, remainder) in zip(xrange(self.smallest_character_code,
+                                           self.largest_character_code +1),
+                                    widths.tolist(),
+                                    heights.tolist(),
+                                    depths.tolist(),
+                                    italic_corrections.tolist(),
+                                    tags.tolist(),
+                                    remainders.tolist()):
+            if tag == LIG_TAG:
+                tfm_char = TfmChar(tfm, c, width, height, depth, italic_correction,
+                                   lig_kern_program_index=remainder)
+            elif tag == LIST_TAG:
+                tfm_char = TfmChar(tfm, c, width, height, depth, italic_correction,
+                                   next_larger_char=remainder)
+            elif tag == EXT_TAG:
+                tfm_char = TfmExtensibleChar(tfm, c, width, height, depth, italic_correction,
+                                             extensible_recipes[remainder])
+            else:
+                tfm_char = TfmChar(tfm, c, width, height, depth, italic_correction)
+            tfm[c] = tfm_char
+
+####################################################################################################
+
+class CompactTfmParser(NumpyTfmParser):
+
+    """
+    This class parse a TFM file to a :class:`PyDvi.Tfm.CompactTfm` instance.
+
+    The decoded arrays are stored as is in the metrics, no Python object is created for the
+    characters and the lig/kern steps.
+    """
+
+    tfm_class = CompactTfm
+
+    ##############################################
+
+    def _read_lig_kern_programs(self):
+
+        # Copy the table views so as the metrics don't hold a reference on the file content
+        program, kerns = self._decode_lig_kern_programs()
+        self.tfm.set_lig_kern_program(program.copy(), kerns)
+
+    ##############################################
+
+    def _read_characters(self):
+
+        arrays = list(self._decode_characters())
+        arrays[-1] = arrays[-1].copy()
+        self.tfm.set_characters(*arrays)
+
 ####################################################################################################
 #
 # End
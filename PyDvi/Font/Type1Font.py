@@ -24,7 +24,10 @@ __all__ = ['Type1Font']
 
 ####################################################################################################
 
+import ctypes
 import logging
+import os
+import threading
 import unicodedata
 
 import numpy as np
@@ -34,7 +37,10 @@ import freetype
 ####################################################################################################
 
 from ..Kpathsea import kpsewhich
+from .CharMetrics import CharMetrics
 from .Font import Font, font_types, FontMetricNotFound
+from .FontCache import font_cache
+from .GlyphCache import glyph_cache
 
 ####################################################################################################
 
@@ -42,6 +48,13 @@ _module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
 
+#: The FreeType library is shared by the faces, thus the creation and the destruction of the faces
+#: and the settings of the library must be serialised using this lock, cf.
+#: :mod:`PyDvi.Font.RasteriserPool`.
+freetype_lock = threading.RLock()
+
+####################################################################################################
+
 def from_64th_point(x):
     return x/64.
 
@@ -65,31 +78,43 @@ class Type1Font(Font):
 
     ##############################################
 
-    def __init__(self, font_manager, font_id, name):
+    def __init__(self, font_manager, font_id, name, encoding=None):
+
+        """ If the :class:`PyDvi.Font.Encoding.Encoding` instance *encoding* is given, it maps the
+        char codes to the glyphs by name, else the Adobe charmap of the font is used.
+        """
 
         super(Type1Font, self).__init__(font_manager, font_id, name)
 
         # self._glyphs = {}
 
+        self._afm_file = None
+        self.afm = None
+        #: incremented by :meth:`close`, the faces opened by :meth:`open_face` are then stale
+        self.number_of_closes = 0
         try:
-            self._face = freetype.Face(self.filename)
+            with freetype_lock:
+                self._opened_face = freetype.Face(self.filename)
         except:
             raise NameError("Freetype can't open file %s" % (self.filename))
         
         if self.tfm is None:
             self._find_afm()
 
-        encodings = [charmap.encoding for charmap in self._face.charmaps]
-        if freetype.FT_ENCODING_ADOBE_CUSTOM in encodings:
-            encoding = freetype.FT_ENCODING_ADOBE_CUSTOM
-        elif freetype.FT_ENCODING_ADOBE_STANDARD in encodings:
-            encoding = freetype.FT_ENCODING_ADOBE_STANDARD
+        self.encoding = None
+        if encoding is not None:
+            self.set_encoding(encoding)
         else:
-            # encoding = freetype.FT_ENCODING_UNICODE
-            raise NameError("Font %s doesn't have an Adobe encoding" % (self.name))
-        self._face.select_charmap(encoding)
-
-        self._init_index()
+            charmap_encodings = [charmap.encoding for charmap in self._face.charmaps]
+            if freetype.FT_ENCODING_ADOBE_CUSTOM in charmap_encodings:
+                charmap_encoding = freetype.FT_ENCODING_ADOBE_CUSTOM
+            elif freetype.FT_ENCODING_ADOBE_STANDARD in charmap_encodings:
+                charmap_encoding = freetype.FT_ENCODING_ADOBE_STANDARD
+            else:
+                # charmap_encoding = freetype.FT_ENCODING_UNICODE
+                raise NameError("Font %s doesn't have an Adobe encoding" % (self.name))
+            self._face.select_charmap(charmap_encoding)
+            self._init_index()
 
         # self._log_face_information()
         # self._log_glyph_table()
@@ -98,6 +123,33 @@ class Type1Font(Font):
 
     ##############################################
 
+    @property
+    def _face(self):
+
+        # the face is opened again if the font was closed, the char code to glyph index table is
+        # kept thus the charmap doesn't need to be selected
+        with self._lock:
+            if self._opened_face is None:
+                self._opened_face = self.open_face()
+            return self._opened_face
+
+    ##############################################
+
+    def open_face(self):
+
+        """ Open a new FreeType face for the font file, a face must not be used by several threads
+        at the same time.
+        """
+
+        with freetype_lock:
+            face = freetype.Face(self.filename)
+            if self._afm_file is not None:
+                face.attach_file(self._afm_file)
+
+        return face
+
+    ##############################################
+
     def _find_afm(self):
 
         # try:
@@ -105,33 +157,103 @@ class Type1Font(Font):
         # except FontMetricNotFound:
 
         afm_file = kpsewhich(self.name, file_format='afm')
-        print afm_file
         if afm_file is None:
-            raise NameError("AFM file was not found for font {}".format(self.name))
+            # the metrics are computed from the outlines
+            self._logger.warning("AFM file was not found for font {}".format(self.name))
         else:
             self._logger.info("Attach AFM {}".format(afm_file))
             self._face.attach_file(afm_file)
+            self._afm_file = afm_file
+            self.afm = font_cache.load_afm(afm_file)
 
     ##############################################
 
     def _init_index(self):
 
-        self._index_to_charcode = {}
-        self._charcode_to_index = {}
+        """ Build the table mapping the char codes to the glyph indexes from the charmap of the
+        face, the glyph index 0 stands for a missing glyph.  The char codes of an Adobe encoding are
+        lower than 256, the others are stored in a dictionary.
+        """
 
-        face = self._face
+        self._glyph_indices = np.zeros(256, dtype=np.uint32)
+        self._extra_glyph_indices = {}
 
+        face = self._face
+        char_codes = []
+        glyph_indices = []
         charcode, glyph_index = face.get_first_char()
         while glyph_index:
-            unicode_character = unichr(charcode)
-            try:
-                name = unicodedata.name(unicode_character)
-            except ValueError:
-                name = '<unknown character>'
-            self._index_to_charcode[glyph_index] = (charcode, name)
-            self._charcode_to_index[charcode] = (glyph_index, name)
+            if charcode < 256:
+                char_codes.append(charcode)
+                glyph_indices.append(glyph_index)
+            else:
+                self._extra_glyph_indices[charcode] = glyph_index
             # face.get_glyph_name(glyph_index) # is not available
             charcode, glyph_index = face.get_next_char(charcode, glyph_index)
+        self._glyph_indices[char_codes] = glyph_indices
+
+    ##############################################
+
+    def set_encoding(self, encoding):
+
+        """ Map the char codes to the glyph indexes using the glyph names of the
+        :class:`PyDvi.Font.Encoding.Encoding` instance *encoding*.
+        """
+
+        face = self._face
+        glyph_indices = np.zeros(256, dtype=np.uint32)
+        for char_code in xrange(min(len(encoding), 256)):
+            glyph_name = encoding.to_name(char_code)
+            if glyph_name != '.notdef':
+                glyph_indices[char_code] = face.get_name_index(glyph_name)
+
+        self.encoding = encoding
+        self._glyph_indices = glyph_indices
+        self._extra_glyph_indices = {}
+
+    ##############################################
+
+    def glyph_index(self, char_code):
+
+        """ Return the glyph index for the char code *char_code*, raise :exc:`KeyError` if the font
+        doesn't have this character.
+        """
+
+        if 0 <= char_code < 256:
+            glyph_index = int(self._glyph_indices[char_code])
+        else:
+            glyph_index = self._extra_glyph_indices.get(char_code, 0)
+        if not glyph_index:
+            raise KeyError(char_code)
+        return glyph_index
+
+    ##############################################
+
+    def glyph_indices(self, char_codes):
+
+        """ Return the list of the glyph indexes for the char codes *char_codes*, the characters
+        which are not in the font are skipped.
+        """
+
+        glyph_indices = []
+        for char_code in char_codes:
+            try:
+                glyph_indices.append(self.glyph_index(char_code))
+            except KeyError:
+                pass
+        return glyph_indices
+
+    ##############################################
+
+    def char_name(self, char_code):
+
+        """ Return the Unicode name of the char code *char_code*, it is intended to inspection tools.
+        """
+
+        try:
+            return unicodedata.name(unichr(char_code))
+        except ValueError:
+            return '<unknown character>'
 
     ##############################################
 
@@ -143,10 +265,15 @@ class Type1Font(Font):
 
     def font_size(self, font_size, resolution):
 
-        key = "{}@{}".format(font_size, resolution)
-        if font_size not in self._font_size:
-            self._font_size[key] = FontSize(self, font_size, resolution)
-        return self._font_size[key]
+        """ Return the :class:`FontSize` instance for the size *font_size* in pt and the resolution
+        *resolution* in dpi.  The size is quantised, cf. :meth:`GlyphCache.quantise_size`.
+        """
+
+        key = (glyph_cache.quantise_size(font_size), int(resolution))
+        with self._lock:
+            if key not in self._font_size:
+                self._font_size[key] = FontSize(self, font_size, resolution)
+            return self._font_size[key]
 
     ##############################################
 
@@ -156,14 +283,84 @@ class Type1Font(Font):
 
         font_size = self.font_size(size, resolution)
 
-        glyph_index, name = self._charcode_to_index[tex_glyph_index]
-        # self._logger.info("retrieve glyph {} {}".format(glyph_index, name))
+        glyph_index = self.glyph_index(tex_glyph_index)
+        # self._logger.info("retrieve glyph {} {}".format(glyph_index, self.char_name(tex_glyph_index)))
         glyph = font_size[glyph_index]
 
         return glyph
 
     ##############################################
 
+    def rasterise(self, char_codes, size, resolution=600, pool=None):
+
+        """ Rasterise in a batch the glyphs for the char codes *char_codes* at the size *size* in pt
+        and the resolution *resolution* in dpi, and return the list of glyphs.  If a
+        :class:`PyDvi.Font.RasteriserPool.RasteriserPool` instance is given, the glyphs are
+        rasterised by its threads.
+        """
+
+        glyph_indices = self.glyph_indices(char_codes)
+
+        font_size = self.font_size(size, resolution)
+        if pool is not None:
+            return pool.rasterise(font_size, glyph_indices)
+        else:
+            return font_size.rasterise(glyph_indices)
+
+    ##############################################
+
+    def _make_metrics(self):
+
+        """ Return the character metrics from the TFM, else from the AFM, else from the outlines of
+        the glyphs.
+        """
+
+        if self.tfm is not None:
+            return super(Type1Font, self)._make_metrics()
+        elif self.afm is not None:
+            afm = self.afm
+            afm_glyph_indexes = np.full(self._glyph_indices.size, -1, dtype=np.int32)
+            for char_code in xrange(afm_glyph_indexes.size):
+                try:
+                    if self.encoding is not None:
+                        afm_glyph_indexes[char_code] = afm.glyph_index(self.encoding.to_name(char_code))
+                    else:
+                        # the AFM and the Adobe charmap of the face use the same encoding
+                        afm_glyph_indexes[char_code] = afm.char_glyph_index(char_code)
+                except (KeyError, IndexError):
+                    pass
+            return CharMetrics.from_afm(afm, afm_glyph_indexes)
+        else:
+            return CharMetrics.from_face(self._face, self._glyph_indices)
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return an estimate of the memory held by the font in bytes: the TFM, the char code table
+        and the size of the font file if the face is open.  The glyphs are accounted by
+        :data:`PyDvi.Font.GlyphCache.glyph_cache`.
+        """
+
+        memory_usage = super(Type1Font, self).memory_usage() + self._glyph_indices.nbytes
+        if self._opened_face is not None:
+            memory_usage += os.path.getsize(self.filename)
+        return memory_usage
+
+    ##############################################
+
+    def close(self):
+
+        """ Release the FreeType face and the font sizes. """
+
+        with self._lock, freetype_lock:
+            # the face is destroyed when it is released
+            self._opened_face = None
+            self._font_size = {}
+            self.number_of_closes += 1
+
+    ##############################################
+
     def _log_face_information(self):
 
         face = self._face
@@ -234,10 +431,7 @@ is scalable:         %s
         charcode, glyph_index = face.get_first_char()
         while glyph_index:
             unicode_character = unichr(charcode)
-            try:
-                name = unicodedata.name(unicode_character)
-            except ValueError:
-                name = '<unknown character>'
+            name = self.char_name(charcode)
             message += u"  [{}] TeX[{} {}] {} {}\n".format(glyph_index,
                                                            charcode,
                                                            hex(charcode), # 0x%04lx
@@ -261,7 +455,6 @@ class FontSize(object):
         self._resolution = resolution
 
         self._metrics = FontMetrics(self)
-        self._glyphs = {}
 
     ##############################################
 
@@ -283,27 +476,46 @@ class FontSize(object):
 
     ##############################################
 
+    def _cache_key(self, glyph_index):
+
+        return glyph_cache.make_key(self._font.name, self._size, self._resolution, glyph_index)
+
+    ##############################################
+
     def __getitem__(self, glyph_index):
 
-        if glyph_index not in self._glyphs:
-            self.load_glyph(glyph_index)
-        return self._glyphs[glyph_index]
+        """ Return the glyph *glyph_index* from the glyph cache, it is rasterised on a cache miss.
+        """
+
+        key = self._cache_key(glyph_index)
+        glyph = glyph_cache.get(key)
+        if glyph is None:
+            glyph = self.load_glyph(glyph_index)
+            glyph_cache.add(key, glyph)
+        return glyph
 
     ##############################################
 
     def load_all_glyphs(self):
 
-        face = self._font._face
-        charcode, glyph_index = face.get_first_char()
-        while glyph_index:
-            self.load_glyph(glyph_index)
-            charcode, glyph_index = face.get_next_char(charcode, glyph_index)
+        with self._font._lock:
+            face = self._font._face
+            charcode, glyph_index = face.get_first_char()
+            while glyph_index:
+                self[glyph_index]
+                charcode, glyph_index = face.get_next_char(charcode, glyph_index)
 
     ##############################################
  
-    def _set_face_transfrom(self):
+    def _set_face_transfrom(self, face=None, lcd_filter=True):
 
-        face = self._font._face
+        """ Set the size and the transform of the face *face*, the shared face of the font by
+        default.  The LCD filter is a setting of the FreeType library, thus it is skipped if
+        *lcd_filter* is not set.
+        """
+
+        if face is None:
+            face = self._font._face
         horizontal_scale = 100
         resolution = self._resolution # dpi
         face.set_char_size(int(to_64th_point(self._size)), 0,
@@ -317,22 +529,62 @@ class FontSize(object):
         delta = freetype.Vector(0, 0)
         face.set_transform(matrix, delta)
 
-        freetype.set_lcd_filter(freetype.FT_LCD_FILTER_LIGHT)
+        if lcd_filter:
+            with freetype_lock:
+                freetype.set_lcd_filter(freetype.FT_LCD_FILTER_LIGHT)
 
     ##############################################
  
     def load_glyph(self, glyph_index, lcd=False):
 
+        """ Rasterise the glyph *glyph_index* and return a :class:`Glyph` instance. """
+
         # Fixme: lcd steering
 
-        if glyph_index in self._glyphs:
-            return
+        # the face of the font is shared by the threads
+        with self._font._lock:
+            self._set_face_transfrom()
+            return self._render_glyph(glyph_index, lcd)
+
+    ##############################################
+
+    def rasterise(self, glyph_indices, lcd=False):
 
-        self._set_face_transfrom()
+        """ Return the list of the glyphs for the glyph indexes *glyph_indices*.
 
-        self.dirty = True
+        The glyphs which are not in the glyph cache are rasterised in a row, thus the face is set up
+        once for the batch.
+        """
 
-        face = self._font._face
+        glyphs = {}
+        missing_glyph_indices = []
+        for glyph_index in glyph_indices:
+            if glyph_index not in glyphs:
+                glyph = glyph_cache.get(self._cache_key(glyph_index))
+                if glyph is None:
+                    missing_glyph_indices.append(glyph_index)
+                glyphs[glyph_index] = glyph
+
+        if missing_glyph_indices:
+            with self._font._lock:
+                self._set_face_transfrom()
+                for glyph_index in missing_glyph_indices:
+                    glyph = self._render_glyph(glyph_index, lcd)
+                    glyph_cache.add(self._cache_key(glyph_index), glyph)
+                    glyphs[glyph_index] = glyph
+
+        return [glyphs[glyph_index] for glyph_index in glyph_indices]
+
+    ##############################################
+ 
+    def _render_glyph(self, glyph_index, lcd=False, face=None):
+
+        """ Render the glyph *glyph_index* using the current state of the face *face*, the shared
+        face of the font by default.
+        """
+
+        if face is None:
+            face = self._font._face
 
         flags = freetype.FT_LOAD_RENDER | freetype.FT_LOAD_FORCE_AUTOHINT
         if lcd:
@@ -341,10 +593,10 @@ class FontSize(object):
         face.load_glyph(glyph_index, flags)
         slot = face.glyph
 
-        bitmap = slot.bitmap # a list
-        width = slot.bitmap.width
-        rows = slot.bitmap.rows
-        pitch = slot.bitmap.pitch # stride / number of bytes taken by one bitmap row
+        bitmap = slot.bitmap
+        width = bitmap.width
+        rows = bitmap.rows
+        pitch = bitmap.pitch # stride / number of bytes taken by one bitmap row
         # left: The left-side bearing, i.e., the horizontal distance from the current pen position
         #   to the left border of the glyph bitmap.
         # top: The top-side bearing, i.e., the vertical distance from the current pen position to
@@ -352,16 +604,20 @@ class FontSize(object):
         left = slot.bitmap_left
         top = slot.bitmap_top
 
-        # Remove padding
-        data = np.array(bitmap.buffer).reshape(rows, pitch)
-        data = data[:,:width].astype(np.ubyte)
+        # Copy the buffer without going through the Python list of bitmap.buffer and remove the
+        # padding, a negative pitch means the rows are stored from the bottom
+        if rows and width:
+            buffer_ = ctypes.string_at(bitmap._FT_Bitmap.buffer, rows*abs(pitch))
+            data = np.frombuffer(buffer_, dtype=np.ubyte).reshape(rows, abs(pitch))[:,:width]
+            if pitch < 0:
+                data = data[::-1]
+        else:
+            data = np.zeros((rows, width), dtype=np.ubyte)
         if lcd:
             # RBG data else grayscale
             glyph_bitmap = data.reshape(rows, width/3, 3)
         else:
-            glyph_bitmap = np.zeros((rows, width, 3), dtype=np.ubyte)
-            for i in xrange(3):
-                glyph_bitmap[:,:,i] = data
+            glyph_bitmap = np.ascontiguousarray(data)
         
         # Build glyph
         size = glyph_bitmap.shape[1], glyph_bitmap.shape[0]
@@ -377,7 +633,8 @@ class FontSize(object):
 
         glyph = Glyph(self, glyph_index, size, offset, advance, metrics_px)
         glyph.glyph_bitmap = glyph_bitmap # Fixme:
-        self._glyphs[glyph_index] = glyph
+
+        return glyph
 
 ####################################################################################################
 
@@ -423,6 +680,10 @@ class Glyph(object):
     """
     A glyph gathers information relative to the size/offset/advance and texture coordinates
     of a single character. It is generally built automatically by a Font.
+
+    The bitmap :attr:`glyph_bitmap` is a single-channel 8-bit coverage array, or an RGB array for LCD
+    rendering.  The colour is applied at composite time, backends which need an RGB or an inverted
+    form use :meth:`get_bitmap`.
     """
 
     def __init__(self, font_size, glyph_index, size, offset, advance, metrics):
@@ -451,11 +712,44 @@ class Glyph(object):
          self.horizontal_bearing_y_px,
          self.horizontal_advance_px) = metrics
 
+        self.glyph_bitmap = None
+
     ##############################################
 
     def px_to_mm(self, x):
         return 25.4/self.font_size.resolution * x
 
+    ##############################################
+
+    def get_bitmap(self, rgb=False, inverted=False):
+
+        """ Return the glyph bitmap, as an RGB array if *rgb* is set and inverted, i.e. black on
+        white, if *inverted* is set.  The derived forms are cached in the glyph cache using the key
+        of the glyph extended by the form, thus they are accounted in the memory budget.
+        """
+
+        if not (rgb or inverted):
+            return self.glyph_bitmap
+
+        key = self.font_size._cache_key(self.glyph_index) + (rgb, inverted)
+        glyph_bitmap = glyph_cache.get(key)
+        if glyph_bitmap is None:
+            glyph_bitmap = self.glyph_bitmap
+            if rgb and glyph_bitmap.ndim == 2:
+                glyph_bitmap = np.repeat(glyph_bitmap[:,:,np.newaxis], 3, axis=2)
+            if inverted:
+                glyph_bitmap = 255 - glyph_bitmap
+            glyph_cache.add(key, glyph_bitmap, glyph_bitmap.nbytes)
+        return glyph_bitmap
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory used by the glyph bitmap, in bytes. """
+
+        return self.glyph_bitmap.nbytes
+
 ####################################################################################################
 #
 # End
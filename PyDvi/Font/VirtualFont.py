@@ -24,21 +24,15 @@ __all__ = ['VirtualFont']
 
 ####################################################################################################
 
-from ..Tools.Logging import print_card
-from .Font import Font, font_types
-from .VirtualFontParser import VirtualFontParser
+import numpy as np
 
 ####################################################################################################
 
-class VirtualCharacter(object):
-
-    ##############################################
-
-    def __init__(self, char_code, tfm, dvi):
-
-        self.char_code = char_code
-        self.tfm = tfm
-        self.dvi = dvi
+from ..Dvi.DviMachine import DviFont
+from ..Tools.Logging import print_card
+from .Font import Font, font_types
+from .FontCache import font_cache
+from .VirtualCharacter import VirtualCharacter
 
 ####################################################################################################
 
@@ -58,18 +52,33 @@ class VirtualFont(Font):
 
         self.dvi_fonts = {}
         self.first_font = None
-        self.fonts = {}
-        self.font_id_map = {}
+        # The character packets are indexed by char code, the
+        # :class:`PyDvi.Font.VirtualCharacter.VirtualCharacter` instances are built on first access
+        self._packets = None
+        self._packet_index = {} # char code -> (start, stop, width)
         self._characters = {}
-        VirtualFontParser.parse(self)
+        font_cache.load_virtual_font(self)
 
     ##############################################
  
     def __getitem__(self, char_code):
  
-        # """ Return the :class:`PyDvi.PkGlyph.PkGlyph` instance for the char code *char_code*. """
+        """ Return the :class:`PyDvi.Font.VirtualCharacter.VirtualCharacter` instance for the char
+        code *char_code*.
+        """
 
-        return self._characters[char_code]
+        character = self._characters.get(char_code)
+        if character is None:
+            start, stop, width = self._packet_index[char_code]
+            dvi = bytearray(self._packets[start:stop].tostring())
+            character = self._characters[char_code] = VirtualCharacter(char_code, width, dvi)
+        return character
+
+    ##############################################
+
+    def __contains__(self, char_code):
+
+        return char_code in self._packet_index
 
     ##############################################
 
@@ -77,7 +86,7 @@ class VirtualFont(Font):
 
         """ Return the number of characters in the font. """
 
-        return len(self._characters)
+        return len(self._packet_index)
 
     ##############################################
 
@@ -109,9 +118,88 @@ class VirtualFont(Font):
 
     ##############################################
 
-    def register_character(self, character):
+    def register_packet(self, char_code, width, offset, length):
+
+        """ Register the packet of the character *char_code* which is located at *offset* in the
+        packet buffer, cf. :meth:`set_packets`.
+        """
+
+        self._packet_index[char_code] = (offset, offset + length, width)
+
+    ##############################################
+
+    def set_packets(self, packets):
+
+        """ Set the buffer of the character packets, a :class:`numpy.ndarray` of bytes. """
+
+        self._packets = packets
+        self._characters = {}
+
+    ##############################################
+
+    def to_arrays(self):
+
+        """ Return the 2-tuple made of the JSON serialisable metadata and the dictionary of arrays,
+        cf. :func:`PyDvi.Tools.Cache.dump_arrays`.
+        """
+
+        char_codes = sorted(self._packet_index)
+        packet_index = [self._packet_index[char_code] for char_code in char_codes]
+        packet_offsets = np.zeros(len(char_codes) +1, dtype=np.uint32)
+        packet_offsets[1:] = np.cumsum([stop - start for start, stop, width in packet_index])
+        if packet_index:
+            packets = np.concatenate([self._packets[start:stop] for start, stop, width in packet_index])
+        else:
+            packets = np.zeros(0, dtype=np.uint8)
+
+        metadata = {
+            'vf_id':self.vf_id,
+            'comment':str(self.comment).decode('latin-1'),
+            'design_font_size':self.design_font_size,
+            'checksum':self.checksum,
+            'first_font':self.first_font,
+            'fonts':[(font.id, font.name, font.checksum, font.scale_factor, font.design_size)
+                     for font_id, font in sorted(self.dvi_fonts.iteritems())],
+            }
+        arrays = {
+            'char_codes':np.array(char_codes, dtype=np.uint32),
+            'widths':np.array([width for start, stop, width in packet_index], dtype=np.uint32),
+            'packet_offsets':packet_offsets,
+            'packets':packets,
+            }
+
+        return metadata, arrays
+
+    ##############################################
+
+    def from_arrays(self, metadata, arrays):
+
+        """ Set the font data from the metadata and arrays returned by :meth:`to_arrays`. """
 
-        self._characters[character.char_code] = character
+        self._set_preambule_data(metadata['vf_id'],
+                                 bytearray(metadata['comment'].encode('latin-1')),
+                                 metadata['design_font_size'],
+                                 metadata['checksum'])
+
+        for font_id, name, checksum, scale_factor, design_size in metadata['fonts']:
+            self.register_font(DviFont(font_id, str(name), checksum, scale_factor, design_size))
+        self.first_font = metadata['first_font']
+
+        # The packets stay in the (memory mapped) array until a character is used
+        packet_offsets = arrays['packet_offsets'].tolist()
+        self._packet_index = dict(zip(arrays['char_codes'].tolist(),
+                                      zip(packet_offsets[:-1], packet_offsets[1:],
+                                          arrays['widths'].tolist())))
+        self.set_packets(arrays['packets'])
+
+    ##############################################
+
+    def memory_usage(self):
+
+        """ Return the memory used by the TFM and the character packets, in bytes. """
+
+        return (super(VirtualFont, self).memory_usage() +
+                sum(stop - start for start, stop, width in self._packet_index.itervalues()))
 
     ##############################################
 
@@ -134,20 +222,6 @@ Preambule
 
         print_card(message)
 
-    ##############################################
-
-    def load_dvi_fonts(self):
-
-        self.fonts = {font_id:self.font_manager[dvi_font.name]
-                      for font_id, dvi_font in self.dvi_fonts.iteritems()}
-
-    ##############################################
-
-    def update_font_id_map(self):
-
-        self.font_id_map = {font_id:font.global_id
-                            for font_id, font in self.fonts.iteritems()}
-
 ####################################################################################################
 #
 # End
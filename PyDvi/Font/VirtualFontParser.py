@@ -30,6 +30,9 @@ __all__ = ['VirtualFontParser']
 ####################################################################################################
 
 import logging
+import os
+
+import numpy as np
 
 ####################################################################################################
 
@@ -37,7 +40,6 @@ from ..Dvi.DviMachine import DviFont
 from ..OpcodeParser import OpcodeParserSet, OpcodeParser
 from ..Tools.EnumFactory import EnumFactory
 from ..Tools.Stream import to_fix_word, AbstractStream, FileStream
-from .VirtualCharacter import VirtualCharacter
 
 ####################################################################################################
 
@@ -91,10 +93,11 @@ class OpcodeParser_char(OpcodeParser):
             dvi_length = self.opcode
             char_code = stream.read_unsigned_byte1()
             width = stream.read_unsigned_byte3()
-        dvi = stream.read(dvi_length)
 
-        character = VirtualCharacter(char_code, width, dvi)
-        virtual_font_parser.virtual_font.register_character(character)
+        # The packet is only indexed, cf. VirtualFont.__getitem__
+        offset = stream.tell()
+        stream.seek(dvi_length, os.SEEK_CUR)
+        virtual_font_parser.virtual_font.register_packet(char_code, width, offset, dvi_length)
 
 ####################################################################################################
 
@@ -227,6 +230,9 @@ class VirtualFontParser(object):
                 opcode_parser = self.opcode_parser_set[byte]
                 opcode_parser.read_parameters(self) # Fixme: return where
 
+        # The packets are offsets in the file
+        self.virtual_font.set_packets(np.frombuffer(stream.stream[:], dtype=np.uint8))
+
 ####################################################################################################
 #
 # End
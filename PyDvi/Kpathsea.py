@@ -28,19 +28,32 @@
 
 """
 This module provides a wrapper for the **Kpathsea** library, cf. http://www.tug.org/kpathsea.
+
+The path resolutions are cached in memory and on disk, cf. :mod:`PyDvi.Tools.Cache`, so as
+short-lived processes don't pay the lookups again.  The disk cache only stores the absolute paths,
+since the files which are not found and the relative paths depend on the current directory of the
+process.  It is invalidated when a :file:`ls-R` database or a :file:`texmf.cnf` file is modified or
+when a Kpathsea environment variable is changed, and a cached path is checked to exist before it
+is used, e.g. for the files generated by mktex which are not listed in a database.
 """
 
 ####################################################################################################
 
-__all__ = ['kpsewhich']
+__all__ = ['kpsewhich', 'kpsewhich_many']
 
 ####################################################################################################
 
+import atexit
 import logging
+import os
 import subprocess
 
 ####################################################################################################
 
+from .Tools.Cache import cache_directory, file_stamp, load_pickle, dump_pickle
+
+####################################################################################################
+
 _module_logger = logging.getLogger(__name__)
 
 ####################################################################################################
@@ -49,7 +62,167 @@ _cache = {}
 
 ####################################################################################################
 
-def kpsewhich(filename, file_format=None, options=None):
+def _kpathsea_environment():
+
+    """ Return the environment variables which can change the path resolutions. """
+
+    return {name:value for name, value in os.environ.iteritems()
+            if any(pattern in name for pattern in ('TEX', 'KPATHSEA', 'FONTS', 'MAPS'))}
+
+####################################################################################################
+
+def _database_stamps():
+
+    """ Return a dictionary which maps the :file:`ls-R` databases and the :file:`texmf.cnf` files
+    to their stamps.
+    """
+
+    paths = []
+    for command in (['kpsewhich', '-all', '-format=ls-R', 'ls-R'],
+                    ['kpsewhich', '-all', 'texmf.cnf']):
+        try:
+            pipe = subprocess.Popen(command, stdout=subprocess.PIPE)
+        except OSError:
+            return {}
+        paths.extend(path.rstrip() for path in pipe.communicate()[0].splitlines() if path.strip())
+
+    return {path:file_stamp(path) for path in paths}
+
+####################################################################################################
+
+class _DiskCache(object):
+
+    """ This class implements the persistent cache of the path resolutions.
+
+    The cache is loaded before the first lookup and the new entries are merged to the cache file at
+    exit.  The loaded entries are looked up by :meth:`get`.
+    """
+
+    version = 1
+    cache_filename = 'kpsewhich.pickle'
+
+    ##############################################
+
+    def __init__(self):
+
+        self.loaded = False
+        self._filename = None
+        self._stamps = None
+        self._entries = {}
+        self._new_keys = set()
+
+    ##############################################
+
+    def _is_valid(self, data):
+
+        """ Return :obj:`True` if the cache *data* matches the actual TeX installation. """
+
+        try:
+            return (data['version'] == self.version and
+                    data['environment'] == _kpathsea_environment() and
+                    all(file_stamp(path) == stamp for path, stamp in data['stamps'].iteritems()))
+        except (KeyError, TypeError):
+            return False
+
+    ##############################################
+
+    def load(self):
+
+        """ Load the valid entries of the cache file in the memory cache. """
+
+        self.loaded = True
+
+        directory = cache_directory()
+        if directory is None:
+            return
+        self._filename = os.path.join(directory, self.cache_filename)
+
+        data = load_pickle(self._filename)
+        if data is not None and self._is_valid(data):
+            self._stamps = data['stamps']
+            self._entries = data['entries']
+        else:
+            self._stamps = _database_stamps()
+            if not self._stamps:
+                # we cannot check the validity of the cache
+                self._filename = None
+                return
+
+        atexit.register(self.save)
+
+    ##############################################
+
+    def get(self, key):
+
+        """ Return the cached path for the key *key* if the file exists, else :obj:`None`.  The path
+        is then moved to the memory cache.
+        """
+
+        path = self._entries.pop(key, None)
+        if path is not None and os.path.exists(path):
+            _cache[key] = path
+            return path
+        else:
+            return None
+
+    ##############################################
+
+    def add(self, key):
+
+        """ Register a new entry. """
+
+        self._new_keys.add(key)
+
+    ##############################################
+
+    def save(self):
+
+        """ Merge the new entries to the cache file. """
+
+        if self._filename is None or not self._new_keys:
+            return
+
+        # Don't save entries which could have been resolved before a database update
+        if any(file_stamp(path) != stamp for path, stamp in self._stamps.iteritems()):
+            return
+
+        data = load_pickle(self._filename)
+        if data is None or data.get('stamps') != self._stamps or not self._is_valid(data):
+            data = dict(version=self.version,
+                        environment=_kpathsea_environment(),
+                        stamps=self._stamps,
+                        entries={})
+        # the files which are not found and the relative paths depend on the current directory
+        data['entries'].update({key:_cache[key] for key in self._new_keys
+                                if _cache[key] is not None and os.path.isabs(_cache[key])})
+
+        try:
+            dump_pickle(self._filename, data)
+            self._new_keys.clear()
+        except (IOError, OSError) as exception:
+            _module_logger.warning("Cannot write the Kpathsea cache: {}".format(exception))
+
+_disk_cache = _DiskCache()
+
+####################################################################################################
+
+def _cache_key(filename, file_format, options):
+
+    return '{}-{}-{}'.format(filename, file_format, options)
+
+####################################################################################################
+
+def _stem(filename):
+
+    """ Return the basename of *filename* without its extension, used to match the kpsewhich output
+    with the requested file names.
+    """
+
+    return os.path.splitext(os.path.basename(filename))[0]
+
+####################################################################################################
+
+def kpsewhich(filename, file_format=None, options=None, use_cache=True):
 
     """Wrapper around the :command:`kpsewhich` command, cf. kpsewhich(1).
 
@@ -59,15 +232,26 @@ def kpsewhich(filename, file_format=None, options=None):
     *options*
       additional option for :command:`kpsewhich`.
 
+    *use_cache*
+      if not set, :command:`kpsewhich` is run even if the result is cached, and a file which is not
+      found is not cached, e.g. to retry a file generation.
+
     Examples::
 
        >>> kpsewhich('cmr10', file_format='tfm')
        '/usr/share/texmf/fonts/tfm/public/cm/cmr10.tfm'
     """
 
-    key = '{}-{}-{}'.format(filename, file_format, options)
-    if key in _cache:
-        return _cache[key]
+    if not _disk_cache.loaded:
+        _disk_cache.load()
+
+    key = _cache_key(filename, file_format, options)
+    if use_cache:
+        if key in _cache:
+            return _cache[key]
+        path = _disk_cache.get(key)
+        if path is not None:
+            return path
 
     command = ['kpsewhich']
     if file_format is not None:
@@ -84,9 +268,90 @@ def kpsewhich(filename, file_format=None, options=None):
     path = stdout.rstrip()
     path = path if path else None # Fixme: could raise an exception
 
-    _cache[key] = path
+    if path is not None or use_cache:
+        _cache[key] = path
+        _disk_cache.add(key)
     return path
 
+####################################################################################################
+
+def kpsewhich_many(filenames, file_format=None, options=None):
+
+    """Resolve several files of the same format using a single :command:`kpsewhich` process and
+    fill the cache used by :func:`kpsewhich` in bulk.
+
+    Return a dictionary which maps each file name to its path or :obj:`None` if the file was not
+    found.  The arguments *file_format* and *options* have the same meaning than for
+    :func:`kpsewhich`.
+
+    Examples::
+
+       >>> kpsewhich_many(['cmr10', 'cmmi10'], file_format='tfm')
+       {'cmr10': '/usr/share/texmf/fonts/tfm/public/cm/cmr10.tfm',
+        'cmmi10': '/usr/share/texmf/fonts/tfm/public/cm/cmmi10.tfm'}
+    """
+
+    if not _disk_cache.loaded:
+        _disk_cache.load()
+
+    paths = {}
+    filenames_to_resolve = []
+    for filename in filenames:
+        key = _cache_key(filename, file_format, options)
+        if key in _cache:
+            paths[filename] = _cache[key]
+            continue
+        path = _disk_cache.get(key)
+        if path is not None:
+            paths[filename] = path
+        elif filename not in filenames_to_resolve:
+            filenames_to_resolve.append(filename)
+    if not filenames_to_resolve:
+        return paths
+
+    command = ['kpsewhich']
+    if file_format is not None:
+        command.append('--format=%s' % (file_format))
+    if options is not None:
+        command.extend(options.split())
+    command.extend(filenames_to_resolve)
+
+    _module_logger.debug('Run command: ' + ' '.join(command))
+    try:
+        pipe = subprocess.Popen(command, stdout=subprocess.PIPE)
+    except OSError as exception:
+        _module_logger.warning('Cannot run kpsewhich: {}'.format(exception))
+        paths.update({filename:None for filename in filenames_to_resolve})
+        return paths
+    stdout = pipe.communicate()[0]
+    _module_logger.debug('stdout:\n' + stdout)
+    found_paths = [path.rstrip() for path in stdout.splitlines() if path.strip()]
+
+    # kpsewhich outputs the paths in the order of the arguments and skips the files which are not
+    # found, thus we match the outputs in sequence using the basename without extension, since
+    # the extension can differ, e.g. cmr10.pk -> cmr10.600pk.
+    resolved_paths = []
+    i = 0
+    for filename in filenames_to_resolve:
+        if i < len(found_paths) and _stem(found_paths[i]) == _stem(filename):
+            resolved_paths.append(found_paths[i])
+            i += 1
+        else:
+            resolved_paths.append(None)
+    # If an output was not matched, we cannot trust the negative results
+    cache_not_found = i == len(found_paths)
+    if not cache_not_found:
+        _module_logger.warning('Unexpected kpsewhich output: ' + ' '.join(found_paths[i:]))
+
+    for filename, path in zip(filenames_to_resolve, resolved_paths):
+        if path is not None or cache_not_found:
+            key = _cache_key(filename, file_format, options)
+            _cache[key] = path
+            _disk_cache.add(key)
+        paths[filename] = path
+
+    return paths
+
 ####################################################################################################
 #
 # End
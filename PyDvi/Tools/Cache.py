@@ -0,0 +1,278 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+""" This module provides tools to store cache files on disk.
+
+The cache directory is given by the environment variable :envvar:`PYDVI_CACHE_DIR`, else it is
+:file:`$XDG_CACHE_HOME/PyDvi` or :file:`~/.cache/PyDvi`.  The disk caches are disabled if
+:envvar:`PYDVI_CACHE_DIR` is set to an empty string.
+
+Cache files are written atomically: the data are written to a temporary file in the same directory
+which is then renamed.  Thus concurrent readers always see a complete file, either the old or the
+new one.
+
+Numpy arrays can be stored in a single file using :func:`dump_arrays` and memory mapped back using
+:func:`load_arrays`.  The file starts by the magic string ``PyDviArr``, followed by the length of a
+JSON header as a 32-bit little-endian integer, the JSON header and the arrays data.  The header
+contains the user metadata and the name, type, shape and offset of each array.  The array data are
+aligned on 16 bytes.
+"""
+
+####################################################################################################
+
+__all__ = ['cache_directory', 'atomic_write', 'file_stamp', 'load_pickle', 'dump_pickle',
+           'dump_arrays', 'load_arrays', 'evict_files']
+
+####################################################################################################
+
+import cPickle
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+import numpy as np
+
+####################################################################################################
+
+_module_logger = logging.getLogger(__name__)
+
+####################################################################################################
+
+#: The temporary files of :func:`atomic_write` older than this delay in seconds were left by a
+#: process which crashed
+TEMPORARY_FILE_TTL = 3600
+
+####################################################################################################
+
+def cache_directory(*sub_directories):
+
+    """ Return the path of the cache directory, joined with *sub_directories*, and create it if
+    necessary.  Return :obj:`None` if the disk caches are disabled or if the directory cannot be
+    created.
+    """
+
+    directory = os.environ.get('PYDVI_CACHE_DIR')
+    if directory is None:
+        xdg_cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+        directory = os.path.join(xdg_cache_home, 'PyDvi')
+    elif not directory:
+        return None
+
+    directory = os.path.join(directory, *sub_directories)
+    if not os.path.isdir(directory):
+        try:
+            os.makedirs(directory)
+        except OSError:
+            # a concurrent process could have created it
+            if not os.path.isdir(directory):
+                _module_logger.warning("Cannot create the cache directory {}".format(directory))
+                return None
+
+    return directory
+
+####################################################################################################
+
+def atomic_write(filename, data):
+
+    """ Write the string *data* to the file *filename* using a temporary file which is renamed.  The
+    name of the temporary file starts by a dot.
+    """
+
+    directory, basename = os.path.split(filename)
+    fd, temporary_filename = tempfile.mkstemp(prefix='.' + basename, dir=directory)
+    try:
+        os.fchmod(fd, 0644) # mkstemp creates the file with mode 600
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.rename(temporary_filename, filename)
+    except:
+        os.unlink(temporary_filename)
+        raise
+
+####################################################################################################
+
+def file_stamp(filename):
+
+    """ Return the 2-tuple made of the modification time and the size of the file *filename*, or
+    :obj:`None` if the file doesn't exist.
+    """
+
+    try:
+        stat = os.stat(filename)
+        return stat.st_mtime, stat.st_size
+    except OSError:
+        return None
+
+####################################################################################################
+
+def load_pickle(filename):
+
+    """ Load the pickled object in the file *filename*, return :obj:`None` if the file doesn't exist
+    or is corrupted.
+    """
+
+    try:
+        with open(filename, 'rb') as f:
+            return cPickle.load(f)
+    except IOError:
+        return None
+    except Exception as exception:
+        _module_logger.warning("Cannot load the cache file {}: {}".format(filename, exception))
+        return None
+
+####################################################################################################
+
+def dump_pickle(filename, obj):
+
+    """ Pickle the object *obj* to the file *filename* using :func:`atomic_write`. """
+
+    atomic_write(filename, cPickle.dumps(obj, cPickle.HIGHEST_PROTOCOL))
+
+####################################################################################################
+
+ARRAYS_MAGIC = 'PyDviArr'
+ARRAYS_ALIGNMENT = 16
+
+def _align(offset):
+    return (offset + ARRAYS_ALIGNMENT - 1) // ARRAYS_ALIGNMENT * ARRAYS_ALIGNMENT
+
+####################################################################################################
+
+def dump_arrays(filename, metadata, arrays):
+
+    """ Write the JSON serialisable *metadata* and the dictionary of Numpy arrays *arrays* to the
+    file *filename* using :func:`atomic_write`.
+    """
+
+    arrays = {name:np.ascontiguousarray(array) for name, array in arrays.iteritems()}
+    descriptions = []
+    offset = 0
+    for name, array in sorted(arrays.iteritems()):
+        descriptions.append({'name':name,
+                             'dtype':array.dtype.str,
+                             'shape':array.shape,
+                             'offset':offset})
+        offset = _align(offset + array.nbytes)
+
+    header = json.dumps({'metadata':metadata, 'arrays':descriptions})
+    data_offset = _align(len(ARRAYS_MAGIC) + 4 + len(header))
+    chunks = [ARRAYS_MAGIC, struct.pack('<I', len(header)), header]
+    position = len(ARRAYS_MAGIC) + 4 + len(header)
+    for description in descriptions:
+        array_offset = data_offset + description['offset']
+        chunks.append('\0' * (array_offset - position))
+        array = arrays[description['name']]
+        chunks.append(array.tostring())
+        position = array_offset + array.nbytes
+
+    atomic_write(filename, ''.join(chunks))
+
+####################################################################################################
+
+def load_arrays(filename):
+
+    """ Memory map the file *filename* written by :func:`dump_arrays` and return the 2-tuple made of
+    the metadata and the dictionary of read-only arrays.  Return :obj:`None` if the file doesn't
+    exist or is corrupted.
+
+    The arrays share the mapping, which is released when the last array is destroyed.
+    """
+
+    try:
+        with open(filename, 'rb') as f:
+            buffer_ = mmap.mmap(f.fileno(), length=0, access=mmap.ACCESS_READ)
+    except (IOError, ValueError, mmap.error):
+        # an empty file cannot be mapped
+        return None
+
+    try:
+        if buffer_[:len(ARRAYS_MAGIC)] != ARRAYS_MAGIC:
+            raise ValueError('bad magic')
+        header_offset = len(ARRAYS_MAGIC) + 4
+        header_length, = struct.unpack('<I', buffer_[len(ARRAYS_MAGIC):header_offset])
+        header = json.loads(buffer_[header_offset:header_offset + header_length])
+        data_offset = _align(header_offset + header_length)
+        arrays = {}
+        for description in header['arrays']:
+            dtype = np.dtype(str(description['dtype']))
+            shape = tuple(description['shape'])
+            count = 1
+            for dimension in shape:
+                count *= dimension
+            arrays[str(description['name'])] = np.frombuffer(buffer_,
+                                                             dtype=dtype,
+                                                             count=count,
+                                                             offset=data_offset + description['offset'],
+                                                             ).reshape(shape)
+        return header['metadata'], arrays
+    except Exception as exception:
+        _module_logger.warning("Cannot load the cache file {}: {}".format(filename, exception))
+        return None
+
+####################################################################################################
+
+def evict_files(directory, max_size):
+
+    """ Remove the least recently modified files of the directory *directory* until the total size
+    is lower than *max_size* bytes.  Return the number of removed files.
+
+    The temporary files of :func:`atomic_write` are skipped, since they could be written by another
+    process, unless they are older than :data:`TEMPORARY_FILE_TTL`.
+    """
+
+    now = time.time()
+    entries = []
+    total_size = 0
+    for basename in os.listdir(directory):
+        filename = os.path.join(directory, basename)
+        try:
+            stat = os.stat(filename)
+        except OSError:
+            continue
+        if basename.startswith('.') and now - stat.st_mtime < TEMPORARY_FILE_TTL:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, filename))
+        total_size += stat.st_size
+
+    number_of_removed_files = 0
+    entries.sort()
+    for mtime, size, filename in entries:
+        if total_size <= max_size:
+            break
+        try:
+            # Processes which mapped this file keep a valid mapping
+            os.unlink(filename)
+            number_of_removed_files += 1
+        except OSError:
+            # a concurrent process could have removed it
+            pass
+        total_size -= size
+
+    return number_of_removed_files
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -40,6 +40,8 @@ import io
 import mmap
 import os
 
+import numpy as np
+
 ####################################################################################################
 
 FIX_WORD_SCALE = 2**-20
@@ -274,6 +276,8 @@ class StandardStream(AbstractStream):
 ####################################################################################################
 
 class FileStream(StandardStream):
+
+    """ This class reads a memory mapped file. """
     
     ##############################################
 
@@ -281,13 +285,41 @@ class FileStream(StandardStream):
 
         self.file = open(filename, 'rb')
         self.stream = mmap.mmap(self.file.fileno(), length=0, access=mmap.ACCESS_READ)
+        self._is_viewed = False
         self.seek(0)
 
     ##############################################
 
     def __del__(self):
 
-        self.stream.close()
+        self.close()
+
+    ##############################################
+
+    def view(self, position, number_of_bytes):
+
+        """ Return a read-only Numpy array viewing *number_of_bytes* bytes from the position
+        *position* of the mapped file, the bytes are not copied.
+        """
+
+        self._is_viewed = True
+        return np.frombuffer(self.stream, dtype=np.uint8, count=number_of_bytes, offset=position)
+
+    ##############################################
+
+    def close(self):
+
+        """ Unmap and close the file.
+
+        If arrays view the mapping, cf. :meth:`view`, it is only released when the last of them is
+        deleted.
+        """
+
+        if self.stream is not None:
+            if not self._is_viewed:
+                self.stream.close()
+            # else unmapping would leave the views dangling
+            self.stream = None
         self.file.close()
 
 ####################################################################################################
@@ -60,6 +60,8 @@ class GlDviMachine(DviSimplifyMachine):
         # Fixme: could we use array instead of dict ?
         # Fixme: load all the fonts of the document
         # Fixme: we can use one TextureFont per font since we handle correctly the magnification
+        # The fonts of the virtual fonts are loaded when the glyphs are rasterised
+        self.rasterise_page_glyphs(program)
         self.texture_fonts = {font_id:TextureFont(font) for font_id, font in self.fonts.iteritems()}
 
         # Fixme glyph versus char
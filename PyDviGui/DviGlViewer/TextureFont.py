@@ -70,7 +70,7 @@ class TextureFont(object):
         atlas = self._atlas
 
         glyph = self._font.get_glyph(glyph_index, size)
-        glyph_bitmap = glyph.glyph_bitmap
+        glyph_bitmap = glyph.get_bitmap(rgb=True)
         rows, width = glyph_bitmap.shape[:2] # depth
 
         # Glyphes are separated by a margin
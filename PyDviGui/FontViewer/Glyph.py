@@ -134,8 +134,7 @@ class FtGlyph(object):
 
         glyph = font.get_glyph(glyph_index, size)
         self.glyph = glyph
-        glyph_bitmap = glyph.glyph_bitmap
-        glyph_bitmap = 255 - glyph_bitmap
+        glyph_bitmap = glyph.get_bitmap(rgb=True, inverted=True)
 
         # glyph_image = gray_array_to_qimage(glyph_bitmap)
         glyph_image = QtGui.QImage(glyph_bitmap.tostring(),
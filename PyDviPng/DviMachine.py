@@ -81,6 +81,10 @@ class ImageDviMachine(DviSimplifyMachine):
         self._draw = ImageDraw.Draw(self._image)
 
         self._bounding_box = None
+        # fonts painted with placeholder glyphs, the page must be rendered again when they are ready
+        self.placeholder_fonts = set()
+
+        self.rasterise_page_glyphs(program, resolution=self._dpi)
 
     ##############################################
 
@@ -135,7 +139,9 @@ class ImageDviMachine(DviSimplifyMachine):
         size = dvi_font.magnification * sp2pt(dvi_font.design_size) # pt
 
         glyph = font.get_glyph(glyph_index, size, resolution=self._dpi)
-        glyph_bitmap = 255 - glyph.glyph_bitmap # inverse: paint black on white
+        if getattr(glyph, 'is_placeholder', False):
+            self.placeholder_fonts.add(font)
+        glyph_bitmap = glyph.glyph_bitmap # coverage
         height, width = glyph_bitmap.shape[:2] # depth
 
         x = self.sp2px(xg) + glyph.offset[0]
@@ -143,8 +149,13 @@ class ImageDviMachine(DviSimplifyMachine):
 
         x0, y0, x1, y1 = [x, y - height, x + width, y]
 
-        glyph_image = Image.fromarray(glyph_bitmap)
-        self._image.paste(glyph_image, (x0, y0, x1, y1))
+        # paint the current colour through the coverage
+        if glyph_bitmap.ndim == 2:
+            mask = Image.fromarray(glyph_bitmap)
+        else: # lcd
+            mask = Image.fromarray(glyph_bitmap.max(axis=2))
+        colour = tuple(rint(255*x) for x in self.current_colour.colour[:3])
+        self._image.paste(colour, (x0, y0, x1, y1), mask)
 
         char_bounding_box = Interval2D([x0, x1], [y0, y1])
         if self._bounding_box is None:
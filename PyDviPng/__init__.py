@@ -45,16 +45,21 @@ class DviPng(object):
 
     ###############################################
 
-    def __init__(self):
+    def __init__(self, use_pk=False, pk_generator=None):
 
-        self._init_dvi_machine()
+        # The glyphs of the packed fonts are resampled to the resolution of the page.  The missing
+        # packed fonts are generated in the background by *pk_generator* if it is given, and the
+        # pages painted with placeholder glyphs are rendered again by :meth:`update_pages`.
+        self._pending_pages = {} # page index -> (run_page arguments, fonts)
+        self._init_dvi_machine(use_pk, pk_generator)
 
     ##############################################
 
-    def _init_dvi_machine(self):
+    def _init_dvi_machine(self, use_pk, pk_generator):
 
         self._dvi_parser = DviParser()
-        self._font_manager = FontManager(font_map='pdftex', use_pk=False)
+        self._font_manager = FontManager(font_map='pdftex', use_pk=use_pk,
+                                         pk_generator=pk_generator)
         self._dvi_machine = ImageDviMachine(self._font_manager)
 
     ##############################################
@@ -83,6 +88,34 @@ class DviPng(object):
             program_page = self._dvi_machine.dvi_program[page_index] # Fixme: simplify
             self._dvi_machine.process_page_xxx_opcodes(program_page)
             self._dvi_machine.run_page(page_index, dpi=dpi, png_path=png_path, tight=tight)
+            placeholder_fonts = self._dvi_machine.placeholder_fonts
+            if placeholder_fonts:
+                self._pending_pages[page_index] = ((png_path, page_index, dpi, tight),
+                                                   placeholder_fonts)
+            else:
+                self._pending_pages.pop(page_index, None)
+
+    ##############################################
+
+    def update_pages(self, wait=True):
+
+        """ Render again the pages painted with placeholder glyphs once their fonts are generated.
+        If *wait* is not set, only the pages whose fonts are ready are rendered.  Return the
+        indexes of the rendered pages.
+        """
+
+        page_indexes = []
+        for page_index, (arguments, fonts) in sorted(self._pending_pages.items()):
+            if wait:
+                for font in fonts:
+                    font.generation_job.wait()
+            if all(font.is_ready for font in fonts):
+                self.run_page(*arguments)
+                page_indexes.append(page_index)
+            elif wait:
+                # the generation failed
+                del self._pending_pages[page_index]
+        return page_indexes
 
 ####################################################################################################
 # 
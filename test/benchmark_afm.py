@@ -0,0 +1,93 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+####################################################################################################
+#
+# Benchmark the AFM parsers and the loading of the compiled metrics from the font cache.
+#
+####################################################################################################
+
+####################################################################################################
+
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+####################################################################################################
+
+from PyDvi.Font.AfmParser import AfmParser, CompactAfmParser
+from PyDvi.Font.FontCache import FontCache
+
+####################################################################################################
+
+default_afm_file = os.path.join(os.path.dirname(__file__), '..', 'afm-samples', 'ryumin-light.afm')
+
+parser = argparse.ArgumentParser(description='Benchmark the AFM parsers.')
+parser.add_argument('afm_files', metavar='FILE.afm', nargs='*',
+                    default=(default_afm_file,),
+                    help='AFM files to parse, default is afm-samples/ryumin-light.afm')
+parser.add_argument('--repeat',
+                    type=int, default=1000,
+                    help='Number of times each file is parsed')
+args = parser.parse_args()
+
+####################################################################################################
+
+# The parsers run with the default logging configuration, i.e. the info messages are discarded
+logging.basicConfig(level=logging.WARNING)
+
+os.environ['PYDVI_CACHE_DIR'] = tempfile.mkdtemp(prefix='pydvi-benchmark-')
+font_cache = FontCache()
+
+def load_cached(filename):
+    return font_cache.load_afm(filename)
+
+loaders = (('AfmParser', AfmParser.parse),
+           ('CompactAfmParser', CompactAfmParser.parse),
+           ('FontCache', load_cached),
+           )
+
+number_of_glyphs = 0
+timings = {name:0. for name, loader in loaders}
+for afm_file in args.afm_files:
+    afm = CompactAfmParser.parse(afm_file)
+    afm.print_summary()
+    number_of_glyphs += len(afm)
+    font_cache.load_afm(afm_file) # fill the cache
+    for name, loader in loaders:
+        start_time = time.time()
+        for i in xrange(args.repeat):
+            loader(afm_file)
+        timings[name] += time.time() - start_time
+
+print 'Parsed %u files %u times, %u glyphs' % (len(args.afm_files), args.repeat, number_of_glyphs)
+for name, loader in loaders:
+    timing = timings[name]
+    print '%-16s %8.3f s %8.1f us/file' % (name, timing,
+                                           timing / (len(args.afm_files) * args.repeat) * 1e6)
+if timings['CompactAfmParser']:
+    print 'Speedup %.1f' % (timings['AfmParser'] / timings['CompactAfmParser'])
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,97 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+#
+# Benchmark the vectorised packed glyph decoder, which decodes the glyphs of a font in a batch,
+# against the reference implementation and check they agree.
+#
+####################################################################################################
+
+####################################################################################################
+
+import argparse
+import sys
+import time
+
+####################################################################################################
+
+from PyDvi.Font.PkFont import PkFont
+from PyDvi.Font.PkGlyph import decode_packed_glyphs
+
+####################################################################################################
+
+parser = argparse.ArgumentParser(description='Benchmark the PK glyph decoders.')
+parser.add_argument('font_names', metavar='FontName', nargs='*',
+                    default=('cmr10', 'cmbx10', 'cmti10', 'cmmi10', 'cmsy10'),
+                    help='Fonts to decode')
+parser.add_argument('--repeat',
+                    type=int, default=10,
+                    help='Number of times each font is decoded')
+args = parser.parse_args()
+
+####################################################################################################
+
+timings = {'vectorised':0., 'iterative':0.}
+number_of_glyphs = 0
+memory_usages = {'unpacked':0, 'bit-packed':0}
+mismatches = []
+for font_name in args.font_names:
+    pk_font = PkFont(font_manager=None, font_id=0, name=font_name)
+    glyphs = [pk_font[char_code] for char_code in pk_font.char_codes()]
+    glyphs = [glyph for glyph in glyphs if not glyph.is_bitmap()]
+    number_of_glyphs += len(glyphs)
+    for glyph, glyph_bitmap in zip(glyphs, decode_packed_glyphs(glyphs)):
+        glyph._decode_glyph_iteratively()
+        if not (glyph_bitmap.shape == glyph.glyph_bitmap.shape and
+                (glyph_bitmap == glyph.glyph_bitmap).all()):
+            mismatches.append('%s/%u' % (font_name, glyph.char_code))
+    for decoder in timings:
+        start_time = time.time()
+        for i in xrange(args.repeat):
+            if decoder == 'vectorised':
+                decode_packed_glyphs(glyphs)
+            else:
+                for glyph in glyphs:
+                    glyph._decode_glyph_iteratively()
+        timings[decoder] += time.time() - start_time
+    memory_usages['unpacked'] += pk_font.memory_usage()
+    packed_pk_font = PkFont(font_manager=None, font_id=0, name=font_name, bit_packed=True)
+    for char_code in packed_pk_font.char_codes():
+        packed_pk_font[char_code].get_glyph_bitmap()
+    memory_usages['bit-packed'] += packed_pk_font.memory_usage()
+
+print 'Decoded %u packed glyphs %u times' % (number_of_glyphs, args.repeat)
+for decoder, timing in sorted(timings.items()):
+    print '%-10s %8.3f s %8.1f us/glyph' % (decoder, timing,
+                                            timing / max(number_of_glyphs * args.repeat, 1) * 1e6)
+if timings['vectorised']:
+    print 'Speedup %.1f' % (timings['iterative'] / timings['vectorised'])
+for layout, memory_usage in sorted(memory_usages.items()):
+    print 'Memory %-10s %10.1f kB' % (layout, memory_usage / 1024.)
+if mismatches:
+    print 'Mismatches:', ' '.join(mismatches)
+    sys.exit(1)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,84 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+#
+# Benchmark the rasterisation of the glyphs of a Type1 font by the rasteriser pool.
+#
+####################################################################################################
+
+####################################################################################################
+
+import argparse
+import time
+
+####################################################################################################
+
+from PyDvi.Font.GlyphCache import glyph_cache
+from PyDvi.Font.RasteriserPool import RasteriserPool
+from PyDvi.Font.Type1Font import Type1Font
+
+####################################################################################################
+
+parser = argparse.ArgumentParser(description='Benchmark the glyph rasterisation.')
+parser.add_argument('font_names', metavar='FontName', nargs='*',
+                    default=('cmr10', 'cmbx10', 'cmti10'),
+                    help='Type1 fonts to rasterise')
+parser.add_argument('--size',
+                    type=float, default=10.,
+                    help='Font size in pt')
+parser.add_argument('--resolution',
+                    type=int, default=600,
+                    help='Resolution in dpi')
+parser.add_argument('--threads',
+                    type=int, default=None,
+                    help='Number of threads, default is the number of CPUs')
+args = parser.parse_args()
+
+####################################################################################################
+
+fonts = [Type1Font(font_manager=None, font_id=i, name=font_name)
+         for i, font_name in enumerate(args.font_names)]
+char_codes = range(256)
+
+glyph_cache.clear()
+start_time = time.time()
+for font in fonts:
+    font.rasterise(char_codes, args.size, args.resolution)
+serial_time = time.time() - start_time
+
+glyph_cache.clear()
+with RasteriserPool(args.threads) as pool:
+    start_time = time.time()
+    for font in fonts:
+        font.rasterise(char_codes, args.size, args.resolution, pool)
+    pool_time = time.time() - start_time
+    number_of_threads = pool.number_of_threads
+
+print 'Rasterised %u glyphs at %.1f pt %u dpi' % (len(glyph_cache), args.size, args.resolution)
+print 'Serial          %8.3f s' % (serial_time)
+print 'Pool %2u threads %8.3f s' % (number_of_threads, pool_time)
+print 'Speedup %.1f' % (serial_time / pool_time)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
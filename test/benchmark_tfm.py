@@ -0,0 +1,157 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+#
+# Benchmark the TFM parsers on every TFM file of the TeX tree, check they agree and compare the
+# memory used by the Tfm and CompactTfm layouts and the lig/kern pair lookups.
+#
+####################################################################################################
+
+####################################################################################################
+
+import argparse
+import os
+import random
+import subprocess
+import sys
+import time
+
+####################################################################################################
+
+from PyDvi.Font.TfmParser import TfmParser, NumpyTfmParser, CompactTfmParser
+
+####################################################################################################
+
+parser = argparse.ArgumentParser(description='Benchmark TFM parsers.')
+parser.add_argument('paths', metavar='Path', nargs='*',
+                    help='Directories to scan, default is the fonts/tfm directory of TEXMFDIST')
+parser.add_argument('--no-check',
+                    default=False, action='store_true',
+                    help='Skip the comparison of the parsed fonts')
+args = parser.parse_args()
+
+####################################################################################################
+
+def tfm_files(paths):
+
+    for path in paths:
+        for root, directories, filenames in os.walk(path):
+            for filename in filenames:
+                if filename.endswith('.tfm'):
+                    yield os.path.join(root, filename)
+
+####################################################################################################
+
+def dump_tfm(tfm):
+
+    """ Return the content of a Tfm instance as a list of tuples. """
+
+    parameters = ('checksum', 'design_font_size', 'character_coding_scheme', 'family',
+                  'slant', 'spacing', 'space_stretch', 'space_shrink', 'x_height', 'quad', 'extra_space')
+    char_attributes = ('char_code', 'width', 'height', 'depth', 'italic_correction',
+                       'lig_kern_program_index', 'next_larger_char', 'top', 'mid', 'bot', 'rep')
+    lig_kern_attributes = ('index', 'stop', 'next_char', 'kern', 'ligature_char_code',
+                           'number_of_chars_to_pass_over',
+                           'current_char_is_deleted', 'next_char_is_deleted')
+
+    content = [tuple(getattr(tfm, x, None) for x in parameters)]
+    for char_code in xrange(tfm.smallest_character_code, tfm.largest_character_code +1):
+        tfm_char = tfm[char_code]
+        content.append(tuple(getattr(tfm_char, x, None) for x in char_attributes))
+    i = 0
+    while True:
+        try:
+            lig_kern = tfm.get_lig_kern_program(i)
+        except IndexError:
+            break
+        content.append(tuple(getattr(lig_kern, x, None) for x in lig_kern_attributes))
+        i += 1
+
+    return content
+
+####################################################################################################
+
+if args.paths:
+    paths = args.paths
+else:
+    texmf_dist = subprocess.check_output(('kpsewhich', '-var-value=TEXMFDIST')).strip()
+    paths = (os.path.join(texmf_dist, 'fonts', 'tfm'),)
+
+filenames = sorted(tfm_files(paths))
+print 'Found %u TFM files' % (len(filenames))
+
+parser_classes = (TfmParser, NumpyTfmParser, CompactTfmParser)
+timings = {parser_class:0. for parser_class in parser_classes}
+memory_usages = {parser_class:0 for parser_class in parser_classes}
+number_of_fonts = 0
+unsupported_fonts = []
+mismatches = []
+number_of_pairs = 0
+pair_time = 0.
+for filename in filenames:
+    font_name = os.path.splitext(os.path.basename(filename))[0]
+    tfms = {}
+    try:
+        for parser_class in parser_classes:
+            start_time = time.time()
+            tfms[parser_class] = parser_class.parse(font_name, filename)
+            timings[parser_class] += time.time() - start_time
+    except NotImplementedError:
+        unsupported_fonts.append(font_name)
+        continue
+    number_of_fonts += 1
+    for parser_class in parser_classes:
+        memory_usages[parser_class] += tfms[parser_class].memory_usage()
+    tfm = tfms[CompactTfmParser]
+    pairs = [(random.randint(tfm.smallest_character_code, tfm.largest_character_code),
+              random.randint(tfm.smallest_character_code, tfm.largest_character_code))
+             for i in xrange(10000)]
+    start_time = time.time()
+    for char_code, next_char in pairs:
+        tfm.lig_kern_action(char_code, next_char)
+    pair_time += time.time() - start_time
+    number_of_pairs += len(pairs)
+    if not args.no_check:
+        content = dump_tfm(tfms[TfmParser])
+        if (dump_tfm(tfms[NumpyTfmParser]) != content or
+            dump_tfm(tfms[CompactTfmParser]) != content):
+            mismatches.append(font_name)
+
+print 'Parsed %u fonts, %u unsupported' % (number_of_fonts, len(unsupported_fonts))
+for parser_class in parser_classes:
+    print '%-16s %8.3f s %10.1f kB' % (parser_class.__name__,
+                                        timings[parser_class],
+                                        memory_usages[parser_class] / 1024.)
+if timings[CompactTfmParser]:
+    print 'Speedup %.1f' % (timings[TfmParser] / timings[CompactTfmParser])
+if memory_usages[CompactTfmParser]:
+    print 'Memory ratio %.1f' % (float(memory_usages[TfmParser]) / memory_usages[CompactTfmParser])
+if pair_time:
+    print 'Lig/kern pair lookups %.1f M/s' % (number_of_pairs / pair_time / 1e6)
+if mismatches:
+    print 'Mismatches:', ' '.join(mismatches)
+    sys.exit(1)
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
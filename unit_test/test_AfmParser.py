@@ -0,0 +1,232 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+import glob
+import logging
+import os
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PyDvi.Font.AfmParser import AfmParser, CompactAfmParser
+from PyDvi.Font.CharMetrics import CharMetrics
+
+####################################################################################################
+
+afm_sample_directory = os.path.join(os.path.dirname(__file__), '..', 'afm-samples')
+
+####################################################################################################
+
+class ReferenceAfmParser(AfmParser):
+
+    """ This class records the fields checked by :class:`AfmParser`. """
+
+    def _parse(self, stream):
+
+        self.char_metrics = [] # list of the fields of each line
+        self.kern_pairs = [] # (key, values)
+        self.composites = [] # list of the fields of each line
+        self.char_widths = {} # direction -> width
+        self._direction = 0
+        self._fields = None
+        super(ReferenceAfmParser, self)._parse(stream)
+
+    def _parse_start(self, line):
+
+        values = super(ReferenceAfmParser, self)._parse_start(line)
+        if self._section == 'Direction':
+            self._direction = values
+        return values
+
+    def _parse_key_values(self, keys, line):
+
+        key, values = super(ReferenceAfmParser, self)._parse_key_values(keys, line)
+        if self._fields is not None:
+            self._fields.append((key, values))
+        elif self._section.startswith('KernPairs'):
+            self.kern_pairs.append((key, values))
+        elif key == 'CharWidth':
+            self.char_widths[self._direction] = tuple(values)
+        return key, values
+
+    def _parse_key_values_list(self, keys, line):
+
+        self._fields = []
+        properties = super(ReferenceAfmParser, self)._parse_key_values_list(keys, line)
+        if self._section == 'CharMetrics':
+            self.char_metrics.append(self._fields)
+        else:
+            self.composites.append(self._fields)
+        self._fields = None
+        return properties
+
+####################################################################################################
+
+def reference_advance(fields, direction, char_widths):
+
+    """ Return the advance of a glyph for the writing direction *direction*. """
+
+    keys = ('WX', 'WY', 'W') if direction == 0 else ('W1X', 'W1Y', 'W1')
+    x = y = None
+    for key, values in fields:
+        if key in (keys[0], 'W0X' if direction == 0 else None):
+            x = values
+        elif key in (keys[1], 'W0Y' if direction == 0 else None):
+            y = values
+        elif key in (keys[2], 'W0' if direction == 0 else None):
+            x, y = values
+    if x is None and y is None:
+        return char_widths.get(direction, (0., 0.))
+    else:
+        return (x or 0., y or 0.)
+
+####################################################################################################
+
+class TestAfmParser(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        # AfmParser logs the unknown keys of the omitted lines
+        logging.disable(logging.WARNING)
+
+    ##############################################
+
+    def tearDown(self):
+
+        logging.disable(logging.NOTSET)
+
+    ##############################################
+
+    def test_samples(self):
+
+        afm_files = sorted(glob.glob(os.path.join(afm_sample_directory, '*.afm')))
+        self.assertTrue(afm_files)
+        for afm_file in afm_files:
+            reference = ReferenceAfmParser(afm_file)
+            afm = CompactAfmParser.parse(afm_file)
+            self._check_char_metrics(reference, afm)
+            self._check_kern_pairs(reference, afm)
+            self._check_composites(reference, afm)
+
+    ##############################################
+
+    def _check_char_metrics(self, reference, afm):
+
+        glyph_names = []
+        for fields in reference.char_metrics:
+            properties = dict(fields)
+            if 'C' in properties:
+                char_code = properties['C']
+            elif 'CH' in properties:
+                char_code = properties['CH']
+            else:
+                # omitted lines of the samples
+                continue
+            # CID fonts identify the glyphs by their code
+            glyph_name = properties.get('N', str(char_code))
+            glyph_names.append(glyph_name)
+
+            glyph_index = afm.glyph_index(glyph_name)
+            self.assertEqual(afm.char_codes[glyph_index], char_code)
+            for advances, direction in ((afm.advances, 0), (afm.vertical_advances, 1)):
+                self.assertEqual(tuple(advances[glyph_index].tolist()),
+                                 reference_advance(fields, direction, reference.char_widths))
+            self.assertEqual(afm.bounding_boxes[glyph_index].tolist(),
+                             properties.get('B', [0., 0., 0., 0.]))
+            for key, values in fields:
+                if key == 'L':
+                    successor, ligature = values
+                    self.assertEqual(afm.ligature(glyph_name, successor), ligature)
+
+        self.assertEqual(len(afm), len(glyph_names))
+        self.assertEqual(afm.glyph_names[:len(afm)], glyph_names)
+        number_of_ligatures = sum(1 for fields in reference.char_metrics
+                                  for key, values in fields if key == 'L')
+        self.assertEqual(len(afm.ligatures), number_of_ligatures)
+
+    ##############################################
+
+    def _check_kern_pairs(self, reference, afm):
+
+        kern_vectors = {}
+        for key, values in reference.kern_pairs:
+            if key == 'KPX':
+                first, second, dx = values
+                dy = 0.
+            elif key == 'KPY':
+                first, second, dy = values
+                dx = 0.
+            elif key == 'KP':
+                first, second, dx, dy = values
+            else:
+                continue
+            kern_vectors[first, second] = (dx, dy)
+        self.assertEqual(len(afm.kern_pairs), len(kern_vectors))
+        for (first, second), kern_vector in kern_vectors.iteritems():
+            self.assertEqual(afm.kern(first, second), kern_vector)
+            # the glyphs only named by the kern pairs don't have metrics
+            for glyph_name in first, second:
+                glyph_index = afm.glyph_index(glyph_name)
+                if glyph_index >= len(afm):
+                    self.assertNotIn(glyph_name, afm.glyph_names[:len(afm)])
+
+    ##############################################
+
+    def _check_composites(self, reference, afm):
+
+        self.assertEqual(len(afm.composite_glyphs), len(reference.composites))
+        for fields in reference.composites:
+            glyph_name, number_of_parts = fields[0][1]
+            parts = [tuple(values) for key, values in fields[1:] if key == 'PCC']
+            self.assertEqual(len(parts), number_of_parts)
+            self.assertEqual(afm.composite(glyph_name), parts)
+
+    ##############################################
+
+    def test_glyphs_without_metrics(self):
+
+        afm = CompactAfmParser.parse(os.path.join(afm_sample_directory, 'times-roman.afm'))
+
+        # the ligature fl is only named by the ligatures of the f glyph, 'A' by the kern pairs
+        fl_index = afm.glyph_index('fl')
+        self.assertGreaterEqual(fl_index, len(afm))
+        self.assertEqual(afm.ligature('f', 'l'), 'fl')
+        self.assertGreaterEqual(afm.glyph_index('A'), len(afm))
+        self.assertEqual(afm.kern('A', 'y'), (-92., 0.))
+
+        char_metrics = CharMetrics.from_afm(afm, [afm.glyph_index('f'), fl_index, -1])
+        self.assertTrue(np.allclose(char_metrics.widths, [.333, 0., 0.]))
+        self.assertTrue(np.allclose(char_metrics.heights, [.682, 0., 0.]))
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -0,0 +1,104 @@
+####################################################################################################
+#
+# PyDvi - A Python Library to Process DVI Stream.
+# Copyright (C) 2009 Salvaire Fabrice
+#
+####################################################################################################
+
+#####################################################################################################
+#
+#                                              Audit
+#
+# - 27/11/2011 Fabrice
+#   x
+#
+####################################################################################################
+
+####################################################################################################
+
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PyDvi.Tools.Cache import *
+
+####################################################################################################
+
+class TestCache(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+
+    ##############################################
+
+    def tearDown(self):
+
+        shutil.rmtree(self.directory)
+
+    ##############################################
+
+    def test_arrays(self):
+
+        filename = os.path.join(self.directory, 'arrays')
+        arrays = {'words':np.arange(10, dtype='>u4'),
+                  'matrix':np.linspace(0, 1, 12).reshape(3, 4),
+                  'empty':np.zeros((0, 4), dtype=np.uint8),
+                  }
+        dump_arrays(filename, {'name':'cmr10', 'size':10.}, arrays)
+
+        metadata, loaded_arrays = load_arrays(filename)
+        self.assertEqual(metadata, {'name':'cmr10', 'size':10.})
+        self.assertEqual(sorted(loaded_arrays), sorted(arrays))
+        for name, array in arrays.iteritems():
+            loaded_array = loaded_arrays[name]
+            self.assertEqual(loaded_array.dtype, array.dtype)
+            self.assertEqual(loaded_array.shape, array.shape)
+            self.assertTrue(np.all(loaded_array == array))
+
+        self.assertIsNone(load_arrays(os.path.join(self.directory, 'missing')))
+        with open(filename, 'wb') as f:
+            f.write('corrupted')
+        self.assertIsNone(load_arrays(filename))
+
+    ##############################################
+
+    def test_evict_files(self):
+
+        for i in xrange(4):
+            filename = os.path.join(self.directory, str(i))
+            with open(filename, 'wb') as f:
+                f.write('x'*100)
+            os.utime(filename, (i, i))
+
+        self.assertEqual(evict_files(self.directory, 250), 2)
+        self.assertEqual(sorted(os.listdir(self.directory)), ['2', '3'])
+
+        # the temporary files of atomic_write are only removed if they are stale
+        for basename, mtime in (('.2-in-flight', time.time()), ('.3-stale', 0)):
+            filename = os.path.join(self.directory, basename)
+            with open(filename, 'wb') as f:
+                f.write('x'*100)
+            os.utime(filename, (mtime, mtime))
+        self.assertEqual(evict_files(self.directory, 0), 3)
+        self.assertEqual(os.listdir(self.directory), ['.2-in-flight'])
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
@@ -42,6 +42,15 @@ class TestFontMap(unittest.TestCase):
         # self.assertEqual(fontmap_entry.encoding, )
         self.assertEqual(fontmap_entry.pfb_filename, 'cmmi10.pfb')
 
+        eager_fontmap = FontMap(fontmap_file, lazy=False)
+        self.assertIn('cmmi10', fontmap)
+        self.assertEqual(len(fontmap.entries()), len(eager_fontmap.entries()))
+        for eager_entry in eager_fontmap.entries():
+            fontmap_entry = fontmap[eager_entry.tex_name]
+            self.assertEqual(fontmap_entry.ps_font_name, eager_entry.ps_font_name)
+            self.assertEqual(fontmap_entry.encoding, eager_entry.encoding)
+            self.assertEqual(fontmap_entry.pfb_filename, eager_entry.pfb_filename)
+
 ####################################################################################################
 
 if __name__ == '__main__':
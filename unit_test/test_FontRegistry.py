@@ -0,0 +1,141 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+import threading
+import unittest
+
+####################################################################################################
+
+from PyDvi.Font.FontRegistry import FontRegistry
+
+####################################################################################################
+
+class FakeFont(object):
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+####################################################################################################
+
+class TestFontRegistry(unittest.TestCase):
+
+    ##############################################
+
+    def test_reference_count(self):
+
+        font_registry = FontRegistry(idle_ttl=3600)
+        loads = []
+        def loader():
+            loads.append(1)
+            return FakeFont('cmr10')
+
+        font1 = font_registry.acquire('cmr10', loader)
+        font2 = font_registry.acquire('cmr10', loader)
+        self.assertIs(font1, font2)
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(font_registry.number_of_hits, 1)
+
+        font_registry.release('cmr10')
+        self.assertEqual(font_registry.collect(idle_ttl=0), 0)
+        font_registry.release('cmr10')
+        self.assertEqual(font_registry.collect(), 0)
+        self.assertIn('cmr10', font_registry)
+        self.assertEqual(font_registry.collect(idle_ttl=0), 1)
+        self.assertNotIn('cmr10', font_registry)
+        self.assertTrue(font1.closed)
+
+        font3 = font_registry.acquire('cmr10', loader)
+        self.assertIsNot(font1, font3)
+        self.assertEqual(font_registry.number_of_loads, 2)
+
+    ##############################################
+
+    def test_evict(self):
+
+        font_registry = FontRegistry()
+        font = font_registry.acquire('cmr10', lambda: FakeFont('cmr10'))
+        self.assertFalse(font_registry.evict('cmr10'))
+        font_registry.release('cmr10')
+        self.assertTrue(font_registry.evict('cmr10'))
+        self.assertTrue(font.closed)
+        self.assertEqual(len(font_registry), 0)
+        self.assertEqual(font_registry.number_of_evictions, 1)
+
+    ##############################################
+
+    def test_concurrent_loads(self):
+
+        font_registry = FontRegistry()
+        loading = threading.Event()
+        resume = threading.Event()
+        loads = []
+        def slow_loader():
+            loads.append(1)
+            loading.set()
+            resume.wait()
+            return FakeFont('cmr10')
+
+        fonts = []
+        threads = [threading.Thread(target=lambda: fonts.append(font_registry.acquire('cmr10',
+                                                                                      slow_loader)))
+                   for i in xrange(3)]
+        for thread in threads:
+            thread.start()
+        loading.wait()
+        # the registry is not locked while a font is loaded
+        font_registry.acquire('cmmi10', lambda: FakeFont('cmmi10'))
+        resume.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(len(fonts), 3)
+        self.assertTrue(fonts[0] is fonts[1] is fonts[2])
+        self.assertEqual(font_registry.number_of_hits, 2)
+
+        def failing_loader():
+            raise NameError('cmbx10')
+        self.assertRaises(NameError, font_registry.acquire, 'cmbx10', failing_loader)
+        self.assertNotIn('cmbx10', font_registry)
+
+    ##############################################
+
+    def test_font_id(self):
+
+        font_registry = FontRegistry()
+        font_ids = [font_registry.new_font_id() for i in xrange(10)]
+        self.assertEqual(len(set(font_ids)), 10)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
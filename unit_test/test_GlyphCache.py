@@ -0,0 +1,127 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+import numpy as np
+
+####################################################################################################
+
+from PyDvi.Font.GlyphCache import GlyphCache, glyph_cache
+from PyDvi.Font.Type1Font import Glyph
+
+####################################################################################################
+
+class FakeGlyph(object):
+
+    def __init__(self, size):
+        self.size = size
+
+    def memory_usage(self):
+        return self.size
+
+####################################################################################################
+
+class FakeFontSize(object):
+
+    def _cache_key(self, glyph_index):
+        return GlyphCache.make_key('fake', 10., 600, glyph_index)
+
+####################################################################################################
+
+class TestGlyphCache(unittest.TestCase):
+
+    ##############################################
+
+    def test_key(self):
+
+        self.assertEqual(GlyphCache.make_key('cmr10', 10., 600, 65),
+                         GlyphCache.make_key('cmr10', 10.001, 600., 65))
+        self.assertNotEqual(GlyphCache.make_key('cmr10', 10., 600, 65),
+                            GlyphCache.make_key('cmr10', 12., 600, 65))
+
+    ##############################################
+
+    def test_lru(self):
+
+        glyph_cache = GlyphCache(max_size=300)
+        for i in xrange(3):
+            glyph_cache.add(i, FakeGlyph(100))
+        self.assertEqual(glyph_cache.size, 300)
+
+        self.assertIsNotNone(glyph_cache.get(0))
+        glyph_cache.add(3, FakeGlyph(100))
+        self.assertNotIn(1, glyph_cache)
+        self.assertIn(0, glyph_cache)
+        self.assertEqual(glyph_cache.number_of_evictions, 1)
+
+        glyph_cache.add(4, FakeGlyph(250))
+        self.assertEqual(glyph_cache.size, 250)
+        self.assertEqual(len(glyph_cache), 1)
+
+        glyph_cache.add(5, FakeGlyph(1000))
+        self.assertEqual(len(glyph_cache), 1)
+        self.assertIn(5, glyph_cache)
+
+        self.assertIsNone(glyph_cache.get(0))
+        self.assertEqual(glyph_cache.number_of_hits, 1)
+        self.assertEqual(glyph_cache.number_of_misses, 1)
+        self.assertEqual(glyph_cache.hit_rate, .5)
+
+        glyph_cache.clear()
+        self.assertEqual(glyph_cache.size, 0)
+        self.assertEqual(glyph_cache.hit_rate, 0)
+
+        glyph_cache.add(6, np.zeros(10), size=80)
+        self.assertEqual(glyph_cache.size, 80)
+
+    ##############################################
+
+    def test_derived_bitmaps(self):
+
+        glyph_cache.clear()
+        glyph = Glyph(FakeFontSize(), 65, (3, 2), (0, 0), (3, 0), (3, 2, 0, 2, 3))
+        glyph.glyph_bitmap = np.arange(6, dtype=np.uint8).reshape(2, 3)
+        glyph_cache.add(glyph.font_size._cache_key(65), glyph)
+
+        self.assertIs(glyph.get_bitmap(), glyph.glyph_bitmap)
+        bitmap = glyph.get_bitmap(rgb=True, inverted=True)
+        self.assertEqual(bitmap.shape, (2, 3, 3))
+        self.assertEqual(bitmap[1, 2, 0], 250)
+        # the derived forms are cached and accounted
+        self.assertIs(glyph.get_bitmap(rgb=True, inverted=True), bitmap)
+        self.assertIsNot(glyph.get_bitmap(rgb=True), bitmap)
+        self.assertEqual(len(glyph_cache), 3)
+        self.assertEqual(glyph_cache.size, 6 + 18 + 18)
+        glyph_cache.clear()
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
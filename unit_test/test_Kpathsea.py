@@ -15,11 +15,16 @@
 
 ####################################################################################################
 
+import os
+import shutil
+import tempfile
 import unittest
 
 ####################################################################################################
 
+import PyDvi.Kpathsea as Kpathsea
 from PyDvi.Kpathsea import *
+from PyDvi.Tools.Cache import file_stamp, load_pickle
 
 ####################################################################################################
 
@@ -31,6 +36,99 @@ class TestKpathsea(unittest.TestCase):
         print 'kpsewhich found', filename
         self.assertIsNotNone(filename)
 
+    def test_many(self):
+
+        filenames = kpsewhich_many(('cmr10', 'not-a-font', 'cmmi10'), file_format='tfm')
+        self.assertEqual(filenames['cmr10'], kpsewhich('cmr10', file_format='tfm'))
+        self.assertEqual(filenames['cmmi10'], kpsewhich('cmmi10', file_format='tfm'))
+        self.assertIsNone(filenames['not-a-font'])
+
+####################################################################################################
+
+class TestDiskCache(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self.directory = tempfile.mkdtemp()
+        self._environment = os.environ.get('PYDVI_CACHE_DIR')
+        os.environ['PYDVI_CACHE_DIR'] = self.directory
+        self._cache = dict(Kpathsea._cache)
+        self._database_stamps = Kpathsea._database_stamps
+
+        # a fake ls-R database
+        self.database = self._make_file('ls-R')
+        Kpathsea._database_stamps = lambda: {self.database:file_stamp(self.database)}
+
+    ##############################################
+
+    def tearDown(self):
+
+        Kpathsea._cache.clear()
+        Kpathsea._cache.update(self._cache)
+        Kpathsea._database_stamps = self._database_stamps
+        if self._environment is None:
+            del os.environ['PYDVI_CACHE_DIR']
+        else:
+            os.environ['PYDVI_CACHE_DIR'] = self._environment
+        shutil.rmtree(self.directory)
+
+    ##############################################
+
+    def _make_file(self, filename, data='data'):
+
+        path = os.path.join(self.directory, filename)
+        with open(path, 'w') as f:
+            f.write(data)
+        return path
+
+    ##############################################
+
+    def test_load_save(self):
+
+        found_path = self._make_file('found.tfm')
+        moved_path = self._make_file('moved.tfm')
+        entries = {'found':found_path, 'moved':moved_path, 'relative':'./relative.tfm', 'missing':None}
+
+        disk_cache = Kpathsea._DiskCache()
+        disk_cache.load()
+        for key, path in entries.iteritems():
+            Kpathsea._cache[key] = path
+            disk_cache.add(key)
+        disk_cache.save()
+
+        # the relative paths and the files which are not found are not saved
+        data = load_pickle(os.path.join(self.directory, Kpathsea._DiskCache.cache_filename))
+        self.assertEqual(data['entries'], {'found':found_path, 'moved':moved_path})
+
+        Kpathsea._cache.clear()
+        os.rename(moved_path, moved_path + '.old')
+        disk_cache = Kpathsea._DiskCache()
+        disk_cache.load()
+        self.assertEqual(disk_cache.get('found'), found_path)
+        self.assertEqual(Kpathsea._cache, {'found':found_path})
+        # a cached path is checked
+        self.assertIsNone(disk_cache.get('moved'))
+        self.assertIsNone(disk_cache.get('missing'))
+
+    ##############################################
+
+    def test_invalidation(self):
+
+        found_path = self._make_file('found.tfm')
+        disk_cache = Kpathsea._DiskCache()
+        disk_cache.load()
+        Kpathsea._cache['found'] = found_path
+        disk_cache.add('found')
+        disk_cache.save()
+
+        # the database is updated
+        self._make_file('ls-R', 'new data')
+        disk_cache = Kpathsea._DiskCache()
+        disk_cache.load()
+        self.assertIsNone(disk_cache.get('found'))
+
 ####################################################################################################
 
 if __name__ == '__main__':
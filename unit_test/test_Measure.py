@@ -0,0 +1,63 @@
+####################################################################################################
+#
+# PyDvi - A Python Library to Process DVI Stream.
+# Copyright (C) 2009 Salvaire Fabrice
+#
+####################################################################################################
+
+#####################################################################################################
+#
+#                                              Audit
+#
+# - 27/11/2011 Fabrice
+#   x
+#
+####################################################################################################
+
+####################################################################################################
+
+import unittest
+
+####################################################################################################
+
+from PyDvi.Font.Measure import *
+from PyDvi.Font.TfmParser import *
+from PyDvi.Kpathsea import *
+
+####################################################################################################
+
+class TestMeasure(unittest.TestCase):
+
+    def test_cmr10(self):
+
+        tfm_file = kpsewhich('cmr10', file_format='tfm')
+        self.assertIsNotNone(tfm_file)
+        tfm = TfmParser.parse('cmr10', tfm_file)
+
+        widths, heights, depths = measure(['ffi', 'AV', 'f i', ''], 'cmr10')
+
+        self.assertAlmostEqual(widths[0], tfm[016].width * 10, places=5)
+        self.assertAlmostEqual(heights[0], tfm[016].height * 10, places=5)
+        self.assertAlmostEqual(widths[1],
+                               (tfm[ord('A')].width + tfm[ord('V')].width +
+                                tfm.kern(ord('A'), ord('V'))) * 10,
+                               places=5)
+        self.assertAlmostEqual(widths[2],
+                               (tfm[ord('f')].width + tfm[ord('i')].width + tfm.spacing) * 10,
+                               places=5)
+        self.assertEqual((widths[3], heights[3], depths[3]), (0, 0, 0))
+
+        widths, heights, depths = measure(['ffi'], 'cmr10', scale=1)
+        self.assertAlmostEqual(widths[0], tfm[016].width, places=6)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
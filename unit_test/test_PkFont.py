@@ -58,6 +58,32 @@ class TestPkFont(unittest.TestCase):
         print '\n', count_list
         self.assertEqual(glyph.count_list(), count_list)
 
+        for char_code in xrange(128):
+            glyph = pk_font[char_code]
+            glyph._decode_glyph()
+            glyph_bitmap = glyph.glyph_bitmap
+            glyph._decode_glyph_iteratively()
+            self.assertEqual(glyph_bitmap.shape, (glyph.height, glyph.width))
+            self.assertTrue((glyph_bitmap == glyph.glyph_bitmap).all())
+
+        batch_pk_font = PkFont(font_manager=None, font_id=0, name=font_name)
+        batch_pk_font.decode_glyphs(xrange(128))
+        for char_code in xrange(128):
+            glyph_bitmap = batch_pk_font[char_code].get_glyph_bitmap()
+            self.assertTrue((glyph_bitmap == pk_font[char_code].glyph_bitmap).all())
+
+        eager_pk_font = PkFont(font_manager=None, font_id=0, name=font_name, lazy=False)
+        self.assertEqual(len(eager_pk_font), len(pk_font))
+        self.assertEqual(eager_pk_font.char_codes(), pk_font.char_codes())
+        self.assertEqual(eager_pk_font[65].nybbles.tostring(), pk_font[65].nybbles.tostring())
+
+        packed_pk_font = PkFont(font_manager=None, font_id=0, name=font_name, bit_packed=True)
+        for i in xrange(2):
+            glyph_bitmap = packed_pk_font[65].get_glyph_bitmap()
+            self.assertTrue((glyph_bitmap == pk_font[65].get_glyph_bitmap()).all())
+        self.assertIsNone(packed_pk_font[65].glyph_bitmap)
+        self.assertLess(packed_pk_font.memory_usage(), pk_font.memory_usage())
+
 ####################################################################################################
 
 if __name__ == '__main__':
@@ -0,0 +1,125 @@
+####################################################################################################
+# 
+# PyDvi - A Python Library to Process DVI Stream
+# Copyright (C) 2014 Fabrice Salvaire
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+# 
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+# 
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+# 
+####################################################################################################
+####################################################################################################
+
+import subprocess
+import threading
+import unittest
+
+####################################################################################################
+
+import PyDvi.Font.PkGenerator as PkGeneratorModule
+from PyDvi.Font.PkGenerator import PkGenerator
+
+####################################################################################################
+
+class FakePopen(object):
+
+    """ Record the commands and output nothing as if the file was not found. """
+
+    commands = []
+
+    def __init__(self, command, **kwargs):
+        self.commands.append(command)
+
+    def communicate(self):
+        return '', None
+
+####################################################################################################
+
+class TestPkGenerator(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        self._kpsewhich = PkGeneratorModule.kpsewhich
+        self._popen = subprocess.Popen
+
+    ##############################################
+
+    def tearDown(self):
+
+        PkGeneratorModule.kpsewhich = self._kpsewhich
+        subprocess.Popen = self._popen
+
+    ##############################################
+
+    def test_deduplication(self):
+
+        # the generation cannot finish until the event is set
+        event = threading.Event()
+        filenames = []
+        def kpsewhich(filename, **kwargs):
+            event.wait()
+            filenames.append(filename)
+            return None
+        PkGeneratorModule.kpsewhich = kpsewhich
+
+        with PkGenerator(number_of_threads=2) as pk_generator:
+            job1 = pk_generator.generate('pydvi-missing-font.pk')
+            job2 = pk_generator.generate('pydvi-missing-font.pk')
+            self.assertIs(job1, job2)
+            self.assertEqual(pk_generator.number_of_requests, 2)
+            self.assertEqual(pk_generator.number_of_jobs, 1)
+
+            jobs = []
+            job1.add_callback(jobs.append)
+            self.assertFalse(job1.done())
+            event.set()
+            self.assertIsNone(job1.wait())
+            self.assertTrue(job1.done())
+            self.assertEqual(jobs, [job1])
+            self.assertEqual(filenames, ['pydvi-missing-font.pk'])
+
+            # a done job calls the callback at once
+            job1.add_callback(jobs.append)
+            self.assertEqual(len(jobs), 2)
+
+    ##############################################
+
+    def test_retry(self):
+
+        del FakePopen.commands[:]
+        subprocess.Popen = FakePopen
+
+        with PkGenerator(number_of_threads=1) as pk_generator:
+            job1 = pk_generator.generate('pydvi-missing-font.pk')
+            self.assertIsNone(job1.wait())
+            # a failed job is retried and mktex is run again
+            job2 = pk_generator.generate('pydvi-missing-font.pk')
+            self.assertIsNot(job2, job1)
+            self.assertIsNone(job2.wait())
+            self.assertEqual(pk_generator.number_of_jobs, 2)
+
+        mktex_commands = [command for command in FakePopen.commands if '-mktex=pk' in command]
+        self.assertEqual(len(mktex_commands), 2)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
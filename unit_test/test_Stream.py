@@ -0,0 +1,83 @@
+####################################################################################################
+#
+# PyDvi - A Python Library to Process DVI Stream.
+# Copyright (C) 2009 Salvaire Fabrice
+#
+####################################################################################################
+
+#####################################################################################################
+#
+#                                              Audit
+#
+# - 27/11/2011 Fabrice
+#   x
+#
+####################################################################################################
+
+####################################################################################################
+
+import gc
+import os
+import tempfile
+import unittest
+
+####################################################################################################
+
+from PyDvi.Tools.Stream import FileStream
+
+####################################################################################################
+
+class TestFileStream(unittest.TestCase):
+
+    ##############################################
+
+    def setUp(self):
+
+        file_descriptor, self.filename = tempfile.mkstemp()
+        os.write(file_descriptor, 'header' + 'packet' + 'trailer')
+        os.close(file_descriptor)
+
+    ##############################################
+
+    def tearDown(self):
+
+        os.unlink(self.filename)
+
+    ##############################################
+
+    def test_view(self):
+
+        stream = FileStream(self.filename)
+        stream.seek(6)
+        view = stream.view(stream.tell(), 6)
+        self.assertEqual(view.tostring(), 'packet')
+        self.assertFalse(view.flags.writeable)
+        self.assertEqual(stream.read(6), bytearray('packet'))
+
+        # the views remain valid once the stream is closed
+        stream.close()
+        stream.close()
+        del stream
+        gc.collect()
+        self.assertEqual(view.tostring(), 'packet')
+
+    ##############################################
+
+    def test_close(self):
+
+        stream = FileStream(self.filename)
+        stream.close()
+        self.assertIsNone(stream.stream)
+        self.assertTrue(stream.file.closed)
+
+####################################################################################################
+
+if __name__ == '__main__':
+
+    unittest.main()
+
+####################################################################################################
+#
+# End
+#
+####################################################################################################
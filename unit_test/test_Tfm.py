@@ -86,6 +86,13 @@ class TestTfm(unittest.TestCase):
         self.assertEqual(lig_kern_it[7].next_char, 0135)
         self.assertAlmostEqual(lig_kern_it[7].kern, 0.077779, places=6)
 
+        self.assertEqual(tfm.lig_kern_action(ord('f'), ord('i')), (014, False, False, 0))
+        self.assertAlmostEqual(tfm.kern(ord('f'), 047), 0.077779, places=6)
+        self.assertEqual(tfm.kern(ord('f'), ord('x')), 0)
+        char_codes, kerns = tfm.apply_lig_kern([ord(x) for x in 'ffi!'], boundary_chars=False)
+        self.assertEqual(char_codes, [016, ord('!')])
+        self.assertAlmostEqual(kerns[1], 0, places=6)
+
     def test_euex10(self):
 
         font_name = 'euex10'
@@ -130,6 +137,37 @@ class TestTfm(unittest.TestCase):
         self.assertEqual(tfm_char.bot, 072)
         self.assertEqual(tfm_char.rep, 076)
 
+    def test_numpy_parsers(self):
+
+        for font_name in 'cmr10', 'euex10':
+            tfm_file = kpsewhich(font_name, file_format='tfm')
+            self.assertIsNotNone(tfm_file)
+
+            tfm = TfmParser.parse(font_name, tfm_file)
+            for parser_class in NumpyTfmParser, CompactTfmParser:
+                self._compare_tfm(tfm, parser_class.parse(font_name, tfm_file))
+
+    def _compare_tfm(self, tfm, numpy_tfm):
+
+        self.assertEqual(len(numpy_tfm), len(tfm))
+        self.assertEqual(numpy_tfm.checksum, tfm.checksum)
+        self.assertEqual(numpy_tfm.quad, tfm.quad)
+        for char_code in xrange(tfm.smallest_character_code, tfm.largest_character_code +1):
+            tfm_char = tfm[char_code]
+            numpy_tfm_char = numpy_tfm[char_code]
+            self.assertIs(type(numpy_tfm_char), type(tfm_char))
+            for attribute in ('width', 'height', 'depth', 'italic_correction',
+                              'lig_kern_program_index', 'next_larger_char'):
+                self.assertEqual(getattr(numpy_tfm_char, attribute), getattr(tfm_char, attribute))
+            lig_kern_program = tfm_char.get_lig_kern_program()
+            if lig_kern_program is not None:
+                for lig_kern, numpy_lig_kern in zip(lig_kern_program,
+                                                    numpy_tfm_char.get_lig_kern_program()):
+                    self.assertIs(type(numpy_lig_kern), type(lig_kern))
+                    self.assertEqual(numpy_lig_kern.next_char, lig_kern.next_char)
+                    self.assertEqual(getattr(numpy_lig_kern, 'kern', None),
+                                     getattr(lig_kern, 'kern', None))
+
 ####################################################################################################
 
 # self.assertAlmostEqual(tfm.num1, , places=6)